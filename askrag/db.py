@@ -0,0 +1,88 @@
+"""
+Database profiles, selected with the DB_PROFILE environment variable.
+
+    sqlite    (default) SQLite file with persistent connections and WAL mode
+    postgres  PostgreSQL through psycopg's connection pool
+              (pip install "psycopg[binary,pool]")
+
+SQLite connections are tuned through the connection_created signal, so the
+pragmas apply to every connection Django opens, including those of
+background threads.
+"""
+import os
+
+from django.db.backends.signals import connection_created
+
+PROFILES = ('sqlite', 'postgres')
+
+
+def sqlite_pragmas() -> dict:
+    """Pragmas applied to every new SQLite connection unless SQLITE_TUNING=0."""
+    return {
+        # Readers no longer block the writer and commits append to the WAL
+        'journal_mode': 'WAL',
+        # With WAL, NORMAL only fsyncs at checkpoints and is still crash-safe
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'foreign_keys': 'ON',
+        'temp_store': 'MEMORY',
+        # Negative values are KiB
+        'cache_size': -int(os.getenv('SQLITE_CACHE_KB', 20000)),
+    }
+
+
+def sqlite_tuning_enabled() -> bool:
+    return os.getenv('SQLITE_TUNING', '1') == '1'
+
+
+def database_config(base_dir, profile: str = None) -> dict:
+    profile = profile or os.getenv('DB_PROFILE', 'sqlite')
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE {profile!r}, expected one of {', '.join(PROFILES)}")
+
+    if profile == 'postgres':
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME'),
+            'USER': os.getenv('DB_USER'),
+            'PASSWORD': os.getenv('DB_PASSWORD'),
+            'HOST': os.getenv('DB_HOST'),
+            'PORT': os.getenv('DB_PORT'),
+            # Connections are reused through the pool, which requires CONN_MAX_AGE = 0
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+                    'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+                },
+            },
+        }
+
+    config = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('DB_PATH', base_dir / 'db.sqlite3'),
+        # Keep each thread's connection open between requests
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    if sqlite_tuning_enabled():
+        config['OPTIONS'] = {
+            # Take the write lock at BEGIN so concurrent writers wait on
+            # busy_timeout instead of failing when they upgrade a read lock
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': sqlite_pragmas()['busy_timeout'] / 1000,
+        }
+    return config
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not sqlite_tuning_enabled():
+        return
+    with connection.cursor() as cursor:
+        for name, value in sqlite_pragmas().items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+connection_created.connect(configure_sqlite, dispatch_uid='askrag.db.configure_sqlite')
@@ -3,6 +3,8 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 
+from .db import database_config
+
 load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,11 +48,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'rag_service.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'rag_service.middleware.SamplingProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 
@@ -96,26 +100,13 @@ WSGI_APPLICATION = 'askrag.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Profiles (SQLite with WAL, or pooled PostgreSQL) live in askrag/db.py;
+# pick one with DB_PROFILE=sqlite|postgres
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(BASE_DIR),
 }
 
 
-# DATABASES = {
-#    'default': {
-#        'ENGINE': 'django.db.backends.postgresql',
-#        'NAME': os.getenv('DB_NAME'),
-#        'USER': os.getenv('DB_USER'),
-#        'PASSWORD': os.getenv('DB_PASSWORD'),
-#        'HOST': os.getenv('DB_HOST'),
-#        'PORT': os.getenv('DB_PORT'),
-#    }
-# }
-
-
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -159,10 +150,131 @@ MEDIA_URL = '/media/'
 # Groq API Key
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 
+# LLM used for answers: groq, or fake for load tests and offline work
+# (rag_service/fake_llm.py; answers after FAKE_LLM_LATENCY_MS plus
+# FAKE_LLM_TOKENS tokens FAKE_LLM_TOKEN_MS apart)
+RAG_LLM_BACKEND = os.getenv('RAG_LLM_BACKEND', 'groq')
+FAKE_LLM_LATENCY_MS = float(os.getenv('FAKE_LLM_LATENCY_MS', 300))
+FAKE_LLM_TOKENS = int(os.getenv('FAKE_LLM_TOKENS', 100))
+FAKE_LLM_TOKEN_MS = float(os.getenv('FAKE_LLM_TOKEN_MS', 10))
+
+# Report per-stage timings (retrieve, llm, ...) in a Server-Timing response header
+SERVER_TIMING = os.getenv('SERVER_TIMING', '0') == '1'
+
+# Sampling profiler (rag_service/profiling.py), off unless PROFILING=1. Profiles
+# a random PROFILE_SAMPLE_RATE of requests, every request of PROFILE_USER_IDS and
+# staff requests sent with `X-Profile: 1`; admins download them from /profiling/
+PROFILING_ENABLED = os.getenv('PROFILING', '0') == '1'
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+PROFILE_USER_IDS = [user_id.strip() for user_id in os.getenv('PROFILE_USER_IDS', '').split(',') if user_id.strip()]
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 5))
+PROFILE_MAX_ENDPOINTS = int(os.getenv('PROFILE_MAX_ENDPOINTS', 50))
+PROFILE_MAX_STACKS = int(os.getenv('PROFILE_MAX_STACKS', 2000))  # distinct stacks per endpoint
+PROFILE_MAX_DEPTH = int(os.getenv('PROFILE_MAX_DEPTH', 128))
+
 # Vector DB Path
 # VECTOR_DB_PATH = BASE_DIR / 'vector_db' / 'global'
 PERSONAL_VECTOR_DB_PATH = BASE_DIR / 'vector_db' / 'personal'
 
+# Vector store layout:
+#   per_user - one Chroma directory per user under PERSONAL_VECTOR_DB_PATH (default)
+#   shared   - users share VECTOR_STORE_SHARDS collections under SHARED_VECTOR_DB_PATH,
+#              partitioned by a user_id metadata filter
+# Switch layouts with `python manage.py migrate_vector_store --to <mode>`.
+VECTOR_STORE_MODE = os.getenv('VECTOR_STORE_MODE', 'per_user')
+VECTOR_STORE_SHARDS = int(os.getenv('VECTOR_STORE_SHARDS', 16))
+SHARED_VECTOR_DB_PATH = BASE_DIR / 'vector_db' / 'shared'
+
+# Optional shared embedding/retrieval worker (python manage.py run_vector_worker).
+# When set, web workers forward vector operations to it over this Unix socket
+# instead of loading the embedding model themselves.
+VECTOR_WORKER_SOCKET = os.getenv('VECTOR_WORKER_SOCKET')
+VECTOR_WORKER_BATCH_SIZE = int(os.getenv('VECTOR_WORKER_BATCH_SIZE', 64))
+VECTOR_WORKER_BATCH_WAIT_MS = int(os.getenv('VECTOR_WORKER_BATCH_WAIT_MS', 10))
+
+# Maximum size of a single multipart upload (/upload/, /upload/bulk/)
+MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 10 * 1024 * 1024))  # 10MB
+
+# Resumable chunked uploads (/upload/sessions/)
+MAX_CHUNKED_UPLOAD_SIZE = int(os.getenv('MAX_CHUNKED_UPLOAD_SIZE', 500 * 1024 * 1024))  # 500MB
+UPLOAD_CHUNK_MAX_SIZE = int(os.getenv('UPLOAD_CHUNK_MAX_SIZE', 8 * 1024 * 1024))  # 8MB per request
+UPLOAD_SESSION_EXPIRY_HOURS = int(os.getenv('UPLOAD_SESSION_EXPIRY_HOURS', 24))
+# Finalized uploads still unprocessed after this long are ingested again (the process running it died)
+UPLOAD_INGEST_TIMEOUT_MINUTES = int(os.getenv('UPLOAD_INGEST_TIMEOUT_MINUTES', 60))
+UPLOAD_INGEST_MAX_ATTEMPTS = int(os.getenv('UPLOAD_INGEST_MAX_ATTEMPTS', 3))
+
+# Chat history pagination (/chat-history/)
+CHAT_HISTORY_PAGE_SIZE = int(os.getenv('CHAT_HISTORY_PAGE_SIZE', 50))
+CHAT_HISTORY_MAX_PAGE_SIZE = int(os.getenv('CHAT_HISTORY_MAX_PAGE_SIZE', 200))
+
+# Batch chat (/chat/batch/): questions per request and LLM calls in flight per request
+CHAT_BATCH_MAX_QUESTIONS = int(os.getenv('CHAT_BATCH_MAX_QUESTIONS', 20))
+CHAT_BATCH_CONCURRENCY = int(os.getenv('CHAT_BATCH_CONCURRENCY', 4))
+
+# Longest span served by /documents/<id>/citation/
+CITATION_MAX_BYTES = int(os.getenv('CITATION_MAX_BYTES', 64 * 1024))
+
+# Chat history retention (rag_service/retention.py)
+CHAT_HISTORY_RETENTION_DAYS = int(os.getenv('CHAT_HISTORY_RETENTION_DAYS', 30))
+RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 500))
+RETENTION_BATCH_SLEEP = float(os.getenv('RETENTION_BATCH_SLEEP', 0.05))  # seconds between batches
+
+# Maintenance scheduler (rag_service/scheduler.py). Web workers elect a single
+# leader through a database lock; only the leader runs the jobs.
+SCHEDULER_AUTOSTART = os.getenv('SCHEDULER_AUTOSTART', '1') == '1'
+SCHEDULER_LOCK_TTL = int(os.getenv('SCHEDULER_LOCK_TTL', 60))  # seconds
+
+# Document deletion: documents are tombstoned by the API and purged by a
+# maintenance job, at most this many per run
+DOCUMENT_PURGE_BATCH_SIZE = int(os.getenv('DOCUMENT_PURGE_BATCH_SIZE', 50))
+VECTOR_DELETE_BATCH_SIZE = int(os.getenv('VECTOR_DELETE_BATCH_SIZE', 500))
+
+# Vector store compaction (python manage.py compact_vector_stores). A store is
+# rebuilt when it takes more than this many times the size of its live data.
+VECTOR_COMPACT_BLOAT_RATIO = float(os.getenv('VECTOR_COMPACT_BLOAT_RATIO', 3.0))
+VECTOR_COMPACT_MIN_BYTES = int(os.getenv('VECTOR_COMPACT_MIN_BYTES', 32 * 1024 * 1024))
+
+# Tiered storage: per-user stores not accessed for VECTOR_STORE_IDLE_DAYS are
+# packed into a compressed archive under VECTOR_COLD_STORAGE_PATH and restored
+# on the user's next access (or in the background when they log in)
+VECTOR_COLD_STORAGE_PATH = Path(os.getenv('VECTOR_COLD_STORAGE_PATH', BASE_DIR / 'vector_db' / 'cold'))
+VECTOR_STORE_IDLE_DAYS = int(os.getenv('VECTOR_STORE_IDLE_DAYS', 30))
+
+# Number of chunks embedded and inserted into the vector store per call
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 128))
+
+# Embedding model. Every collection is stamped with the model and version that
+# produced its vectors; after changing either, the re-embedding job rebuilds
+# stale collections in the background while they keep being served with the
+# model they were built with. Bump EMBEDDING_MODEL_VERSION to force a rebuild
+# with the same model name.
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+EMBEDDING_MODEL_VERSION = os.getenv('EMBEDDING_MODEL_VERSION', '1')
+REEMBED_BATCH_SIZE = int(os.getenv('REEMBED_BATCH_SIZE', 64))
+REEMBED_BATCH_SLEEP = float(os.getenv('REEMBED_BATCH_SLEEP', 0.5))
+
+# Bulk upload (/upload/bulk/)
+BULK_UPLOAD_MAX_FILES = int(os.getenv('BULK_UPLOAD_MAX_FILES', 500))
+BULK_UPLOAD_MAX_ARCHIVE_SIZE = int(os.getenv('BULK_UPLOAD_MAX_ARCHIVE_SIZE', 1024 * 1024 * 1024))  # 1GB extracted
+BULK_UPLOAD_CONCURRENCY = int(os.getenv('BULK_UPLOAD_CONCURRENCY', 4))  # per user
+DATA_UPLOAD_MAX_NUMBER_FILES = BULK_UPLOAD_MAX_FILES
+
+# The RAG stack is imported lazily on first use. Set RAG_PRELOAD=1 to import it
+# and load the embedding model when a web worker boots instead.
+RAG_PRELOAD = os.getenv('RAG_PRELOAD', '0') == '1'
+# Budget enforced by `python manage.py check_import_time`
+IMPORT_TIME_BUDGET_MS = int(os.getenv('IMPORT_TIME_BUDGET_MS', 1500))
+
+# Open RAG services kept per process, most recently used first
+RAG_SERVICE_POOL_SIZE = int(os.getenv('RAG_SERVICE_POOL_SIZE', 64))
+# Warm the user's vector store in the background on login
+RAG_LOGIN_WARMUP = os.getenv('RAG_LOGIN_WARMUP', '1') == '1'
+RAG_WARMUP_CONCURRENCY = int(os.getenv('RAG_WARMUP_CONCURRENCY', 2))  # per process; extra logins skip warmup
+RAG_WARMUP_MAX_BYTES = int(os.getenv('RAG_WARMUP_MAX_BYTES', 256 * 1024 * 1024))  # index pages read per store
+# Maintenance job keeping the stores of the most recently active users in the page cache
+RAG_WARMUP_JOB_USERS = int(os.getenv('RAG_WARMUP_JOB_USERS', 50))
+RAG_WARMUP_JOB_MAX_BYTES = int(os.getenv('RAG_WARMUP_JOB_MAX_BYTES', 1024 * 1024 * 1024))  # per run, all stores
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -179,6 +291,11 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# Users resolved from JWTs are cached per process for this many seconds
+# (0 disables). Saving or deleting a user drops its entry immediately.
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', 60))
+AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', 10000))
+
 
 
 
@@ -186,7 +303,7 @@ SIMPLE_JWT = {
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'rag_user.authentication.CachedJWTAuthentication',
 
         # 'rest_framework.authentication.TokenAuthentication',
         # 'rest_framework.authentication.SessionAuthentication',
@@ -248,4 +365,13 @@ EMAIL_USE_TLS = True
 EMAIL_PORT = 587
 EMAIL_HOST_USER = os.getenv("EMAIL")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_PASSWORD")
-DEFAULT_FROM_EMAIL = os.getenv("EMAIL")
\ No newline at end of file
+DEFAULT_FROM_EMAIL = os.getenv("EMAIL")
+
+# Outbound email worker pool (rag_user/mailer.py). Each worker keeps one SMTP
+# connection open and sends queued messages in batches.
+EMAIL_WORKERS = int(os.getenv('EMAIL_WORKERS', 2))
+EMAIL_QUEUE_SIZE = int(os.getenv('EMAIL_QUEUE_SIZE', 1000))
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', 50))
+EMAIL_MAX_RETRIES = int(os.getenv('EMAIL_MAX_RETRIES', 3))
+EMAIL_RETRY_BACKOFF = float(os.getenv('EMAIL_RETRY_BACKOFF', 2.0))  # seconds, doubled per attempt
+EMAIL_IDLE_TIMEOUT = float(os.getenv('EMAIL_IDLE_TIMEOUT', 30))  # close idle SMTP connections
\ No newline at end of file
@@ -0,0 +1,54 @@
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+from .db import database_config
+
+
+class DatabaseProfileTests(SimpleTestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+
+    def connect(self, config: dict):
+        # A handler of its own leaves the test database alone; it must define a default
+        connection = ConnectionHandler({'default': config, 'tuned': config})['tuned']
+        self.addCleanup(connection.close)
+        return connection
+
+    def pragma(self, connection, name: str):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_sqlite_connections_are_tuned(self):
+        config = database_config(Path(self.root.name))
+        self.assertEqual(config['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+
+        connection = self.connect(config)
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(connection, 'synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), 5000)
+
+    def test_tuning_can_be_turned_off(self):
+        with mock.patch.dict(os.environ, {'SQLITE_TUNING': '0'}):
+            config = database_config(Path(self.root.name))
+            connection = self.connect(config)
+            self.assertEqual(config['OPTIONS'], {})
+            self.assertEqual(self.pragma(connection, 'journal_mode'), 'delete')
+
+    def test_postgres_profile_uses_the_pool(self):
+        with mock.patch.dict(os.environ, {'DB_PROFILE': 'postgres', 'DB_POOL_MAX_SIZE': '20'}):
+            config = database_config(Path(self.root.name))
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['OPTIONS']['pool']['max_size'], 20)
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            database_config(Path(self.root.name), profile='mysql')
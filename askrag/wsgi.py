@@ -14,3 +14,16 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'askrag.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings
+
+if settings.RAG_PRELOAD:
+    from rag_service.personal_service import warmup
+
+    warmup()
+
+if settings.SCHEDULER_AUTOSTART:
+    # Every worker joins the election; only the lock holder runs the jobs
+    from rag_service.scheduler import start_scheduler
+
+    start_scheduler()
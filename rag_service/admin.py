@@ -1,11 +1,19 @@
 from django.contrib import admin
-from .models import UserDocument, ChatHistory
+from .models import (
+    UserDocument,
+    ChatHistory,
+    UploadSession,
+    RetentionRun,
+    SchedulerLock,
+    MaintenanceJobStats,
+    VectorStoreTier,
+)
 
 
 @admin.register(UserDocument)
 class UserDocumentAdmin(admin.ModelAdmin):
-    list_display = ['title', 'user', 'uploaded_at', 'processed', 'chunk_count']
-    list_filter = ['processed', 'uploaded_at']
+    list_display = ['title', 'user', 'uploaded_at', 'processed', 'chunk_count', 'deleted_at']
+    list_filter = ['processed', 'uploaded_at', 'deleted_at']
     search_fields = ['title', 'user__username']
 
 
@@ -17,4 +25,39 @@ class ChatHistoryAdmin(admin.ModelAdmin):
     
     def query_preview(self, obj):
         return obj.query[:50] + '...' if len(obj.query) > 50 else obj.query
-    query_preview.short_description = 'Query'
\ No newline at end of file
+    query_preview.short_description = 'Query'
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'received', 'size', 'status', 'updated_at']
+    list_filter = ['status']
+    search_fields = ['filename', 'user__username']
+
+
+
+@admin.register(RetentionRun)
+class RetentionRunAdmin(admin.ModelAdmin):
+    list_display = ['id', 'cutoff', 'started_at', 'finished_at', 'deleted', 'batches']
+    readonly_fields = ['cutoff', 'started_at', 'updated_at', 'finished_at', 'deleted', 'batches']
+
+
+
+@admin.register(SchedulerLock)
+class SchedulerLockAdmin(admin.ModelAdmin):
+    list_display = ['name', 'owner', 'expires_at']
+
+
+@admin.register(MaintenanceJobStats)
+class MaintenanceJobStatsAdmin(admin.ModelAdmin):
+    list_display = ['job_id', 'runs', 'failures', 'last_started_at', 'last_duration', 'average_duration', 'max_duration']
+    readonly_fields = ['job_id', 'runs', 'failures', 'last_started_at', 'last_duration',
+                       'total_duration', 'max_duration', 'last_error']
+
+
+@admin.register(VectorStoreTier)
+class VectorStoreTierAdmin(admin.ModelAdmin):
+    list_display = ['user', 'last_accessed_at', 'archived_at', 'archive_size', 'restores',
+                    'last_restore_duration', 'average_restore_duration']
+    list_filter = ['archived_at']
+    search_fields = ['user__username']
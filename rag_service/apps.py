@@ -7,4 +7,9 @@ class RagServiceConfig(AppConfig):
 
     def ready(self):
         import rag_service.signals  
+        import rag_service.tasks
+
+        from .scheduler import should_autostart, start_scheduler
+        if should_autostart():
+            start_scheduler()
         
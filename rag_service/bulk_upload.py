@@ -0,0 +1,174 @@
+import logging
+import os
+import threading
+import weakref
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.files import File
+from rest_framework import serializers
+
+from .models import UserDocument
+from .personal_service import PersonalRAGService
+from .serializers import UserDocumentSerializer, validate_document_name, validate_document_size
+
+logger = logging.getLogger(__name__)
+
+# One semaphore per user, shared by all of that user's in-flight bulk uploads
+_user_slots = weakref.WeakValueDictionary()
+_user_slots_lock = threading.Lock()
+
+
+def _user_semaphore(user_id: int):
+    with _user_slots_lock:
+        semaphore = _user_slots.get(user_id)
+        if semaphore is None:
+            semaphore = threading.BoundedSemaphore(settings.BULK_UPLOAD_CONCURRENCY)
+            _user_slots[user_id] = semaphore
+        return semaphore
+
+
+def _error_message(error) -> str:
+    if isinstance(error, serializers.ValidationError):
+        return ' '.join(str(detail) for detail in error.detail)
+    return str(error)
+
+
+def save_uploaded_files(user, files) -> tuple:
+    """Create a UserDocument per valid file. Returns (documents, rejected results)."""
+    documents, rejected = [], []
+    for upload in files:
+        try:
+            validate_document_name(upload.name)
+            validate_document_size(upload.size)
+        except serializers.ValidationError as e:
+            rejected.append({'filename': upload.name, 'status': 'rejected', 'error': _error_message(e)})
+            continue
+        documents.append(UserDocument.objects.create(
+            user=user,
+            title=os.path.splitext(upload.name)[0],
+            file=upload,
+        ))
+    return documents, rejected
+
+
+def save_archive_members(user, archive) -> tuple:
+    """
+    Stream each ZIP member straight to MEDIA_ROOT without reading the whole
+    archive into memory. Returns (documents, rejected results).
+    """
+    documents, rejected = [], []
+    total_size = 0
+    with zipfile.ZipFile(archive) as zf:
+        members = [info for info in zf.infolist() if not info.is_dir()]
+        for info in members:
+            filename = os.path.basename(info.filename)
+            # Skip macOS resource forks and hidden files
+            if not filename or filename.startswith('.') or info.filename.startswith('__MACOSX/'):
+                continue
+
+            try:
+                if len(documents) >= settings.BULK_UPLOAD_MAX_FILES:
+                    raise serializers.ValidationError(
+                        f"Cannot upload more than {settings.BULK_UPLOAD_MAX_FILES} files at once"
+                    )
+                validate_document_name(filename)
+                validate_document_size(info.file_size)
+                total_size += info.file_size
+                if total_size > settings.BULK_UPLOAD_MAX_ARCHIVE_SIZE:
+                    raise serializers.ValidationError("Archive exceeds the maximum extracted size")
+            except serializers.ValidationError as e:
+                rejected.append({'filename': info.filename, 'status': 'rejected', 'error': _error_message(e)})
+                continue
+
+            document = UserDocument(user=user, title=os.path.splitext(filename)[0])
+            with zf.open(info) as member:
+                document.file.save(filename, File(member, name=filename), save=False)
+            document.save()
+            documents.append(document)
+    return documents, rejected
+
+
+def ingest_documents(user_id: int, documents: list) -> dict:
+    """
+    Load and split documents concurrently, capped per user, then insert the
+    chunks into the vector store one embedding batch at a time. Returns a
+    mapping of document id to an error message for documents that failed.
+    """
+    if not documents:
+        return {}
+
+    service = PersonalRAGService(user_id)
+    semaphore = _user_semaphore(user_id)
+    batch_size = settings.EMBEDDING_BATCH_SIZE
+    errors = {}
+    chunk_counts = {}
+    buffer = []
+
+    def load(document):
+        with semaphore:
+            return service.load_chunks(document.file.path, document.id)
+
+    def flush(batch):
+        try:
+            service.add_chunks(batch)
+        except Exception as e:
+            for chunk in batch:
+                errors.setdefault(chunk.metadata['doc_id'], str(e))
+
+    with ThreadPoolExecutor(max_workers=settings.BULK_UPLOAD_CONCURRENCY) as pool:
+        futures = {pool.submit(load, document): document for document in documents}
+        for future in as_completed(futures):
+            document = futures[future]
+            try:
+                chunks = future.result()
+            except Exception as e:
+                errors[document.id] = str(e)
+                continue
+            chunk_counts[document.id] = len(chunks)
+            buffer.extend(chunks)
+            while len(buffer) >= batch_size:
+                flush(buffer[:batch_size])
+                buffer = buffer[batch_size:]
+    if buffer:
+        flush(buffer)
+
+    processed = []
+    for document in documents:
+        if document.id in errors:
+            # Drop vectors from batches that did make it in
+            if document.id in chunk_counts:
+                service.delete_document(document.id)
+            continue
+        document.processed = True
+        document.chunk_count = chunk_counts[document.id]
+        processed.append(document)
+    UserDocument.objects.bulk_update(processed, ['processed', 'chunk_count'])
+
+    logger.info(f"Bulk ingested {len(processed)} of {len(documents)} documents for user {user_id}")
+    return errors
+
+
+def bulk_upload(user, files=None, archive=None) -> list:
+    """Save, ingest and report per-file results for a bulk upload request."""
+    documents, results = save_uploaded_files(user, files or [])
+    if archive is not None:
+        archived, rejected = save_archive_members(user, archive)
+        documents.extend(archived)
+        results.extend(rejected)
+
+    errors = ingest_documents(user.id, documents)
+
+    for document in documents:
+        filename = os.path.basename(document.file.name)
+        if document.id in errors:
+            results.append({'filename': filename, 'status': 'failed', 'error': errors[document.id]})
+            document.delete()
+        else:
+            results.append({
+                'filename': filename,
+                'status': 'processed',
+                'document': UserDocumentSerializer(document).data,
+            })
+    return results
@@ -0,0 +1,254 @@
+import fcntl
+import hashlib
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import UploadSession, UserDocument
+from .personal_service import PersonalRAGService
+
+logger = logging.getLogger(__name__)
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class UploadConflict(Exception):
+    """Raised when a chunk does not start at the session's current offset."""
+
+    def __init__(self, message, offset):
+        super().__init__(message)
+        self.offset = offset
+
+
+class UploadIncomplete(Exception):
+    """Raised when finalizing a session whose bytes or checksum do not match."""
+
+
+class _PartFile(File):
+    # Lets FileSystemStorage rename the assembled file into place instead of copying it
+    def temporary_file_path(self):
+        return self.file.name
+
+
+@contextmanager
+def _locked_part(session: UploadSession):
+    # Writers of one session take turns on the part file, across processes
+    os.makedirs(os.path.dirname(session.part_path), exist_ok=True)
+    with os.fdopen(os.open(session.part_path, os.O_RDWR | os.O_CREAT, 0o644), 'r+b') as part:
+        fcntl.flock(part, fcntl.LOCK_EX)
+        yield part
+
+
+def _check_offset(session: UploadSession, offset: int, length: int):
+    if session.status != UploadSession.STATUS_PENDING:
+        raise UploadConflict("Upload is already finalized", session.received)
+    if offset != session.received:
+        raise UploadConflict(f"Expected offset {session.received}", session.received)
+    if offset + length > session.size:
+        raise UploadConflict("Chunk extends past the declared file size", session.received)
+
+
+def append_chunk(session: UploadSession, offset: int, stream, length: int) -> int:
+    """
+    Write `length` bytes from `stream` at `offset` and advance the session.
+    Chunks must arrive in order; a client that lost track of the offset can
+    read it back from the session and resume from there.
+    """
+    _check_offset(session, offset, length)
+
+    written = 0
+    with _locked_part(session) as part:
+        # A retried chunk waits for the first attempt, which may have moved the offset on
+        session.refresh_from_db()
+        try:
+            _check_offset(session, offset, length)
+        except UploadConflict:
+            if session.status != UploadSession.STATUS_PENDING and part.seek(0, os.SEEK_END) == 0:
+                # Created by this call after finalize moved the part file away
+                os.remove(session.part_path)
+            raise
+
+        part.seek(offset)
+        while written < length:
+            data = stream.read(min(COPY_BUFFER_SIZE, length - written))
+            if not data:
+                break
+            part.write(data)
+            written += len(data)
+        # Drop anything left over from an earlier, interrupted attempt
+        part.truncate()
+
+        # Finalize does not take the lock, so it may still have claimed the session
+        updated = UploadSession.objects.filter(
+            pk=session.pk, received=offset, status=UploadSession.STATUS_PENDING
+        ).update(received=offset + written, updated_at=timezone.now())
+    if not updated:
+        session.refresh_from_db()
+        raise UploadConflict(f"Expected offset {session.received}", session.received)
+
+    session.received = offset + written
+    return session.received
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(COPY_BUFFER_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _verify(session: UploadSession):
+    incomplete = UploadIncomplete(f"Received {session.received} of {session.size} bytes")
+    if session.received != session.size:
+        raise incomplete
+    try:
+        checksum = _sha256(session.part_path)
+    except FileNotFoundError:
+        raise incomplete
+    if checksum != session.checksum:
+        _restart(session)
+        raise UploadIncomplete("Checksum mismatch; upload the file again from offset 0")
+
+
+def _restart(session: UploadSession):
+    # The assembled bytes are wrong somewhere, so resuming cannot fix them
+    with _locked_part(session) as part:
+        updated = UploadSession.objects.filter(
+            pk=session.pk, received=session.size, status=UploadSession.STATUS_PENDING
+        ).update(received=0, updated_at=timezone.now())
+        if updated:
+            part.truncate(0)
+        elif part.seek(0, os.SEEK_END) == 0:
+            # Finalized by another request meanwhile, which moved the part file away
+            os.remove(session.part_path)
+    session.refresh_from_db()
+
+
+def finalize_session(session: UploadSession) -> UserDocument:
+    """
+    Verify the assembled file, move it into place and start ingestion.
+    Finalizing a session again returns the document it already created.
+    """
+    if session.status != UploadSession.STATUS_PENDING:
+        return session.document
+    try:
+        _verify(session)
+    except UploadIncomplete:
+        # A concurrent finalize request may have claimed it and moved the part file
+        session.refresh_from_db()
+        if session.status != UploadSession.STATUS_PENDING:
+            return session.document
+        raise
+
+    # Compare-and-set so only one of two racing finalize requests moves the part file
+    claimed = UploadSession.objects.filter(
+        pk=session.pk, status=UploadSession.STATUS_PENDING
+    ).update(status=UploadSession.STATUS_COMPLETE, updated_at=timezone.now())
+    if not claimed:
+        session.refresh_from_db()
+        return session.document
+    session.status = UploadSession.STATUS_COMPLETE
+
+    try:
+        with transaction.atomic():
+            document = UserDocument(user_id=session.user_id, title=os.path.splitext(session.filename)[0])
+            with open(session.part_path, 'rb') as part:
+                document.file.save(session.filename, _PartFile(part, name=session.filename), save=False)
+            document.save()
+
+            session.document = document
+            session.save(update_fields=['document', 'updated_at'])
+    except Exception as e:
+        session.status = UploadSession.STATUS_FAILED
+        session.error = str(e) or type(e).__name__
+        session.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+
+    transaction.on_commit(lambda: start_ingestion(document.id))
+    return document
+
+
+def ingest_document(document_id: int, retry: bool = False):
+    service = None
+    try:
+        document = UserDocument.objects.get(pk=document_id)
+        service = PersonalRAGService(document.user_id)
+        if retry:
+            # Drop vectors an earlier attempt added before its process died
+            service.delete_document(document_id)
+        chunks = service.load_chunks(document.file.path, document.id)
+        service.add_chunks(chunks)
+        document.processed = True
+        document.chunk_count = len(chunks)
+        document.save(update_fields=['processed', 'chunk_count'])
+    except Exception as e:
+        logger.error(f"Background ingestion of document {document_id} failed: {e}")
+        if service is not None:
+            # Drop vectors from batches that did make it in
+            service.delete_document(document_id)
+        # Reported by the session so the client stops polling
+        UploadSession.objects.filter(document_id=document_id).update(
+            status=UploadSession.STATUS_FAILED, error=str(e) or type(e).__name__, updated_at=timezone.now()
+        )
+    finally:
+        close_old_connections()
+
+
+def start_ingestion(document_id: int):
+    # Finalize returns immediately; the client polls the session for `processed` or a failed status
+    threading.Thread(target=ingest_document, args=(document_id,), daemon=True).start()
+
+
+def resume_stalled_ingestion() -> int:
+    """
+    Ingest again the documents of finalized sessions that are still not
+    processed after UPLOAD_INGEST_TIMEOUT_MINUTES, because the process
+    running their ingestion died. After UPLOAD_INGEST_MAX_ATTEMPTS the
+    session is marked failed.
+    """
+    cutoff = timezone.now() - timedelta(minutes=settings.UPLOAD_INGEST_TIMEOUT_MINUTES)
+    stalled = UploadSession.objects.filter(
+        status=UploadSession.STATUS_COMPLETE, document__processed=False,
+        document__deleted_at__isnull=True, updated_at__lt=cutoff,
+    )
+    resumed = 0
+    for session in stalled.iterator():
+        if session.ingest_attempts >= settings.UPLOAD_INGEST_MAX_ATTEMPTS:
+            UploadSession.objects.filter(pk=session.pk, updated_at=session.updated_at).update(
+                status=UploadSession.STATUS_FAILED,
+                error=f"Processing did not finish after {session.ingest_attempts + 1} attempts",
+                updated_at=timezone.now(),
+            )
+            continue
+        # Compare-and-set so only one run picks the session up
+        claimed = UploadSession.objects.filter(pk=session.pk, updated_at=session.updated_at).update(
+            ingest_attempts=F('ingest_attempts') + 1, updated_at=timezone.now()
+        )
+        if not claimed:
+            continue
+        logger.warning(f"Ingesting document {session.document_id} of upload {session.pk} again")
+        ingest_document(session.document_id, retry=True)
+        resumed += 1
+    return resumed
+
+
+def expire_upload_sessions() -> int:
+    """Delete pending sessions (and their partial files) that stopped receiving chunks."""
+    cutoff = timezone.now() - timedelta(hours=settings.UPLOAD_SESSION_EXPIRY_HOURS)
+    stale = UploadSession.objects.filter(status=UploadSession.STATUS_PENDING, updated_at__lt=cutoff)
+    count = 0
+    for session in stale.iterator():
+        session.delete()
+        count += 1
+    if count:
+        logger.info(f"Expired {count} stale upload sessions")
+    return count
@@ -0,0 +1,29 @@
+import os
+
+from .models import UserDocument, extracted_text_path
+
+
+class CitationUnavailable(Exception):
+    """Raised when a document was ingested before its extracted text was kept."""
+
+
+def read_citation(document: UserDocument, start: int, end: int) -> tuple:
+    """
+    Read bytes [start, end) of the document's extracted text, clipped to its
+    size. Only the cited span is read, however large the document is.
+    Returns the text and the end offset actually read.
+    """
+    path = extracted_text_path(document.file.path)
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        raise CitationUnavailable("No extracted text is stored for this document; upload it again to enable citations.")
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if start >= size:
+            raise ValueError(f"start is past the end of the document ({size} bytes).")
+        end = min(end, size)
+        f.seek(start)
+        data = f.read(end - start)
+    # Offsets from chat sources fall on character boundaries; arbitrary ones may not
+    return data.decode('utf-8', errors='replace'), end
@@ -0,0 +1,336 @@
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from .models import UserDocument
+from .personal_service import (
+    collection_name, refresh_client, release_client, shared_mode, store_lock, vector_store_path,
+)
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 1000
+# Catch-up passes over chunks written while a rebuild was copying
+MAX_CATCH_UP_PASSES = 3
+USER_DIR_PATTERN = re.compile(r'^user_(\d+)$')
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _iter_records(collection, include):
+    offset = 0
+    while True:
+        page = collection.get(include=include, limit=PAGE_SIZE, offset=offset)
+        if not page['ids']:
+            return
+        yield page
+        offset += len(page['ids'])
+
+
+def _record_ids(collection) -> set:
+    return {chunk_id for page in _iter_records(collection, []) for chunk_id in page['ids']}
+
+
+def recover_shadow(client, name: str, shadow: str) -> bool:
+    """
+    Settle a shadow collection left behind by an interrupted rebuild. The
+    caller holds the store's exclusive lock. A shadow whose records are all
+    still in the original is an unfinished copy and is dropped. Otherwise
+    the original was dropped before the rename, and may have been recreated
+    empty since: whatever it holds is merged into the shadow, which then
+    takes its place. Returns True if the shadow replaced the original.
+    """
+    names = {c.name if hasattr(c, 'name') else c for c in client.list_collections()}
+    if shadow not in names:
+        return False
+    target = client.get_collection(name=shadow)
+    if name in names:
+        source = client.get_collection(name=name)
+        source_ids = _record_ids(source)
+        if _record_ids(target) <= source_ids:
+            client.delete_collection(name=shadow)
+            return False
+        missing = list(source_ids - _record_ids(target))
+        for start in range(0, len(missing), PAGE_SIZE):
+            _copy_records(source, target, missing[start:start + PAGE_SIZE])
+        client.delete_collection(name=name)
+    target.modify(name=name)
+    logger.warning(f"Recovered interrupted rebuild of {name}")
+    return True
+
+
+def _sync(source, target, copy) -> bool:
+    # One reconcile pass; True if the target already matched the source
+    source_ids = _record_ids(source)
+    target_ids = _record_ids(target)
+    missing = list(source_ids - target_ids)
+    extra = list(target_ids - source_ids)
+    if not missing and not extra:
+        return True
+    if extra:
+        target.delete(ids=extra)
+    for start in range(0, len(missing), PAGE_SIZE):
+        copy(source, target, missing[start:start + PAGE_SIZE])
+    return False
+
+
+def catch_up(source, target, copy) -> bool:
+    """
+    Reconcile a shadow copy with chunks added or deleted while it was
+    built. `copy(source, target, ids)` copies records missing from the
+    shadow. Returns False if the original was still changing after
+    MAX_CATCH_UP_PASSES.
+    """
+    for _ in range(MAX_CATCH_UP_PASSES):
+        if _sync(source, target, copy):
+            return True
+    return False
+
+
+def swap_shadow(client, path: str, inode: int, name: str, shadow: str, copy) -> bool:
+    """
+    Replace the original with its caught-up shadow. The last reconcile pass
+    and the swap run under the store's exclusive lock, so no write can land
+    in between and no open can recreate the original mid-swap. Returns
+    False if the store directory is no longer the one `client` was opened
+    on (`inode`). The caller must not hold the store lock.
+    """
+    with store_lock(path, exclusive=True):
+        if not os.path.isdir(path) or os.stat(path).st_ino != inode:
+            # Archived in between; the next run settles the shadow
+            return False
+        source = client.get_collection(name=name)
+        target = client.get_collection(name=shadow)
+        _sync(source, target, copy)
+        client.delete_collection(name=name)
+        target.modify(name=name)
+    return True
+
+
+def _copy_records(source, target, ids: list):
+    page = source.get(ids=ids, include=['embeddings', 'documents', 'metadatas'])
+    if page['ids']:
+        target.upsert(
+            ids=page['ids'],
+            embeddings=page['embeddings'],
+            documents=page['documents'],
+            metadatas=page['metadatas'],
+        )
+
+
+def _copy_to_shadow(client, name: str, shadow: str):
+    # Copy live records, with their stored embeddings, into a fresh collection
+    source = client.get_collection(name=name)
+    target = client.create_collection(name=shadow, metadata=source.metadata)
+    for page in _iter_records(source, ['embeddings', 'documents', 'metadatas']):
+        target.add(
+            ids=page['ids'],
+            embeddings=page['embeddings'],
+            documents=page['documents'],
+            metadatas=page['metadatas'],
+        )
+
+
+def _existing_doc_ids(doc_ids: set) -> set:
+    doc_ids = list(doc_ids)
+    existing = set()
+    for start in range(0, len(doc_ids), PAGE_SIZE):
+        existing.update(
+            UserDocument.objects.filter(id__in=doc_ids[start:start + PAGE_SIZE]).values_list('id', flat=True)
+        )
+    return existing
+
+
+def _vacuum(path: str):
+    db_path = os.path.join(path, 'chroma.sqlite3')
+    if not os.path.exists(db_path):
+        return
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute('VACUUM')
+    finally:
+        conn.close()
+
+
+def compact_collection(path: str, name: str, known_doc_ids: set, rebuild: bool = None,
+                       dry_run: bool = False, shared: bool = False) -> dict:
+    """
+    Remove chunks whose document no longer exists, then rebuild the
+    collection in place if it looks fragmented. With rebuild=None a per-user
+    store of at least VECTOR_COMPACT_MIN_BYTES is rebuilt when it occupies
+    more than VECTOR_COMPACT_BLOAT_RATIO times the size of its live data. A
+    shard of the shared layout has no directory of its own, so it is rebuilt
+    when at least a quarter of its chunks were orphans.
+    """
+    import chromadb
+
+    report = {'collection': name, 'orphans': 0, 'rebuilt': False, 'bytes_before': directory_size(path)}
+    shadow = f"{name}-compact"
+
+    collection = None
+    with store_lock(path, exclusive=True):
+        # Archived since the caller looked; opening it would create an empty store
+        if os.path.isdir(path):
+            refresh_client(path)
+            inode = os.stat(path).st_ino
+            client = chromadb.PersistentClient(path=path)
+            recover_shadow(client, name, shadow)
+            try:
+                collection = client.get_collection(name=name)
+            except Exception:
+                pass
+    if collection is None:
+        report['bytes_after'] = report['bytes_before']
+        report['bytes_reclaimed'] = 0
+        return report
+
+    with store_lock(path):
+        orphans = {}
+        live_bytes = 0
+        for page in _iter_records(collection, ['metadatas', 'documents']):
+            for chunk_id, metadata, text in zip(page['ids'], page['metadatas'], page['documents']):
+                doc_id = (metadata or {}).get('doc_id')
+                if doc_id not in known_doc_ids:
+                    orphans.setdefault(doc_id, []).append(chunk_id)
+                    continue
+                live_bytes += len((text or '').encode('utf-8')) + len(json.dumps(metadata))
+        # Documents uploaded during the scan are not in known_doc_ids
+        for doc_id in _existing_doc_ids(set(orphans) - {None}):
+            del orphans[doc_id]
+        orphans = [chunk_id for chunk_ids in orphans.values() for chunk_id in chunk_ids]
+        total = collection.count()
+        live_count = total - len(orphans)
+        # Embedding payload: float32 per dimension
+        dimension = len(collection.peek(1)['embeddings'][0]) if total else 0
+        live_bytes += live_count * dimension * 4
+
+        report['orphans'] = len(orphans)
+        report['live_records'] = live_count
+        if rebuild is None:
+            if shared:
+                rebuild = bool(total) and len(orphans) >= total / 4
+            else:
+                # Small stores are mostly preallocated index space, not worth rebuilding
+                rebuild = (
+                    report['bytes_before'] >= settings.VECTOR_COMPACT_MIN_BYTES
+                    and report['bytes_before'] > settings.VECTOR_COMPACT_BLOAT_RATIO * live_bytes
+                )
+
+        if not dry_run:
+            for start in range(0, len(orphans), PAGE_SIZE):
+                collection.delete(ids=orphans[start:start + PAGE_SIZE])
+            if rebuild:
+                _copy_to_shadow(client, name, shadow)
+                # Uploads and deletes keep running during the copy
+                if not catch_up(collection, client.get_collection(name=shadow), _copy_records):
+                    # Still changing under us; try again next run
+                    client.delete_collection(name=shadow)
+                    logger.warning(f"Skipped rebuild of {name}: chunks kept changing during the copy")
+                    rebuild = False
+
+    if not dry_run:
+        if rebuild:
+            report['rebuilt'] = swap_shadow(client, path, inode, name, shadow, _copy_records)
+        with store_lock(path):
+            if os.path.isdir(path):
+                _vacuum(path)
+
+    report['bytes_after'] = directory_size(path)
+    report['bytes_reclaimed'] = report['bytes_before'] - report['bytes_after']
+    return report
+
+
+def compact_user_store(user_id: int, rebuild: bool = None, dry_run: bool = False) -> dict:
+    known = set(UserDocument.objects.filter(user_id=user_id).values_list('id', flat=True))
+    report = compact_collection(
+        vector_store_path(user_id, 'per_user'), collection_name(user_id, 'per_user'),
+        known, rebuild=rebuild, dry_run=dry_run,
+    )
+    report['user_id'] = user_id
+    return report
+
+
+def compact_shared_store(rebuild: bool = None, dry_run: bool = False) -> list:
+    # Document ids are global, so one set covers every tenant in every shard
+    known = set(UserDocument.objects.values_list('id', flat=True))
+    path = str(settings.SHARED_VECTOR_DB_PATH)
+    return [
+        compact_collection(path, f"shard_{shard:03d}", known, rebuild=rebuild, dry_run=dry_run, shared=True)
+        for shard in range(settings.VECTOR_STORE_SHARDS)
+    ]
+
+
+def user_store_dirs() -> dict:
+    """Map of user id to vector store directory for every store on disk."""
+    root = str(settings.PERSONAL_VECTOR_DB_PATH)
+    if not os.path.isdir(root):
+        return {}
+    stores = {}
+    for entry in os.listdir(root):
+        match = USER_DIR_PATTERN.match(entry)
+        if match:
+            stores[int(match.group(1))] = os.path.join(root, entry)
+    return stores
+
+
+def compact_vector_stores(user_ids: list = None, rebuild: bool = None, dry_run: bool = False) -> dict:
+    """Garbage-collect orphaned stores and chunks and compact every user's store."""
+    summary = {'stores': 0, 'orphan_chunks': 0, 'orphan_dirs': 0, 'rebuilt': 0, 'bytes_reclaimed': 0, 'reports': []}
+
+    if user_ids is None:
+        stores = user_store_dirs()
+        user_ids = set(get_user_model().objects.filter(id__in=stores).values_list('id', flat=True))
+        # Stores of deleted users
+        for user_id, path in stores.items():
+            if user_id in user_ids:
+                continue
+            size = directory_size(path)
+            if not dry_run:
+                with store_lock(path, exclusive=True):
+                    shutil.rmtree(path, ignore_errors=True)
+                    release_client(path)
+            summary['orphan_dirs'] += 1
+            summary['bytes_reclaimed'] += size
+            logger.info(f"Removed vector store of deleted user at {path} ({size} bytes)")
+
+    reports = []
+    if shared_mode():
+        if os.path.isdir(str(settings.SHARED_VECTOR_DB_PATH)):
+            reports = compact_shared_store(rebuild=rebuild, dry_run=dry_run)
+        user_ids = []
+
+    for user_id in user_ids:
+        if not os.path.isdir(vector_store_path(user_id, 'per_user')):
+            continue
+        try:
+            reports.append(compact_user_store(user_id, rebuild=rebuild, dry_run=dry_run))
+        except Exception as e:
+            logger.error(f"Compaction of user {user_id} vector store failed: {e}")
+
+    for report in reports:
+        summary['stores'] += 1
+        summary['orphan_chunks'] += report['orphans']
+        summary['rebuilt'] += int(report['rebuilt'])
+        summary['bytes_reclaimed'] += report['bytes_reclaimed']
+        summary['reports'].append(report)
+
+    logger.info(
+        f"Vector store compaction: {summary['stores']} stores, {summary['orphan_chunks']} orphan chunks, "
+        f"{summary['orphan_dirs']} orphan directories, {summary['bytes_reclaimed']} bytes reclaimed"
+    )
+    return summary
@@ -0,0 +1,68 @@
+import logging
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import UserDocument
+from .personal_service import PersonalRAGService
+
+logger = logging.getLogger(__name__)
+
+# Failed purges are retried after 1, 2, 4, ... minutes, at most this far apart
+MAX_PURGE_RETRY_DELAY = timedelta(days=1)
+
+
+def tombstone_document(document: UserDocument):
+    """Hide a document from retrieval immediately; purge_deleted_documents removes it later."""
+    document.deleted_at = timezone.now()
+    document.save(update_fields=['deleted_at'])
+
+
+def _postpone_purge(documents: list):
+    # Keep the tombstones, but let other documents go first until the retry is due
+    now = timezone.now()
+    for document in documents:
+        document.purge_attempts += 1
+        delay = min(timedelta(minutes=2 ** min(document.purge_attempts - 1, 20)), MAX_PURGE_RETRY_DELAY)
+        document.purge_retry_at = now + delay
+        document.save(update_fields=['purge_attempts', 'purge_retry_at'])
+
+
+def purge_deleted_documents(limit: int = None) -> int:
+    """
+    Delete the vectors, file and row of tombstoned documents, oldest first.
+    Documents whose purge failed are retried with a growing delay. Archived
+    stores are restored to purge them without resetting their idle clock.
+    """
+    limit = limit or settings.DOCUMENT_PURGE_BATCH_SIZE
+    documents = list(
+        UserDocument.objects.filter(deleted_at__isnull=False)
+        .filter(Q(purge_retry_at__isnull=True) | Q(purge_retry_at__lte=timezone.now()))
+        .order_by('deleted_at', 'id')[:limit]
+    )
+    # Each user's store is opened once; the sort is stable, so oldest first within a user too
+    documents.sort(key=lambda document: document.user_id)
+
+    purged = 0
+    for user_id, user_documents in groupby(documents, key=lambda document: document.user_id):
+        user_documents = list(user_documents)
+        try:
+            service = PersonalRAGService(user_id, record_access=False)
+        except Exception as e:
+            logger.error(f"Could not open the vector store of user {user_id} to purge deleted documents: {e}")
+            _postpone_purge(user_documents)
+            continue
+        for document in user_documents:
+            # delete_document logs its own errors and returns False
+            if not service.delete_document(document.id):
+                _postpone_purge([document])
+                continue
+            document.delete()
+            purged += 1
+
+    if purged:
+        logger.info(f"Purged {purged} deleted documents")
+    return purged
@@ -0,0 +1,37 @@
+"""
+Local stand-in for ChatGroq, used when RAG_LLM_BACKEND=fake (load tests,
+offline development). It never calls the network: it waits
+FAKE_LLM_LATENCY_MS for the first token, then emits FAKE_LLM_TOKENS tokens
+FAKE_LLM_TOKEN_MS apart, like a streaming completion.
+"""
+import time
+
+from django.conf import settings
+
+
+class FakeChatModel:
+
+    def __init__(self, latency_ms: float = None, tokens: int = None, token_ms: float = None):
+        self.latency_ms = settings.FAKE_LLM_LATENCY_MS if latency_ms is None else latency_ms
+        self.tokens = settings.FAKE_LLM_TOKENS if tokens is None else tokens
+        self.token_ms = settings.FAKE_LLM_TOKEN_MS if token_ms is None else token_ms
+
+    def _words(self, prompt: str):
+        # Echo words from the prompt so answers vary with the retrieved context
+        words = str(prompt).split() or ['fake']
+        for i in range(self.tokens):
+            yield words[(i * 7) % len(words)]
+
+    def stream(self, prompt):
+        from langchain_core.messages import AIMessageChunk
+
+        time.sleep(self.latency_ms / 1000)
+        for i, word in enumerate(self._words(prompt)):
+            if i:
+                time.sleep(self.token_ms / 1000)
+            yield AIMessageChunk(content=word if i == 0 else f" {word}")
+
+    def invoke(self, prompt):
+        from langchain_core.messages import AIMessage
+
+        return AIMessage(content=''.join(chunk.content for chunk in self.stream(prompt)))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from rag_service.tiering import archive_idle_stores
+
+
+class Command(BaseCommand):
+    help = "Move vector stores of idle users to compressed archives in cold storage."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--idle-days', type=int, default=None,
+                            help="Archive stores not accessed for this many days (default: VECTOR_STORE_IDLE_DAYS)")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report what would be archived without changing anything")
+
+    def handle(self, *args, **options):
+        summary = archive_idle_stores(idle_days=options['idle_days'], dry_run=options['dry_run'])
+        prefix = "Would archive" if options['dry_run'] else "Archived"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {summary['archived']} stores, freeing {summary['bytes_freed']} bytes on the hot tier "
+            f"({summary['archive_bytes']} bytes of archives, {summary['recovered']} interrupted moves recovered, "
+            f"{summary['orphan_archives']} orphan archives removed)"
+        ))
+        if summary['failed']:
+            self.stdout.write(self.style.WARNING(f"Failed for users: {summary['failed']}"))
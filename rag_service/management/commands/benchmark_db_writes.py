@@ -0,0 +1,167 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+TABLE = 'askrag_write_benchmark'
+
+# Environment for each profile; sqlite profiles run against a scratch file
+PROFILES = {
+    'sqlite-baseline': {'DB_PROFILE': 'sqlite', 'SQLITE_TUNING': '0', 'DB_CONN_MAX_AGE': '0'},
+    'sqlite': {'DB_PROFILE': 'sqlite'},
+    'postgres': {'DB_PROFILE': 'postgres'},
+}
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0
+
+
+def run_benchmark(writers: int, writes: int, readers: int, body_size: int) -> dict:
+    """Concurrent single-row write transactions, shaped like ChatHistory inserts."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {TABLE} "
+            f"(user_id INTEGER NOT NULL, body TEXT NOT NULL, created_at TIMESTAMP NOT NULL)"
+        )
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_user_idx ON {TABLE} (user_id, created_at)")
+        cursor.execute(f"DELETE FROM {TABLE}")
+    close_old_connections()
+
+    body = 'x' * body_size
+    latencies = []
+    errors = []
+    reads = [0]
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def write(user_id):
+        own = []
+        try:
+            for _ in range(writes):
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        with connection.cursor() as cursor:
+                            cursor.execute(
+                                f"INSERT INTO {TABLE} (user_id, body, created_at) VALUES (%s, %s, %s)",
+                                [user_id, body, timezone.now()],
+                            )
+                    own.append((time.perf_counter() - started) * 1000)
+                except Exception as e:
+                    with lock:
+                        errors.append(str(e))
+                # End of a request: closes the connection unless it is persistent
+                close_old_connections()
+        finally:
+            connection.close()
+            with lock:
+                latencies.extend(own)
+
+    def read(user_id):
+        try:
+            while not done.is_set():
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"SELECT body FROM {TABLE} WHERE user_id = %s ORDER BY created_at DESC LIMIT 50", [user_id]
+                    )
+                    cursor.fetchall()
+                with lock:
+                    reads[0] += 1
+                close_old_connections()
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+        finally:
+            connection.close()
+
+    reader_threads = [threading.Thread(target=read, args=(n,)) for n in range(readers)]
+    writer_threads = [threading.Thread(target=write, args=(n,)) for n in range(writers)]
+    for thread in reader_threads:
+        thread.start()
+    started = time.perf_counter()
+    for thread in writer_threads:
+        thread.start()
+    for thread in writer_threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    for thread in reader_threads:
+        thread.join()
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE {TABLE}")
+
+    return {
+        'writes': len(latencies),
+        'writes_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'reads_per_second': round(reads[0] / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(_percentile(latencies, 50), 2),
+        'p95_ms': round(_percentile(latencies, 95), 2),
+        'p99_ms': round(_percentile(latencies, 99), 2),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else '',
+    }
+
+
+class Command(BaseCommand):
+    help = "Measure concurrent write throughput for each database profile (see askrag/db.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', choices=PROFILES, action='append', dest='profiles',
+                            help="Profile to run (repeatable; default: sqlite-baseline and sqlite)")
+        parser.add_argument('--writers', type=int, default=16, help="Concurrent writer threads")
+        parser.add_argument('--writes', type=int, default=200, help="Writes per writer")
+        parser.add_argument('--readers', type=int, default=4, help="Concurrent reader threads")
+        parser.add_argument('--body-size', type=int, default=1024, help="Bytes per row")
+        parser.add_argument('--child', action='store_true', help="Internal: run against the current database")
+
+    def handle(self, *args, **options):
+        if options['child']:
+            result = run_benchmark(options['writers'], options['writes'], options['readers'], options['body_size'])
+            self.stdout.write(json.dumps(result))
+            return
+
+        results = []
+        for profile in options['profiles'] or ['sqlite-baseline', 'sqlite']:
+            self.stdout.write(f"Benchmarking {profile}...")
+            env = dict(os.environ, **PROFILES[profile])
+            scratch = None
+            if profile.startswith('sqlite'):
+                scratch = tempfile.mkdtemp(prefix='askrag-dbbench-')
+                env['DB_PATH'] = os.path.join(scratch, 'bench.sqlite3')
+            try:
+                # Settings are read at startup, so every profile needs its own process
+                proc = subprocess.run(
+                    [sys.executable, sys.argv[0], 'benchmark_db_writes', '--child',
+                     '--writers', str(options['writers']), '--writes', str(options['writes']),
+                     '--readers', str(options['readers']), '--body-size', str(options['body_size'])],
+                    capture_output=True, text=True, env=env,
+                )
+            finally:
+                if scratch:
+                    shutil.rmtree(scratch, ignore_errors=True)
+            if proc.returncode != 0:
+                raise CommandError(f"{profile} benchmark failed:\n{proc.stderr[-2000:]}")
+            results.append(dict(json.loads(proc.stdout.strip().splitlines()[-1]), profile=profile))
+
+        self.stdout.write(
+            f"{'profile':<16} {'writes/s':>9} {'reads/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        )
+        for r in results:
+            self.stdout.write(
+                f"{r['profile']:<16} {r['writes_per_second']:>9} {r['reads_per_second']:>9} {r['p50_ms']:>8} "
+                f"{r['p95_ms']:>8} {r['p99_ms']:>8} {r['errors']:>7}"
+            )
+        for r in results:
+            if r['first_error']:
+                self.stdout.write(self.style.WARNING(f"{r['profile']}: {r['first_error']}"))
@@ -0,0 +1,144 @@
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+LAYOUTS = ('per_user', 'shared')
+
+
+def _open_files() -> int:
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return -1
+
+
+def _rss_mb() -> float:
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is the peak, in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _vector(rng, dimension):
+    return [rng.random() for _ in range(dimension)]
+
+
+def run_layout(layout: str, root: str, users: int, chunks: int, dimension: int, shards: int, queries: int, seed: int) -> dict:
+    """Load synthetic tenants into one layout and measure it. Runs in its own process."""
+    import chromadb
+
+    rng = random.Random(seed)
+    baseline_rss = _rss_mb()
+    baseline_files = _open_files()
+    collections = {}
+
+    started = time.monotonic()
+    if layout == 'per_user':
+        for user_id in range(users):
+            client = chromadb.PersistentClient(path=os.path.join(root, f"user_{user_id}"))
+            collection = client.get_or_create_collection(name=f"user_{user_id}_docs")
+            collection.add(
+                ids=[f"{user_id}-{i}" for i in range(chunks)],
+                embeddings=[_vector(rng, dimension) for _ in range(chunks)],
+                metadatas=[{'doc_id': i, 'user_id': user_id} for i in range(chunks)],
+            )
+            collections[user_id] = collection
+    else:
+        client = chromadb.PersistentClient(path=root)
+        shard_collections = [client.get_or_create_collection(name=f"shard_{n:03d}") for n in range(shards)]
+        for user_id in range(users):
+            collection = shard_collections[user_id % shards]
+            collection.add(
+                ids=[f"{user_id}-{i}" for i in range(chunks)],
+                embeddings=[_vector(rng, dimension) for _ in range(chunks)],
+                metadatas=[{'doc_id': i, 'user_id': user_id} for i in range(chunks)],
+            )
+            collections[user_id] = collection
+    load_seconds = time.monotonic() - started
+
+    latencies = []
+    for _ in range(queries):
+        user_id = rng.randrange(users)
+        where = {'user_id': user_id} if layout == 'shared' else None
+        query_started = time.perf_counter()
+        collections[user_id].query(query_embeddings=[_vector(rng, dimension)], n_results=5, where=where)
+        latencies.append((time.perf_counter() - query_started) * 1000)
+
+    return {
+        'layout': layout,
+        'users': users,
+        'load_seconds': round(load_seconds, 1),
+        'rss_mb': round(_rss_mb() - baseline_rss, 1),
+        'open_files': _open_files() - baseline_files,
+        'p50_ms': round(_percentile(latencies, 50), 2),
+        'p95_ms': round(_percentile(latencies, 95), 2),
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare the per-user and shared vector store layouts: memory, open files and p95 query latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--chunks-per-user', type=int, default=20)
+        parser.add_argument('--dimension', type=int, default=384, help="Embedding size (all-MiniLM-L6-v2 is 384)")
+        parser.add_argument('--shards', type=int, default=16)
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--layout', choices=LAYOUTS, action='append', dest='layouts',
+                            help="Only run this layout (repeatable)")
+        parser.add_argument('--child', action='store_true', help="Internal: run one layout and print JSON")
+
+    def handle(self, *args, **options):
+        if options['child']:
+            root = tempfile.mkdtemp(prefix='askrag-bench-')
+            try:
+                result = run_layout(
+                    options['layouts'][0], root, options['users'], options['chunks_per_user'],
+                    options['dimension'], options['shards'], options['queries'], options['seed'],
+                )
+            finally:
+                shutil.rmtree(root, ignore_errors=True)
+            self.stdout.write(json.dumps(result))
+            return
+
+        results = []
+        for layout in options['layouts'] or LAYOUTS:
+            self.stdout.write(f"Benchmarking {layout} layout with {options['users']} users...")
+            # Each layout runs in a fresh process so memory and open files are not shared
+            proc = subprocess.run(
+                [sys.executable, sys.argv[0], 'benchmark_vector_layout', '--child', '--layout', layout,
+                 '--users', str(options['users']), '--chunks-per-user', str(options['chunks_per_user']),
+                 '--dimension', str(options['dimension']), '--shards', str(options['shards']),
+                 '--queries', str(options['queries']), '--seed', str(options['seed'])],
+                capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                raise CommandError(f"{layout} benchmark failed:\n{proc.stderr[-2000:]}")
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+        header = f"{'layout':<10} {'users':>7} {'load s':>8} {'RSS MB':>8} {'open files':>11} {'p50 ms':>8} {'p95 ms':>8}"
+        self.stdout.write(header)
+        for r in results:
+            self.stdout.write(
+                f"{r['layout']:<10} {r['users']:>7} {r['load_seconds']:>8} {r['rss_mb']:>8} "
+                f"{r['open_files']:>11} {r['p50_ms']:>8} {r['p95_ms']:>8}"
+            )
@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules that must only be imported on first RAG use, never at startup
+HEAVY_MODULES = [
+    'chromadb',
+    'torch',
+    'sentence_transformers',
+    'langchain_huggingface',
+    'langchain_community',
+    'langchain_groq',
+]
+
+STARTUP_SCRIPT = (
+    "import django; django.setup(); "
+    "import askrag.urls, rag_service.views, rag_user.views"
+)
+
+
+class Command(BaseCommand):
+    help = "Measure startup import time with -X importtime and fail if it exceeds the budget."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget-ms', type=int, default=settings.IMPORT_TIME_BUDGET_MS,
+                            help="Maximum cumulative import time in milliseconds")
+        parser.add_argument('--top', type=int, default=10,
+                            help="Number of slowest top-level imports to show")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'askrag.settings'))
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise CommandError(f"Startup import failed:\n{proc.stderr[-2000:]}")
+
+        # Lines look like: "import time:   self [us] | cumulative | imported package"
+        top_level = []
+        imported = set()
+        for line in proc.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            imported.add(name.strip())
+            if not name.startswith('  '):
+                top_level.append((int(cumulative), name.strip()))
+
+        total_ms = sum(us for us, _ in top_level) / 1000
+        for us, name in sorted(top_level, reverse=True)[:options['top']]:
+            self.stdout.write(f"{us / 1000:9.1f} ms  {name}")
+        self.stdout.write(f"Total startup import time: {total_ms:.1f} ms (budget {options['budget_ms']} ms)")
+
+        leaked = [name for name in HEAVY_MODULES if name in imported]
+        if leaked:
+            raise CommandError(f"Heavy modules imported at startup: {', '.join(leaked)}")
+        if total_ms > options['budget_ms']:
+            raise CommandError(f"Startup import time {total_ms:.1f} ms exceeds budget of {options['budget_ms']} ms")
+        self.stdout.write(self.style.SUCCESS("Import time within budget"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from rag_service.compaction import compact_vector_stores
+
+
+class Command(BaseCommand):
+    help = "Remove orphaned chunks and vector stores, then compact fragmented collections."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="Only compact this user's store (repeatable)")
+        parser.add_argument('--rebuild', action='store_true', default=None,
+                            help="Rebuild every collection, not only fragmented ones")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Report what would be removed without changing anything")
+
+    def handle(self, *args, **options):
+        summary = compact_vector_stores(
+            user_ids=options['user_ids'],
+            rebuild=options['rebuild'],
+            dry_run=options['dry_run'],
+        )
+        for report in summary['reports']:
+            self.stdout.write(
+                f"{report['collection']}: {report['orphans']} orphan chunks, "
+                f"{'rebuilt, ' if report['rebuilt'] else ''}{report['bytes_reclaimed']} bytes reclaimed"
+            )
+        prefix = "Would reclaim" if options['dry_run'] else "Reclaimed"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {summary['bytes_reclaimed']} bytes from {summary['stores']} stores "
+            f"({summary['orphan_chunks']} orphan chunks, {summary['orphan_dirs']} orphan directories, "
+            f"{summary['rebuilt']} rebuilt)"
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from rag_service.snapshots import export_user_store
+
+
+class Command(BaseCommand):
+    help = "Write a user's chunks, vectors and metadata to a binary snapshot file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, required=True, dest='user_id')
+        parser.add_argument('--output', required=True, help="Snapshot file to write")
+
+    def handle(self, *args, **options):
+        result = export_user_store(options['user_id'], options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {result['chunks']} chunks ({result['dimension']} dimensions, "
+            f"{result['embedding_model']}) to {options['output']}, {result['bytes']} bytes"
+        ))
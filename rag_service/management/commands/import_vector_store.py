@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rag_service.snapshots import SnapshotError, import_user_store
+
+
+class Command(BaseCommand):
+    help = "Load a snapshot written by export_vector_store into a user's vector store without re-embedding."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Snapshot file to read")
+        parser.add_argument('--user', type=int, default=None, dest='user_id',
+                            help="Import into this user instead of the one recorded in the snapshot")
+        parser.add_argument('--replace', action='store_true',
+                            help="Clear the user's existing store first")
+
+    def handle(self, *args, **options):
+        try:
+            result = import_user_store(options['path'], user_id=options['user_id'], replace=options['replace'])
+        except SnapshotError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Imported {result['chunks']} chunks for user {result['user_id']}"))
+        if result['orphans']:
+            self.stdout.write(self.style.WARNING(
+                f"{result['orphans']} chunks belong to documents missing from this database "
+                f"and will be removed by compact_vector_stores"
+            ))
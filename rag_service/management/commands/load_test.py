@@ -0,0 +1,382 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+
+from rag_service.timing import parse_server_timing
+
+OPERATIONS = ('chat', 'batch', 'upload', 'history')
+DEFAULT_MIX = 'chat=70,history=20,upload=10'
+USER_PREFIX = 'loadtest'
+
+WORDS = (
+    "invoice refund policy contract warranty shipping delivery payment account support customer order "
+    "product service report quarter revenue budget forecast meeting schedule project deadline team "
+    "security password access network server database backup storage release version feature issue"
+).split()
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise CommandError(f"Unknown operation {name!r} in --mix, expected {', '.join(OPERATIONS)}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f"Invalid weight for {name} in --mix: {weight!r}")
+    if not any(weight > 0 for weight in mix.values()):
+        raise CommandError("--mix needs at least one operation with a positive weight")
+    return mix
+
+
+def synthetic_text(rng: random.Random, size: int) -> str:
+    sentences = []
+    length = 0
+    while length < size:
+        sentence = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + '.'
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return '\n'.join(sentences)
+
+
+def _question(rng: random.Random) -> str:
+    return f"What does the document say about {rng.choice(WORDS)} and {rng.choice(WORDS)}?"
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+class InProcessTransport:
+    """Calls the app through Django's test client: full middleware, URL routing and views, no sockets."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _client(self):
+        from django.test import Client
+
+        if not hasattr(self._local, 'client'):
+            self._local.client = Client(raise_request_exception=False)
+        return self._local.client
+
+    def send(self, method: str, path: str, token: str, body: dict = None, upload: tuple = None):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        client = self._client()
+        headers = {'HTTP_AUTHORIZATION': f"Bearer {token}"}
+        if method == 'GET':
+            response = client.get(path, **headers)
+        elif upload is not None:
+            name, content = upload
+            response = client.post(path, {'file': SimpleUploadedFile(name, content)}, **headers)
+        else:
+            response = client.post(path, json.dumps(body), content_type='application/json', **headers)
+        return response.status_code, response.get('Server-Timing', '')
+
+    def close(self):
+        connection.close()
+
+
+class HttpTransport:
+    """Calls a running server over HTTP, e.g. http://127.0.0.1:8000."""
+
+    def __init__(self, base_url: str, timeout: float):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def send(self, method: str, path: str, token: str, body: dict = None, upload: tuple = None):
+        headers = {'Authorization': f"Bearer {token}"}
+        data = None
+        if upload is not None:
+            name, content = upload
+            boundary = uuid.uuid4().hex
+            data = (
+                f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{name}\"\r\n"
+                f"Content-Type: application/octet-stream\r\n\r\n"
+            ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+            headers['Content-Type'] = f"multipart/form-data; boundary={boundary}"
+        elif body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status, response.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, e.headers.get('Server-Timing', '')
+        except OSError:
+            # Refused, reset or timed out
+            return 0, ''
+
+    def close(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the app with many synthetic users and a mix of chat, upload and history requests, "
+        "then report throughput, latency percentiles, error rates and per-stage timings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help="Base URL of a running server; by default requests run in-process")
+        parser.add_argument('--users', type=int, default=20, help="Synthetic users to create")
+        parser.add_argument('--concurrency', type=int, default=8, help="Concurrent clients")
+        parser.add_argument('--duration', type=float, default=30, help="Seconds to run")
+        parser.add_argument('--requests', type=int, help="Stop after this many requests instead")
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help=f"Weighted operations from {', '.join(OPERATIONS)} (default: {DEFAULT_MIX})")
+        parser.add_argument('--doc-size', type=int, default=20000, help="Characters per synthetic document")
+        parser.add_argument('--llm-latency-ms', type=float, default=None, help="Fake LLM time to first token")
+        parser.add_argument('--llm-tokens', type=int, default=None, help="Fake LLM tokens per answer")
+        parser.add_argument('--llm-token-ms', type=float, default=None, help="Fake LLM delay between tokens")
+        parser.add_argument('--timeout', type=float, default=120, help="HTTP timeout per request")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', dest='json_path', help="Also write the report to this file")
+        parser.add_argument('--max-error-rate', type=float,
+                            help="Exit with an error if the overall error rate (0-1) is higher")
+        parser.add_argument('--max-p95-ms', type=float,
+                            help="Exit with an error if any operation's p95 latency is higher")
+        parser.add_argument('--keep', action='store_true', help="Keep the synthetic users and their documents")
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        if options['users'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--users and --concurrency must be at least 1")
+
+        if options['url']:
+            transport = HttpTransport(options['url'], options['timeout'])
+            self.stdout.write(
+                "Over HTTP the server's own settings apply: start it with RAG_LLM_BACKEND=fake and "
+                "SERVER_TIMING=1 to get the fake LLM and per-stage timings."
+            )
+            overrides = {}
+        else:
+            transport = InProcessTransport()
+            overrides = {'RAG_LLM_BACKEND': 'fake', 'SERVER_TIMING': True}
+            for option, setting in (('llm_latency_ms', 'FAKE_LLM_LATENCY_MS'), ('llm_tokens', 'FAKE_LLM_TOKENS'),
+                                    ('llm_token_ms', 'FAKE_LLM_TOKEN_MS')):
+                if options[option] is not None:
+                    overrides[setting] = options[option]
+
+        run_id = uuid.uuid4().hex[:8]
+        users = self._create_users(run_id, options['users'])
+        try:
+            with override_settings(**overrides):
+                self._seed(transport, users, options)
+                results, elapsed = self._run(transport, users, mix, options)
+        finally:
+            if not options['keep']:
+                self._cleanup(users)
+
+        report = self._report(results, elapsed, options)
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(report, f, indent=2)
+        self._check_thresholds(report, options)
+
+    def _create_users(self, run_id: str, count: int) -> list:
+        from django.contrib.auth import get_user_model
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        User = get_user_model()
+        users = []
+        for n in range(count):
+            user = User(username=f"{USER_PREFIX}_{run_id}_{n}", email=f"{USER_PREFIX}_{run_id}_{n}@example.invalid")
+            user.set_unusable_password()
+            user.save()
+            users.append((user, str(RefreshToken.for_user(user).access_token)))
+        self.stdout.write(f"Created {count} synthetic users ({USER_PREFIX}_{run_id}_*)")
+        return users
+
+    def _seed(self, transport, users: list, options: dict):
+        # One document per user so chat requests have something to retrieve
+        rng = random.Random(options['seed'])
+        documents = [synthetic_text(rng, options['doc_size']).encode() for _ in users]
+        failures = []
+        pending = list(zip(users, documents))
+        lock = threading.Lock()
+
+        def seed():
+            try:
+                while True:
+                    with lock:
+                        if not pending:
+                            return
+                        (user, token), content = pending.pop()
+                    status, _ = transport.send('POST', '/upload/', token, upload=(f"seed_{user.id}.txt", content))
+                    if status != 201:
+                        with lock:
+                            failures.append(status)
+            finally:
+                transport.close()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=seed) for _ in range(min(options['concurrency'], len(users)))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if len(failures) == len(users):
+            raise CommandError(f"Seeding failed for every user (statuses: {sorted(set(failures))})")
+        self.stdout.write(
+            f"Seeded {len(users) - len(failures)} documents in {time.perf_counter() - started:.1f}s"
+            + (f" ({len(failures)} failed)" if failures else "")
+        )
+
+    def _run(self, transport, users: list, mix: dict, options: dict):
+        operations = [name for name in mix if mix[name] > 0]
+        weights = [mix[name] for name in operations]
+        deadline = time.perf_counter() + options['duration']
+        budget = [options['requests']]
+        results = []
+        lock = threading.Lock()
+
+        def take() -> bool:
+            if budget[0] is None:
+                return time.perf_counter() < deadline
+            with lock:
+                if budget[0] <= 0:
+                    return False
+                budget[0] -= 1
+                return True
+
+        def client(index: int):
+            rng = random.Random(options['seed'] * 1000 + index)
+            own = []
+            try:
+                while take():
+                    operation = rng.choices(operations, weights)[0]
+                    user, token = rng.choice(users)
+                    started = time.perf_counter()
+                    if operation == 'chat':
+                        status, timing = transport.send('POST', '/chat/', token, body={'question': _question(rng)})
+                    elif operation == 'batch':
+                        questions = [_question(rng) for _ in range(3)]
+                        status, timing = transport.send('POST', '/chat/batch/', token, body={'questions': questions})
+                    elif operation == 'upload':
+                        content = synthetic_text(rng, options['doc_size']).encode()
+                        status, timing = transport.send('POST', '/upload/', token,
+                                                        upload=(f"doc_{uuid.uuid4().hex[:8]}.txt", content))
+                    else:
+                        status, timing = transport.send('GET', '/chat-history/?page_size=20', token)
+                    latency = (time.perf_counter() - started) * 1000
+                    own.append((operation, status, latency, parse_server_timing(timing)))
+            finally:
+                transport.close()
+                with lock:
+                    results.extend(own)
+
+        self.stdout.write(f"Running {options['concurrency']} clients with mix {options['mix']}...")
+        started = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - started
+
+    def _cleanup(self, users: list):
+        from rag_service.models import UserDocument
+        from rag_service.personal_service import clear_vector_store
+
+        for user, _ in users:
+            # Document.delete() removes the stored files; the queryset cascade would not
+            for document in UserDocument.objects.filter(user=user):
+                document.delete()
+            clear_vector_store(user.id)
+            user.delete()
+        self.stdout.write(f"Removed {len(users)} synthetic users and their documents")
+
+    def _summarize(self, rows: list, elapsed: float) -> dict:
+        latencies = [latency for _, _, latency, _ in rows]
+        errors = [status for _, status, _, _ in rows if status == 0 or status >= 400]
+        stage_names = []
+        for _, _, _, timings in rows:
+            stage_names.extend(name for name in timings if name not in stage_names)
+        stages = {}
+        for name in stage_names:
+            values = [timings[name] for _, _, _, timings in rows if name in timings]
+            stages[name] = {'mean_ms': round(sum(values) / len(values), 1), 'p95_ms': round(_percentile(values, 95), 1)}
+        statuses = {}
+        for _, status, _, _ in rows:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        return {
+            'requests': len(rows),
+            'throughput': round(len(rows) / elapsed, 2) if elapsed else 0,
+            'error_rate': round(len(errors) / len(rows), 4) if rows else 0,
+            'p50_ms': round(_percentile(latencies, 50), 1),
+            'p95_ms': round(_percentile(latencies, 95), 1),
+            'p99_ms': round(_percentile(latencies, 99), 1),
+            'max_ms': round(max(latencies), 1) if latencies else 0,
+            'statuses': statuses,
+            'stages': stages,
+        }
+
+    def _report(self, results: list, elapsed: float, options: dict) -> dict:
+        report = {
+            'elapsed_s': round(elapsed, 2),
+            'concurrency': options['concurrency'],
+            'users': options['users'],
+            'mix': options['mix'],
+            'transport': options['url'] or 'in-process',
+            'operations': {},
+        }
+        for operation in OPERATIONS:
+            rows = [row for row in results if row[0] == operation]
+            if rows:
+                report['operations'][operation] = self._summarize(rows, elapsed)
+        report['overall'] = self._summarize(results, elapsed)
+
+        self.stdout.write(f"\n{len(results)} requests in {elapsed:.1f}s\n")
+        self.stdout.write(
+            f"{'operation':<10} {'requests':>8} {'req/s':>8} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} "
+            f"{'p99 ms':>9} {'max ms':>9}"
+        )
+        for name, summary in list(report['operations'].items()) + [('all', report['overall'])]:
+            self.stdout.write(
+                f"{name:<10} {summary['requests']:>8} {summary['throughput']:>8} "
+                f"{summary['error_rate'] * 100:>6.1f}% {summary['p50_ms']:>9} {summary['p95_ms']:>9} "
+                f"{summary['p99_ms']:>9} {summary['max_ms']:>9}"
+            )
+
+        self.stdout.write("\nStages (mean / p95 ms, from Server-Timing):")
+        for name, summary in report['operations'].items():
+            stages = summary['stages']
+            if not stages:
+                continue
+            self.stdout.write(
+                f"  {name:<8} " + ', '.join(f"{stage} {s['mean_ms']}/{s['p95_ms']}" for stage, s in stages.items())
+            )
+        for name, summary in report['operations'].items():
+            failed = {status: count for status, count in summary['statuses'].items()
+                      if status == '0' or int(status) >= 400}
+            if failed:
+                self.stdout.write(self.style.WARNING(f"{name} errors by status: {failed}"))
+        return report
+
+    def _check_thresholds(self, report: dict, options: dict):
+        failures = []
+        if options['max_error_rate'] is not None and report['overall']['error_rate'] > options['max_error_rate']:
+            failures.append(f"error rate {report['overall']['error_rate']:.2%} > {options['max_error_rate']:.2%}")
+        if options['max_p95_ms'] is not None:
+            for name, summary in report['operations'].items():
+                if summary['p95_ms'] > options['max_p95_ms']:
+                    failures.append(f"{name} p95 {summary['p95_ms']}ms > {options['max_p95_ms']}ms")
+        if failures:
+            raise CommandError("Load test thresholds exceeded: " + '; '.join(failures))
@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from rag_service.vector_layout import MODES, migrate_vector_stores
+
+
+class Command(BaseCommand):
+    help = ("Move vector data between the per-user and shared layouts without re-embedding. "
+            "Stop the web workers first, then set VECTOR_STORE_MODE to the new layout.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', required=True, choices=MODES, dest='target',
+                            help="Layout to migrate into")
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="Only migrate this user (repeatable)")
+        parser.add_argument('--keep-source', action='store_true',
+                            help="Leave the data in the old layout as well")
+
+    def handle(self, *args, **options):
+        summary = migrate_vector_stores(
+            options['target'],
+            user_ids=options['user_ids'],
+            keep_source=options['keep_source'],
+        )
+        self.stdout.write(f"Migrated {summary['chunks']} chunks for {summary['users']} users to {options['target']}")
+        if summary['failed']:
+            raise CommandError(f"Failed users: {', '.join(map(str, summary['failed']))}")
+        if settings.VECTOR_STORE_MODE != options['target']:
+            self.stdout.write(self.style.WARNING(
+                f"Set VECTOR_STORE_MODE={options['target']} and restart the workers to use the new layout"
+            ))
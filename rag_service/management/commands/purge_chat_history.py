@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from rag_service.retention import purge_chat_history
+
+
+class Command(BaseCommand):
+    help = "Delete chat history older than the retention period in throttled batches (resumes an interrupted run)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CHAT_HISTORY_RETENTION_DAYS,
+                            help="Retention period in days")
+        parser.add_argument('--batch-size', type=int, default=settings.RETENTION_BATCH_SIZE,
+                            help="Rows deleted per transaction")
+        parser.add_argument('--sleep', type=float, default=settings.RETENTION_BATCH_SLEEP,
+                            help="Seconds to sleep between batches")
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help="Stop after this many batches (the run resumes next time)")
+
+    def handle(self, *args, **options):
+        metrics = purge_chat_history(
+            retention_days=options['days'],
+            batch_size=options['batch_size'],
+            sleep_seconds=options['sleep'],
+            max_batches=options['max_batches'],
+        )
+        for key, value in metrics.items():
+            self.stdout.write(f"{key}: {value}")
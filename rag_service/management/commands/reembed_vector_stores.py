@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from rag_service.reembedding import reembed_vector_stores, stale_stores
+
+
+class Command(BaseCommand):
+    help = "Re-embed vector stores built with an older EMBEDDING_MODEL from their stored chunk text."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="Only re-embed this user's store (repeatable)")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Chunks per embedding call (default: REEMBED_BATCH_SIZE)")
+        parser.add_argument('--sleep', type=float, default=None,
+                            help="Seconds to pause between batches (default: REEMBED_BATCH_SLEEP)")
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help="Stop after this many batches; the next run resumes")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="List collections that need re-embedding without changing anything")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            stale = stale_stores(user_ids=options['user_ids'])
+            for store in stale:
+                self.stdout.write(
+                    f"{store['collection']} ({store['path']}): "
+                    f"{store['embedding_model']} version {store['embedding_version']}"
+                )
+            self.stdout.write(self.style.SUCCESS(f"{len(stale)} collections need re-embedding"))
+            return
+
+        summary = reembed_vector_stores(
+            user_ids=options['user_ids'],
+            batch_size=options['batch_size'],
+            sleep_seconds=options['sleep'],
+            max_batches=options['max_batches'],
+        )
+        for report in summary['reports']:
+            if report['embedded'] or report['swapped']:
+                state = 'swapped' if report['swapped'] else 'in progress'
+                self.stdout.write(f"{report['collection']}: {report['embedded']} chunks embedded, {state}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-embedded {summary['embedded']} chunks; {summary['swapped']} collections swapped, "
+            f"{summary['pending']} still pending"
+        ))
+        if summary['failed']:
+            self.stdout.write(self.style.WARNING(f"Failed: {', '.join(summary['failed'])}"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from rag_service.scheduler import MAINTENANCE_JOBS, start_scheduler
+
+
+class Command(BaseCommand):
+    help = "Run the maintenance scheduler in the foreground (joins the same leader election as web workers)."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Registered jobs: {', '.join(MAINTENANCE_JOBS) or 'none'}")
+        try:
+            start_scheduler(block=True)
+        except KeyboardInterrupt:
+            start_scheduler().stop()
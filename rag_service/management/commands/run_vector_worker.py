@@ -0,0 +1,39 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from rag_service.vector_worker import VectorWorker, VectorWorkerServer
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Run the local embedding/retrieval worker shared by all web workers on this node."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=settings.VECTOR_WORKER_SOCKET,
+                            help="Unix socket path (defaults to VECTOR_WORKER_SOCKET)")
+        parser.add_argument('--batch-size', type=int, default=settings.VECTOR_WORKER_BATCH_SIZE,
+                            help="Maximum number of texts per embedding call")
+        parser.add_argument('--batch-wait-ms', type=int, default=settings.VECTOR_WORKER_BATCH_WAIT_MS,
+                            help="How long to wait for more texts before encoding a batch")
+
+    def handle(self, *args, **options):
+        socket_path = options['socket']
+        if not socket_path:
+            raise CommandError("Set VECTOR_WORKER_SOCKET or pass --socket")
+
+        worker = VectorWorker(
+            max_batch=options['batch_size'],
+            max_wait=options['batch_wait_ms'] / 1000,
+        )
+        server = VectorWorkerServer(socket_path, worker)
+        self.stdout.write(self.style.SUCCESS(f"Vector worker listening on {socket_path}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            logger.info("Vector worker stopped")
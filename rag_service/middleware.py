@@ -0,0 +1,97 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+
+from .timing import finish_request, start_request
+
+
+class ServerTimingMiddleware:
+    """
+    Add a Server-Timing header with the request's total time and the stages
+    recorded by rag_service.timing.stage, e.g.
+    `retrieve;dur=41.2, llm;dur=812.0, total;dur=870.3`.
+    Enabled with SERVER_TIMING=1.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SERVER_TIMING:
+            return self.get_response(request)
+
+        start_request()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stages = finish_request()
+        total = (time.perf_counter() - started) * 1000
+        metrics = [f"{name};dur={ms:.1f}" for name, ms in stages.items()]
+        metrics.append(f"total;dur={total:.1f}")
+        response['Server-Timing'] = ', '.join(metrics)
+        return response
+
+
+class SamplingProfilerMiddleware:
+    """
+    Sample the stacks of selected requests into per-endpoint collapsed
+    stacks (rag_service/profiling.py), downloadable by admins from
+    /profiling/. Only installed when PROFILING=1. A request is profiled when:
+
+    - it is picked at random with probability PROFILE_SAMPLE_RATE,
+    - it comes from a user in PROFILE_USER_IDS, or
+    - a staff user sends it with the `X-Profile: 1` header.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        from .profiling import get_profiler
+
+        self.get_response = get_response
+        self.profiler = get_profiler()
+        self.sample_rate = settings.PROFILE_SAMPLE_RATE
+        self.user_ids = {str(user_id) for user_id in settings.PROFILE_USER_IDS}
+
+    def __call__(self, request):
+        if not self._should_profile(request):
+            return self.get_response(request)
+        with self.profiler.profile(self._endpoint(request)):
+            return self.get_response(request)
+
+    def _should_profile(self, request) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        requested = request.META.get('HTTP_X_PROFILE') == '1'
+        if not requested and not self.user_ids:
+            return False
+        user = self._user(request)
+        if user is None:
+            return False
+        return (requested and user.is_staff) or str(user.pk) in self.user_ids
+
+    def _user(self, request):
+        # API requests authenticate in the view, so resolve the JWT here;
+        # the user lookup is usually served by the auth cache
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user
+        from rag_user.authentication import CachedJWTAuthentication
+
+        try:
+            result = CachedJWTAuthentication().authenticate(request)
+        except Exception:
+            return None
+        return result[0] if result else None
+
+    def _endpoint(self, request) -> str:
+        # Routes, not paths, so /documents/<id>/ is one endpoint
+        try:
+            route = resolve(request.path_info).route
+        except Resolver404:
+            return f"{request.method} [unresolved]"
+        return f"{request.method} /{route}"
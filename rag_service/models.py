@@ -1,10 +1,16 @@
 from django.db import models
 from django.conf import settings
 import os
+import uuid
 
 User = settings.AUTH_USER_MODEL
 
 
+def extracted_text_path(file_path: str) -> str:
+    # Plain text extracted at ingestion; citations are read from it by byte offset
+    return f"{file_path}.text"
+
+
 class UserDocument(models.Model):
     # Documents uploaded by users for RAG processing
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='documents')
@@ -13,19 +19,35 @@ class UserDocument(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
     processed = models.BooleanField(default=False)
     chunk_count = models.IntegerField(default=0)
+    # Set when the user deletes the document; vectors are purged in the background
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    # Failed purges of a deleted document back off until purge_retry_at
+    purge_attempts = models.IntegerField(default=0)
+    purge_retry_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.title} - {self.user.username}"
     
     def delete(self, *args, **kwargs):
-        if self.file and os.path.isfile(self.file.path):
-            os.remove(self.file.path)
+        if self.file:
+            for path in (self.file.path, extracted_text_path(self.file.path)):
+                if os.path.isfile(path):
+                    os.remove(path)
         super().delete(*args, **kwargs)
 
     class Meta:
         ordering = ['-uploaded_at']
 
 
+class DocumentChunk(models.Model):
+    # Vector store id of each chunk ingested from a document
+    document = models.ForeignKey(UserDocument, on_delete=models.CASCADE, related_name='chunks')
+    chunk_id = models.CharField(max_length=64)
+
+    def __str__(self):
+        return f"{self.document_id}:{self.chunk_id}"
+
+
 class ChatHistory(models.Model):
     # Stores messages 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_history')
@@ -36,6 +58,122 @@ class ChatHistory(models.Model):
     def __str__(self):
         return f"{self.user.username}: {self.query[:50]}..."
 
+    class Meta:
+        ordering = ['-created_at', '-id']
+        verbose_name_plural = "Chat Histories"
+        indexes = [
+            # Serves the per-user cursor pagination in ChatHistoryView
+            models.Index(fields=['user', 'created_at', 'id'], name='chathistory_user_created_idx'),
+            # Serves the retention cleanup in retention.py
+            models.Index(fields=['created_at'], name='chathistory_created_idx'),
+        ]
+
+
+class RetentionRun(models.Model):
+    # Progress of a chat history cleanup; an unfinished run is resumed next time
+    cutoff = models.DateTimeField()
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    deleted = models.BigIntegerField(default=0)
+    batches = models.IntegerField(default=0)
+
+    def __str__(self):
+        state = 'finished' if self.finished_at else 'in progress'
+        return f"Retention run {self.pk} ({state}, {self.deleted} deleted)"
+
+    class Meta:
+        ordering = ['-started_at']
+
+
+class UploadSession(models.Model):
+    # Resumable chunked upload, assembled under MEDIA_ROOT until finalized
+    STATUS_PENDING = 'pending'
+    STATUS_COMPLETE = 'complete'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_COMPLETE, 'Complete'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    checksum = models.CharField(max_length=64, help_text="Expected SHA-256 of the whole file (hex)")
+    received = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    document = models.ForeignKey(UserDocument, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    error = models.TextField(blank=True, help_text="Why processing failed, when status is failed")
+    # Times resume_stalled_ingestion picked the document up again
+    ingest_attempts = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size}) - {self.user_id}"
+
+    @property
+    def part_path(self):
+        return os.path.join(settings.MEDIA_ROOT, 'uploads', f"{self.id}.part")
+
+    def delete(self, *args, **kwargs):
+        if os.path.isfile(self.part_path):
+            os.remove(self.part_path)
+        super().delete(*args, **kwargs)
+
     class Meta:
         ordering = ['-created_at']
-        verbose_name_plural = "Chat Histories"
\ No newline at end of file
+
+
+
+class SchedulerLock(models.Model):
+    # Leader lock so only one process per deployment runs the scheduler
+    name = models.CharField(max_length=100, primary_key=True)
+    owner = models.CharField(max_length=255)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} held by {self.owner}"
+
+
+class MaintenanceJobStats(models.Model):
+    # Runtime statistics per registered maintenance job
+    job_id = models.CharField(max_length=100, primary_key=True)
+    runs = models.IntegerField(default=0)
+    failures = models.IntegerField(default=0)
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_duration = models.FloatField(default=0, help_text="Seconds")
+    total_duration = models.FloatField(default=0, help_text="Seconds")
+    max_duration = models.FloatField(default=0, help_text="Seconds")
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"{self.job_id} ({self.runs} runs)"
+
+    @property
+    def average_duration(self):
+        return self.total_duration / self.runs if self.runs else 0
+
+    class Meta:
+        verbose_name_plural = "Maintenance job stats"
+
+
+class VectorStoreTier(models.Model):
+    # Last access of a per-user vector store and whether it sits in cold storage
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='vector_store_tier')
+    last_accessed_at = models.DateTimeField(db_index=True)
+    archived_at = models.DateTimeField(null=True, blank=True)
+    archive_size = models.BigIntegerField(default=0, help_text="Bytes")
+    restores = models.IntegerField(default=0)
+    last_restore_duration = models.FloatField(default=0, help_text="Seconds")
+    total_restore_duration = models.FloatField(default=0, help_text="Seconds")
+
+    def __str__(self):
+        state = 'cold' if self.archived_at else 'hot'
+        return f"{self.user_id} ({state})"
+
+    @property
+    def average_restore_duration(self):
+        return self.total_restore_duration / self.restores if self.restores else 0
@@ -0,0 +1,16 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class ChatHistoryCursorPagination(CursorPagination):
+    """
+    Cursor pagination served by the composite index on ChatHistory. DRF
+    encodes the position from created_at alone, plus an offset past rows
+    sharing that timestamp; id only makes the order deterministic. Each page
+    is a range scan from the cursor, so its cost does not grow with depth
+    except for rows created in the same instant.
+    """
+    page_size = settings.CHAT_HISTORY_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.CHAT_HISTORY_MAX_PAGE_SIZE
+    ordering = ('-created_at', '-id')
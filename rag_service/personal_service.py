@@ -1,55 +1,292 @@
-import os,logging,shutil,chromadb
+import os,logging,shutil,threading,uuid
+import fcntl
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
 from django.conf import settings
-from langchain_groq import ChatGroq
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
 
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.prompts import PromptTemplate
-from langchain_core.documents import Document as LangchainDocument
-from langchain_community.document_loaders import TextLoader, PyPDFLoader, Docx2txtLoader
+# chromadb, torch (via langchain_huggingface) and the LangChain loaders take
+# several seconds to import, so they are imported inside the functions that
+# need them. migrate, admin requests and worker boot never pay for them.
+from .timing import stage
+from .vector_worker import RemoteVectorStore, get_worker_client
 
 
 logger = logging.getLogger(__name__)
 
 # Configuration constants
-EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Model of collections created before they were stamped (see embedding_stamp)
+LEGACY_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+LEGACY_EMBEDDING_VERSION = "1"
 LLM_MODEL = "llama-3.3-70b-versatile"
 COLLECTION_NAME = "rag_documents"
 CHUNK_SIZE = 2500
 CHUNK_OVERLAP = 400
 RETRIEVER_K = 5
 RETRIEVER_FETCH_K = 10
+# Separates pages in the extracted text file
+PAGE_BREAK = '\f'
+
+
+_embeddings = {}
+_embeddings_lock = threading.Lock()
+
+
+def get_embeddings(model_name: str = None):
+    # The model is large, so load it once per process instead of per request.
+    # Two models are only loaded side by side while a re-embedding is rolling out.
+    model_name = model_name or settings.EMBEDDING_MODEL
+    with _embeddings_lock:
+        if model_name not in _embeddings:
+            from langchain_huggingface import HuggingFaceEmbeddings
+            _embeddings[model_name] = HuggingFaceEmbeddings(model_name=model_name)
+        return _embeddings[model_name]
+
+
+def embedding_stamp() -> dict:
+    """Collection metadata recording the model that produces new vectors."""
+    return {'embedding_model': settings.EMBEDDING_MODEL, 'embedding_version': settings.EMBEDDING_MODEL_VERSION}
+
+
+def collection_stamp(collection) -> dict:
+    metadata = collection.metadata or {}
+    return {
+        'embedding_model': metadata.get('embedding_model', LEGACY_EMBEDDING_MODEL),
+        'embedding_version': metadata.get('embedding_version', LEGACY_EMBEDDING_VERSION),
+    }
+
+
+def shared_mode(mode: str = None) -> bool:
+    return (mode or settings.VECTOR_STORE_MODE) == 'shared'
+
+
+def vector_store_path(user_id: int, mode: str = None) -> str:
+    if shared_mode(mode):
+        return str(settings.SHARED_VECTOR_DB_PATH)
+    return os.path.join(str(settings.PERSONAL_VECTOR_DB_PATH), f"user_{user_id}")
+
+
+def collection_name(user_id: int, mode: str = None) -> str:
+    if shared_mode(mode):
+        return f"shard_{user_id % settings.VECTOR_STORE_SHARDS:03d}"
+    return f"user_{user_id}_docs"
+
+
+def scoped_where(user_id: int, where: dict = None, mode: str = None) -> dict:
+    """In shared mode every read, count and delete is restricted to the user's chunks."""
+    if not shared_mode(mode):
+        return where or None
+    tenant = {'user_id': user_id}
+    if not where:
+        return tenant
+    return {'$and': [tenant, where]}
+
+
+def open_collection(user_id: int, mode: str = None, record_access: bool = True):
+    import chromadb
+
+    path = vector_store_path(user_id, mode)
+    if not shared_mode(mode):
+        from .tiering import ensure_hot_store
+
+        ensure_hot_store(user_id, record_access=record_access)
+    with store_lock(path):
+        os.makedirs(path, exist_ok=True)
+        refresh_client(path)
+        client = chromadb.PersistentClient(path=path)
+        return client.get_or_create_collection(name=collection_name(user_id, mode), metadata=embedding_stamp())
+
+
+@contextmanager
+def store_lock(path: str, exclusive: bool = False):
+    """
+    Cross-process lock on the vector store at `path`, held on a file next to
+    it. Opening a store and writing to it hold the lock shared; archiving,
+    restoring and swapping in a rebuilt collection hold it exclusively, so no
+    process recreates a store or writes to it while it is being replaced.
+    Never ask for the exclusive lock while holding the shared one.
+    """
+    lock_path = f"{path.rstrip(os.sep)}.lock"
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def count_chunks(collection, user_id: int) -> int:
+    if shared_mode():
+        return len(collection.get(where=scoped_where(user_id), include=[])['ids'])
+    return collection.count()
+
+
+# Inode of each store directory this process has opened a client for
+_client_inodes = {}
+
+# Open services by user id, least recently used first (see get_service)
+_services = OrderedDict()
+_services_lock = threading.Lock()
+
+
+def release_client(path: str):
+    """
+    Drop Chroma's in-process client for `path`. Chroma caches one client per
+    directory, so after the directory is removed the next PersistentClient
+    for that path would otherwise reuse a handle to the deleted database.
+    """
+    from chromadb.api.shared_system_client import SharedSystemClient
+
+    _client_inodes.pop(path, None)
+    with _services_lock:
+        for user_id in [u for u, service in _services.items() if service.vector_store_path == path]:
+            del _services[user_id]
+    SharedSystemClient._identifier_to_refcount.pop(path, None)
+    system = SharedSystemClient._identifier_to_system.pop(path, None)
+    if system is not None:
+        try:
+            system.stop()
+        except Exception as e:
+            logger.warning(f"Error stopping vector store client for {path}: {e}")
+
+
+def refresh_client(path: str):
+    """
+    Release the cached client if `path` was replaced since this process
+    opened it, e.g. archived and restored by another process.
+    """
+    try:
+        inode = os.stat(path).st_ino
+    except FileNotFoundError:
+        return
+    previous = _client_inodes.get(path)
+    if previous is not None and previous != inode:
+        release_client(path)
+    _client_inodes[path] = inode
+
+
+def clear_vector_store(user_id: int, mode: str = None) -> bool:
+    import chromadb
+
+    path = vector_store_path(user_id, mode)
+    name = collection_name(user_id, mode)
+    try:
+        if shared_mode(mode):
+            open_collection(user_id, mode).delete(where=scoped_where(user_id, mode=mode))
+            logger.info(f"Cleared user {user_id} from shared collection {name}.")
+            return True
+
+        from .models import VectorStoreTier
+        from .tiering import archive_path
+
+        with store_lock(path, exclusive=True):
+            try:
+                chromadb.PersistentClient(path=path).delete_collection(name=name)
+                logger.info(f"Cleared collection {name} from vector store.")
+            except Exception as e:
+                logger.error(f"Error clearing collection {name}: {e}")
+
+            if os.path.exists(path):
+                shutil.rmtree(path)
+                release_client(path)
+                logger.info(f"Deleted vector store directory at {path}.")
+
+            if os.path.exists(archive_path(user_id)):
+                os.remove(archive_path(user_id))
+                logger.info(f"Deleted archived vector store of user {user_id}.")
+            # The store starts over empty, so it may be created again
+            VectorStoreTier.objects.filter(user_id=user_id).update(archived_at=None, archive_size=0)
+        return True
+    except Exception as e:
+        logger.error(f"Error clearing all data: {e}")
+        return False
+
+
+def warmup():
+    """
+    Import the RAG stack and load the embedding model ahead of the first
+    request. Call it from a server hook (e.g. gunicorn post_fork) or set
+    RAG_PRELOAD=1 for workers that should pay the cost at boot instead.
+    """
+    import chromadb
+    from langchain_community.document_loaders import TextLoader
+    from langchain_community.vectorstores import Chroma
+    from langchain_core.prompts import PromptTemplate
+    from langchain_groq import ChatGroq
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    if get_worker_client() is None:
+        get_embeddings()
+    logger.info("RAG stack warmed up")
 
 
 class PersonalRAGService:
 
-    def __init__(self, user_id:int):
+    def __init__(self, user_id:int, record_access: bool = True):
         self.user_id = user_id
-        self.collection_name = f"user_{self.user_id}_docs"
+        self.collection_name = collection_name(self.user_id)
         self.groq_api_key = settings.GROQ_API_KEY
+        self.vector_store_path = vector_store_path(self.user_id)
 
+        # With a vector worker configured, embeddings and Chroma live in that
+        # process and this instance only forwards calls to it
+        self.worker = get_worker_client()
+        self.embeddings = None
+        self.chroma_client = None
+        self.vector_store=None
+        # Model the query embeddings come from; changes when the collection is re-embedded
+        self.model_name = None
 
-        self.vector_store_path = os.path.join(
-            str(settings.PERSONAL_VECTOR_DB_PATH),
-            f"user_{self.user_id}"
-        )
-        os.makedirs(self.vector_store_path, exist_ok=True)
+        if not shared_mode():
+            from .tiering import ensure_hot_store
 
+            # Brings the store back from cold storage if it was archived
+            ensure_hot_store(self.user_id, record_access=record_access)
 
-        self.embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-        self.chroma_client = chromadb.PersistentClient(path=self.vector_store_path)
-        self.vector_store=None
+        if self.worker is None:
+            import chromadb
+
+            with store_lock(self.vector_store_path):
+                os.makedirs(self.vector_store_path, exist_ok=True)
+                # Records the directory the client is opened on (see refresh_client)
+                refresh_client(self.vector_store_path)
+                self.chroma_client = chromadb.PersistentClient(path=self.vector_store_path)
+                self.model_name = self._collection_model()
+            self.embeddings = get_embeddings(self.model_name)
         self._load_vector_store()
 
+    def _store_lock(self):
+        # With a vector worker, the worker locks the store around its own writes
+        if self.worker is not None:
+            return nullcontext()
+        return store_lock(self.vector_store_path)
+
+    def _collection_model(self) -> str:
+        # Queries must be embedded with the model the stored vectors came from,
+        # which differs from EMBEDDING_MODEL until the collection is re-embedded
+        try:
+            collection = self.chroma_client.get_collection(name=self.collection_name)
+        except Exception:
+            return settings.EMBEDDING_MODEL
+        return collection_stamp(collection)['embedding_model']
+
     def _load_vector_store(self):
 
+        if self.worker is not None:
+            self.vector_store = RemoteVectorStore(self.worker, self.user_id)
+            return
+
+        from langchain_community.vectorstores import Chroma
+
         try:
-            self.vector_store = Chroma(
-                client=self.chroma_client,
-                collection_name=self.collection_name,
-                embedding_function=self.embeddings,
-            )
+            # Creates the collection if it is missing, so it must not run mid-swap
+            with self._store_lock():
+                self.vector_store = Chroma(
+                    client=self.chroma_client,
+                    collection_name=self.collection_name,
+                    embedding_function=self.embeddings,
+                    collection_metadata=embedding_stamp(),
+                )
         except Exception as e:
             logger.error(f"Failed to load vector store: {e}")
             self.vector_store = Chroma.from_documents(
@@ -61,34 +298,103 @@ class PersonalRAGService:
 
     def process_document(self, file_path: str, doc_id: int) -> int:
         try:
-
-            if not os.path.exists(file_path):
-                logger.error(f"File not found: {file_path}")
-                return 0
-            
-            documents = self._load_documents(file_path)
-            if not documents:
-                logger.error(f"No documents extracted from file: {file_path}")
-                return 0
-            
-            chunks = self._split_documents(documents)
-
-            for chunk in chunks:
-                chunk.metadata['doc_id'] = doc_id
-            
-            if not chunks:
-                logger.error(f"No chunks created from documents in file: {file_path}")
-                return 0
-            
-            self._add_to_vector_store(chunks)
+            with stage('extract'):
+                chunks = self.load_chunks(file_path, doc_id)
+            with stage('embed'):
+                self.add_chunks(chunks)
             logger.info(f"Processed {len(chunks)} chunks from {file_path}")
             return len(chunks)
         except Exception as e:
             logger.error(f"Error processing document {file_path}: {e}")
             return 0
+
+    def load_chunks(self, file_path: str, doc_id: int) -> list:
+        """
+        Load and split a file into chunks tagged with doc_id. Touches neither
+        the database nor the vector store, so it is safe to run in threads.
+        """
+        if not os.path.exists(file_path):
+            raise ValueError(f"File not found: {file_path}")
+
+        documents = self._load_documents(file_path)
+        if not documents:
+            raise ValueError(f"No documents extracted from file: {file_path}")
+
+        chunks = self._split_documents(documents)
+        if not chunks:
+            raise ValueError(f"No chunks created from documents in file: {file_path}")
+
+        page_offsets = self._write_extracted_text(file_path, documents)
+        # Byte position reached in each page, so offsets are computed in one pass
+        cursors = {}
+        for chunk in chunks:
+            part = chunk.metadata['part']
+            text = documents[part].page_content
+            start = chunk.metadata.get('start_index', -1)
+            # Only what retrieval, citations and tenant filtering need
+            metadata = {'source': file_path, 'doc_id': doc_id, 'user_id': self.user_id}
+            if documents[part].metadata.get('page') is not None:
+                metadata['page'] = documents[part].metadata['page']
+            if start >= 0:
+                position, offset = cursors.get(part, (0, page_offsets[part]))
+                if start < position:
+                    position, offset = 0, page_offsets[part]
+                offset += len(text[position:start].encode('utf-8'))
+                cursors[part] = (start, offset)
+                metadata['start'] = offset
+                metadata['end'] = offset + len(chunk.page_content.encode('utf-8'))
+            chunk.metadata = metadata
+        return chunks
+
+    def _write_extracted_text(self, file_path: str, documents: list) -> list:
+        """
+        Save the extracted text of every page next to the upload, so the
+        citation endpoint can read a chunk back with one seek. Returns the
+        byte offset at which each page starts.
+        """
+        from .models import extracted_text_path
+
+        path = extracted_text_path(file_path)
+        partial = f"{path}.partial"
+        offsets = []
+        offset = 0
+        with open(partial, 'wb') as f:
+            for index, document in enumerate(documents):
+                if index:
+                    offset += f.write(PAGE_BREAK.encode('utf-8'))
+                offsets.append(offset)
+                offset += f.write(document.page_content.encode('utf-8'))
+        os.replace(partial, path)
+        return offsets
+
+    def add_chunks(self, chunks: list) -> list:
+        batch_size = settings.EMBEDDING_BATCH_SIZE
+        ids = []
+        with self._store_lock():
+            # A pooled service may hold a collection that compaction or a
+            # re-embedding has since swapped out, so reopen it by name
+            self._load_vector_store()
+            # One vector store insert (and one embedding call) per batch
+            for start in range(0, len(chunks), batch_size):
+                batch = chunks[start:start + batch_size]
+                batch_ids = self._add_to_vector_store(batch)
+                self._record_chunk_ids(batch, batch_ids)
+                ids.extend(batch_ids)
+        return ids
+
+    def _record_chunk_ids(self, chunks: list, ids: list):
+        # Tracked in the database so deletes can go straight to ids
+        from .models import DocumentChunk
+
+        DocumentChunk.objects.bulk_create([
+            DocumentChunk(document_id=chunk.metadata['doc_id'], chunk_id=chunk_id)
+            for chunk, chunk_id in zip(chunks, ids)
+        ])
         
     
     def _load_documents(self, file_path: str) -> list:
+        from langchain_community.document_loaders import TextLoader, PyPDFLoader, Docx2txtLoader
+
         ext = os.path.splitext(file_path)[1].lower()
 
         loaders = {
@@ -105,27 +411,59 @@ class PersonalRAGService:
         return loader_class(file_path).load()
     
     def _split_documents(self, documents: list) -> list:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
 
         splitter = RecursiveCharacterTextSplitter(
             chunk_size=CHUNK_SIZE,
             chunk_overlap=CHUNK_OVERLAP,
-            separators=["\n\n", "\n", " ", ""]
+            separators=["\n\n", "\n", " ", ""],
+            add_start_index=True,
         )
-        return splitter.split_documents(documents)
+        chunks = []
+        # Split page by page to know which page each chunk (and its start_index) belongs to
+        for part, document in enumerate(documents):
+            for chunk in splitter.split_documents([document]):
+                chunk.metadata['part'] = part
+                chunks.append(chunk)
+        return chunks
     
-    def _add_to_vector_store(self, chunks: list):
+    def _add_to_vector_store(self, chunks: list) -> list:
 
+        ids = [uuid.uuid4().hex for _ in chunks]
         if self.vector_store is None:
+            from langchain_community.vectorstores import Chroma
+
             self.vector_store = Chroma.from_documents(
                 documents=chunks,
                 embedding=self.embeddings,
                 client=self.chroma_client,
-                collection_name=self.collection_name
+                collection_name=self.collection_name,
+                collection_metadata=embedding_stamp(),
+                ids=ids,
             )
         else:
-            self.vector_store.add_documents(chunks)
+            self.vector_store.add_documents(chunks, ids=ids)
+        return ids
+
+    def _collection_count(self) -> int:
+        if self.worker is not None:
+            return self.vector_store.count()
+        return count_chunks(self.chroma_client.get_collection(name=self.collection_name), self.user_id)
+
+    def _where(self, where: dict = None) -> dict:
+        # The vector worker applies the tenant filter itself
+        if self.worker is not None:
+            return where
+        return scoped_where(self.user_id, where)
 
     def _create_llm(self):
+        if settings.RAG_LLM_BACKEND == 'fake':
+            from .fake_llm import FakeChatModel
+
+            return FakeChatModel()
+
+        from langchain_groq import ChatGroq
+
         return ChatGroq(
             groq_api_key=self.groq_api_key,
             model_name=LLM_MODEL,
@@ -133,49 +471,30 @@ class PersonalRAGService:
         )
     
 
-    def query(self, question: str, chat_history: list = None) -> dict:
-
-
-        try:
-            self._load_vector_store()
+    def _document_filter(self, doc_ids: list = None) -> dict:
+        # Applied by Chroma before the similarity search, not to its results
+        if doc_ids:
+            if len(doc_ids) == 1:
+                return {'doc_id': doc_ids[0]}
+            return {'doc_id': {'$in': list(doc_ids)}}
 
-            try:
-                collection = self.chroma_client.get_collection(name=self.collection_name)
-                doc_count = collection.count()
+        # Deleted documents stay in the index until the purge job runs
+        from .models import UserDocument
 
-                if doc_count == 0:
-                    return {
-                        'answer': "No documents available for querying.",
-                        'sources': []
-                    }
-            except Exception as e:
-                logger.error(f"Error accessing collection: {e}")
-                return {
-                    'answer': "No documents available for querying.",
-                    'sources': []
-                }
-            
-            retriever = self.vector_store.as_retriever(
-                search_type="similarity",
-                search_kwargs={
-                    "k": RETRIEVER_K
-                }
-            )
+        tombstoned = list(
+            UserDocument.objects.filter(user_id=self.user_id, deleted_at__isnull=False).values_list('id', flat=True)
+        )
+        if tombstoned:
+            return {'doc_id': {'$nin': tombstoned}}
+        return None
 
-            docs = retriever.invoke(question)
+    def _prompt(self, question: str, docs: list) -> str:
+        from langchain_core.prompts import PromptTemplate
 
-            if not docs:
-                return {
-                    'answer': "No relevant documents found.",
-                    'sources': []
-                }
-            
-            context = "\n\n".join([doc.page_content for doc in docs])
+        context = "\n\n".join([doc.page_content for doc in docs])
 
-            llm = self._create_llm()
-
-            prompt = PromptTemplate(
-                template= """You are a helpful assistant answering questions based on the user's personal documents.
+        prompt = PromptTemplate(
+            template= """You are a helpful assistant answering questions based on the user's personal documents.
 
                     Answer ONLY based on the context provided. If the answer is not in the context, say "I couldn't find this information in your documents."
 
@@ -185,24 +504,73 @@ class PersonalRAGService:
                     Question: {question}
 
                     Answer:""",
-                input_variables=["context", "question"]
-            )
+            input_variables=["context", "question"]
+        )
+        return prompt.format(context=context, question=question)
+
+    def _sources(self, docs: list) -> list:
+        # One entry per document, listing the span of every retrieved chunk;
+        # chunks ingested before spans were stored only contribute the title
+        sources = []
+        by_document = {}
+        for doc in docs:
+            filename = os.path.basename(doc.metadata.get('source', 'Unknown'))
+            key = (doc.metadata.get('doc_id'), filename)
+            source = by_document.get(key)
+            if source is None:
+                source = {
+                    'title': filename,
+                    'type': 'personal_document',
+                    'document_id': doc.metadata.get('doc_id'),
+                    'citations': [],
+                }
+                by_document[key] = source
+                sources.append(source)
+            if 'start' in doc.metadata:
+                citation = {'start': doc.metadata['start'], 'end': doc.metadata['end']}
+                if doc.metadata.get('page') is not None:
+                    # Stored 0-based, as the PDF loader reports it
+                    citation['page'] = doc.metadata['page'] + 1
+                source['citations'].append(citation)
+        return sources
+
+    def _has_documents(self) -> bool:
+        try:
+            return self._collection_count() > 0
+        except Exception as e:
+            logger.error(f"Error accessing collection: {e}")
+            return False
+
+    def query(self, question: str, chat_history: list = None, doc_ids: list = None) -> dict:
+
+
+        try:
+            self._load_vector_store()
 
-            answer = llm.invoke(prompt.format(context=context, question=question)).content
+            with stage('retrieve'):
+                if not self._has_documents():
+                    return {
+                        'answer': "No documents available for querying.",
+                        'sources': []
+                    }
 
+                docs = self.vector_store.similarity_search(
+                    question, k=RETRIEVER_K, filter=self._where(self._document_filter(doc_ids))
+                )
 
-            sources = []
-            seen = set()
-            for doc in docs:
-                source = doc.metadata.get('source', 'Unknown')
-                filename = os.path.basename(source)
-                if filename not in seen:
-                    sources.append({'title': filename, 'type': 'personal_document'})
-                    seen.add(filename)
+            if not docs:
+                return {
+                    'answer': "No relevant documents found.",
+                    'sources': []
+                }
+            
+            with stage('llm'):
+                llm = self._create_llm()
+                answer = llm.invoke(self._prompt(question, docs)).content
 
             return {
                 'answer': answer,
-                'sources': sources
+                'sources': self._sources(docs)
             }
         
         except Exception as e:
@@ -211,43 +579,126 @@ class PersonalRAGService:
                 'answer': "An error occurred while processing your query.",
                 'sources': []
             }
-        
-    def delete_document(self, doc_id:int) -> bool:
+
+    def _search_batch(self, questions: list, where: dict = None) -> list:
+        # One query over the collection for every question. Questions are
+        # embedded as queries, like a single chat question, not as documents.
+        from langchain_core.documents import Document
+
+        if self.worker is not None:
+            return self.vector_store.similarity_search_batch(questions, k=RETRIEVER_K, filter=where)
+
+        vectors = [self.embeddings.embed_query(question) for question in questions]
+        result = self.chroma_client.get_collection(name=self.collection_name).query(
+            query_embeddings=vectors,
+            n_results=RETRIEVER_K,
+            where=self._where(where),
+            include=['documents', 'metadatas'],
+        )
+        return [
+            [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+            for texts, metadatas in zip(result['documents'], result['metadatas'])
+        ]
+
+    def query_batch(self, questions: list, doc_ids: list = None) -> list:
+        """
+        Answer several questions at once. Retrieval runs as one batch and the
+        LLM calls run concurrently, at most CHAT_BATCH_CONCURRENCY at a time,
+        so the whole batch takes about as long as its slowest answer.
+        """
+        from concurrent.futures import ThreadPoolExecutor
 
         try:
-            collection = self.chroma_client.get_collection(name=self.collection_name)
+            with stage('retrieve'):
+                if not self._has_documents():
+                    return [{'answer': "No documents available for querying.", 'sources': []} for _ in questions]
+                doc_lists = self._search_batch(questions, self._document_filter(doc_ids))
+        except Exception as e:
+            logger.error(f"Error during batch retrieval: {e}")
+            return [{'answer': "An error occurred while processing your query.", 'sources': []} for _ in questions]
 
-            result= collection.get(where={"doc_id": doc_id})
+        llm = self._create_llm()
 
-            if result and result['ids']:
-                collection.delete(ids=result['ids'])
-                logger.info(f"Deleted document ID {doc_id} from vector store.")
+        def answer(question, docs):
+            if not docs:
+                return {'answer': "No relevant documents found.", 'sources': []}
+            try:
+                return {'answer': llm.invoke(self._prompt(question, docs)).content, 'sources': self._sources(docs)}
+            except Exception as e:
+                logger.error(f"Error during query: {e}")
+                return {'answer': "An error occurred while processing your query.", 'sources': []}
+
+        workers = max(1, min(settings.CHAT_BATCH_CONCURRENCY, len(questions)))
+        with stage('llm'), ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(answer, questions, doc_lists))
+        
+    def delete_document(self, doc_id:int) -> bool:
+        from .models import DocumentChunk
+
+        try:
+            with self._store_lock():
+                self._load_vector_store()
+                chunk_rows = DocumentChunk.objects.filter(document_id=doc_id)
+                ids = list(chunk_rows.values_list('chunk_id', flat=True))
+
+                if not ids:
+                    # Documents ingested before chunk ids were tracked
+                    result = self.vector_store.get(where=self._where({"doc_id": doc_id}))
+                    ids = result['ids'] if result else []
+
+                if ids:
+                    batch_size = settings.VECTOR_DELETE_BATCH_SIZE
+                    for start in range(0, len(ids), batch_size):
+                        self.vector_store.delete(ids=ids[start:start + batch_size])
+                    logger.info(f"Deleted document ID {doc_id} from vector store.")
+            chunk_rows.delete()
             return True
         except Exception as e:
             logger.error(f"Error deleting document ID {doc_id}: {e}")
             return False
         
     def clear_all(self) -> bool:
-        try:
-            
-            try:
-                self.chroma_client.delete_collection(name=self.collection_name)
-                logger.info(f"Cleared collection {self.collection_name} from vector store.")
-            except Exception as e:
-                logger.error(f"Error clearing collection {self.collection_name}: {e}")
-            
-            if os.path.exists(self.vector_store_path):
-                shutil.rmtree(self.vector_store_path)
-                logger.info(f"Deleted vector store directory at {self.vector_store_path}.")
-            return True
-        except Exception as e:
-            logger.error(f"Error clearing all data: {e}")
-            return False
+        if self.worker is not None:
+            return self.worker.call('clear', user_id=self.user_id)
+        return clear_vector_store(self.user_id)
         
     def get_document_count(self) -> int:
         try:
-            collection = self.chroma_client.get_collection(name=self.collection_name)
-            return collection.count()
+            return self._collection_count()
         except Exception as e:
             logger.error(f"Error getting document count: {e}")
-            return 0
\ No newline at end of file
+            return 0
+
+def get_service(user_id: int) -> PersonalRAGService:
+    """
+    Return an open PersonalRAGService for the user, reusing the one from
+    an earlier request while its store and embedding model are unchanged.
+    Up to RAG_SERVICE_POOL_SIZE services are kept per process.
+    """
+    if not shared_mode():
+        from .tiering import ensure_hot_store
+
+        # Restores an archived store; a replaced directory evicts the pooled service
+        ensure_hot_store(user_id)
+
+    with _services_lock:
+        service = _services.get(user_id)
+        if service is not None:
+            _services.move_to_end(user_id)
+    if service is not None and service.worker is None:
+        if not os.path.isdir(service.vector_store_path):
+            # Cleared by another process
+            release_client(service.vector_store_path)
+            service = None
+        elif service._collection_model() != service.model_name:
+            service = None
+    if service is not None:
+        return service
+
+    service = PersonalRAGService(user_id)
+    with _services_lock:
+        _services[user_id] = service
+        _services.move_to_end(user_id)
+        while len(_services) > settings.RAG_SERVICE_POOL_SIZE:
+            _services.popitem(last=False)
+    return service
@@ -0,0 +1,171 @@
+"""
+In-process sampling profiler for selected requests (see
+rag_service.middleware.SamplingProfilerMiddleware).
+
+While a profiled request runs, a background thread wakes every
+PROFILE_INTERVAL_MS, reads the request thread's stack from
+sys._current_frames() and counts it under the request's endpoint. Stacks are
+kept in collapsed form (`frame;frame;frame count`), which flamegraph.pl,
+speedscope and inferno read directly. Memory is bounded by
+PROFILE_MAX_ENDPOINTS x PROFILE_MAX_STACKS distinct stacks; samples beyond
+that are counted under a single overflow entry.
+
+Only the request's own thread is sampled. Work it hands to other threads
+(batch chat LLM calls, bulk upload ingestion) shows up as the frame that
+waits for it. Each worker process keeps its own profile.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+
+OVERFLOW_ENDPOINT = '[other endpoints]'
+OVERFLOW_STACK = '[stacks over limit]'
+
+
+class SamplingProfiler:
+
+    def __init__(self, interval_ms: float, max_stacks: int, max_endpoints: int, max_depth: int):
+        self.interval = interval_ms / 1000
+        self.max_stacks = max_stacks
+        self.max_endpoints = max_endpoints
+        self.max_depth = max_depth
+        self._active = {}
+        self._stacks = {}
+        self._stats = {}
+        self._labels = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @contextmanager
+    def profile(self, endpoint: str):
+        """Sample the calling thread under `endpoint` until the block exits."""
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] = endpoint
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._active.pop(ident, None)
+                stats = self._endpoint_stats(endpoint)
+                stats['requests'] += 1
+                stats['seconds'] += elapsed
+
+    def _run(self):
+        while True:
+            # Cleared before looking, so a request starting in between still wakes us
+            self._wake.clear()
+            with self._lock:
+                active = dict(self._active)
+            if not active:
+                self._wake.wait()
+                continue
+            frames = sys._current_frames()
+            for ident, endpoint in active.items():
+                frame = frames.get(ident)
+                if frame is not None:
+                    self._record(endpoint, self._collapse(frame))
+            del frames
+            time.sleep(self.interval)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            base = str(settings.BASE_DIR) + os.sep
+            if path.startswith(base):
+                path = path[len(base):]
+            elif 'site-packages' + os.sep in path:
+                path = path.split('site-packages' + os.sep, 1)[1]
+            label = f"{path}:{getattr(code, 'co_qualname', code.co_name)}"
+            self._labels[code] = label
+        return label
+
+    def _collapse(self, frame) -> str:
+        labels = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        return ';'.join(labels)
+
+    def _endpoint_stats(self, endpoint: str) -> dict:
+        # Caller holds the lock
+        if endpoint not in self._stacks:
+            if len(self._stacks) >= self.max_endpoints:
+                endpoint = OVERFLOW_ENDPOINT
+            self._stacks.setdefault(endpoint, Counter())
+            self._stats.setdefault(endpoint, {'requests': 0, 'samples': 0, 'seconds': 0.0})
+        return self._stats[endpoint]
+
+    def _record(self, endpoint: str, stack: str):
+        with self._lock:
+            stats = self._endpoint_stats(endpoint)
+            counter = self._stacks[endpoint if endpoint in self._stacks else OVERFLOW_ENDPOINT]
+            if stack not in counter and len(counter) >= self.max_stacks:
+                stack = OVERFLOW_STACK
+            counter[stack] += 1
+            stats['samples'] += 1
+
+    def summary(self) -> list:
+        with self._lock:
+            return [
+                {
+                    'endpoint': endpoint,
+                    'requests': stats['requests'],
+                    'samples': stats['samples'],
+                    'seconds': round(stats['seconds'], 3),
+                    'distinct_stacks': len(self._stacks[endpoint]),
+                }
+                for endpoint, stats in sorted(self._stats.items(), key=lambda item: -item[1]['samples'])
+            ]
+
+    def collapsed(self, endpoint: str = None) -> str:
+        """
+        Collapsed stacks for one endpoint, or for all of them with the
+        endpoint as the root frame.
+        """
+        with self._lock:
+            if endpoint is not None:
+                items = [(None, self._stacks.get(endpoint, Counter()))]
+            else:
+                items = sorted(self._stacks.items())
+            lines = []
+            for root, counter in items:
+                for stack, count in counter.most_common():
+                    lines.append(f"{root};{stack} {count}" if root else f"{stack} {count}")
+        return '\n'.join(lines) + ('\n' if lines else '')
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self._stats.clear()
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> SamplingProfiler:
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = SamplingProfiler(
+                interval_ms=settings.PROFILE_INTERVAL_MS,
+                max_stacks=settings.PROFILE_MAX_STACKS,
+                max_endpoints=settings.PROFILE_MAX_ENDPOINTS,
+                max_depth=settings.PROFILE_MAX_DEPTH,
+            )
+        return _profiler
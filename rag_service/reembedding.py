@@ -0,0 +1,185 @@
+import logging
+import os
+import time
+
+from django.conf import settings
+
+from .compaction import catch_up, recover_shadow, swap_shadow, user_store_dirs
+from .personal_service import (
+    collection_name, collection_stamp, embedding_stamp, get_embeddings, refresh_client, shared_mode, store_lock,
+)
+
+logger = logging.getLogger(__name__)
+
+SHADOW_SUFFIX = '-reembed'
+
+
+def _copy(source, shadow, embeddings, ids: list):
+    page = source.get(ids=ids, include=['documents', 'metadatas'])
+    if not page['ids']:
+        return 0
+    vectors = embeddings.embed_documents([text or '' for text in page['documents']])
+    shadow.upsert(ids=page['ids'], embeddings=vectors, documents=page['documents'], metadatas=page['metadatas'])
+    return len(page['ids'])
+
+
+def reembed_collection(path: str, name: str, batch_size: int = None, sleep_seconds: float = None,
+                       max_batches: int = None) -> dict:
+    """
+    Re-embed one collection with EMBEDDING_MODEL from its stored chunk text.
+
+    Vectors are written to a shadow collection while the original keeps
+    serving queries; once the shadow has every chunk it replaces the
+    original. Progress lives in the shadow itself, so an interrupted or
+    budget-limited run (max_batches) picks up where it stopped. Sleeping
+    `sleep_seconds` between batches keeps the CPU free for requests.
+    """
+    import chromadb
+
+    batch_size = batch_size or settings.REEMBED_BATCH_SIZE
+    sleep_seconds = settings.REEMBED_BATCH_SLEEP if sleep_seconds is None else sleep_seconds
+    stamp = embedding_stamp()
+    shadow_name = f"{name}{SHADOW_SUFFIX}"
+    report = {'collection': name, 'embedded': 0, 'batches': 0, 'swapped': False, 'finished': True}
+
+    with store_lock(path, exclusive=True):
+        # Archived since the caller looked; opening it would create an empty store
+        if not os.path.isdir(path):
+            return report
+        refresh_client(path)
+        inode = os.stat(path).st_ino
+        client = chromadb.PersistentClient(path=path)
+        names = {c.name if hasattr(c, 'name') else c for c in client.list_collections()}
+        if (shadow_name in names and name in names
+                and collection_stamp(client.get_collection(name=name)) == stamp
+                and collection_stamp(client.get_collection(name=shadow_name)) == stamp):
+            # The original was dropped mid-swap and recreated by an open since
+            recover_shadow(client, name, shadow_name)
+            names.discard(shadow_name)
+        elif shadow_name in names and name not in names:
+            # The original was dropped but the rename never happened
+            client.get_collection(name=shadow_name).modify(name=name)
+            logger.warning(f"Recovered interrupted re-embedding of {name}")
+            names.add(name)
+        if name not in names:
+            return report
+
+        source = client.get_collection(name=name)
+        if collection_stamp(source) == stamp:
+            if 'embedding_model' not in (source.metadata or {}):
+                # Built with the current model before collections were stamped
+                source.modify(metadata=dict(source.metadata or {}, **stamp))
+            return report
+
+        if shadow_name in names:
+            shadow = client.get_collection(name=shadow_name)
+            if collection_stamp(shadow) != stamp:
+                # Left over from a rollout to a model that has since changed again
+                client.delete_collection(name=shadow_name)
+                shadow = None
+        else:
+            shadow = None
+        if shadow is None:
+            metadata = dict(source.metadata or {}, **stamp)
+            shadow = client.create_collection(name=shadow_name, metadata=metadata)
+
+    embeddings = get_embeddings(stamp['embedding_model'])
+
+    def copy(source, shadow, ids):
+        for start in range(0, len(ids), batch_size):
+            report['embedded'] += _copy(source, shadow, embeddings, ids[start:start + batch_size])
+            report['batches'] += 1
+
+    offset = 0
+    while True:
+        if max_batches is not None and report['batches'] >= max_batches:
+            report['finished'] = False
+            return report
+        page = source.get(include=[], limit=batch_size, offset=offset)
+        if not page['ids']:
+            break
+        offset += len(page['ids'])
+        done = set(shadow.get(ids=page['ids'], include=[])['ids'])
+        todo = [chunk_id for chunk_id in page['ids'] if chunk_id not in done]
+        if not todo:
+            continue
+        report['embedded'] += _copy(source, shadow, embeddings, todo)
+        report['batches'] += 1
+        if sleep_seconds:
+            time.sleep(sleep_seconds)
+
+    # Chunks can be added or deleted while the copy runs; reconcile before swapping
+    if not catch_up(source, shadow, copy) or not swap_shadow(client, path, inode, name, shadow_name, copy):
+        # Still changing under us, or archived meanwhile; try again next run
+        report['finished'] = False
+        return report
+
+    report['swapped'] = True
+    logger.info(f"Re-embedded {name} at {path} with {stamp['embedding_model']} ({report['embedded']} chunks)")
+    return report
+
+
+def _stores(user_ids: list = None) -> list:
+    if shared_mode():
+        path = str(settings.SHARED_VECTOR_DB_PATH)
+        if not os.path.isdir(path):
+            return []
+        return [(path, f"shard_{shard:03d}") for shard in range(settings.VECTOR_STORE_SHARDS)]
+    stores = user_store_dirs()
+    if user_ids is not None:
+        stores = {user_id: path for user_id, path in stores.items() if user_id in user_ids}
+    return [(path, collection_name(user_id, 'per_user')) for user_id, path in sorted(stores.items())]
+
+
+def reembed_vector_stores(user_ids: list = None, batch_size: int = None, sleep_seconds: float = None,
+                          max_batches: int = None) -> dict:
+    """
+    Bring every hot store up to EMBEDDING_MODEL. Stores in cold storage are
+    handled on a later run after they are restored. `max_batches` caps the
+    embedding calls of the whole run.
+    """
+    summary = {'stores': 0, 'swapped': 0, 'embedded': 0, 'pending': 0, 'failed': [], 'reports': []}
+    remaining = max_batches
+    for path, name in _stores(user_ids):
+        if remaining is not None and remaining <= 0:
+            summary['pending'] += 1
+            continue
+        try:
+            report = reembed_collection(path, name, batch_size=batch_size, sleep_seconds=sleep_seconds,
+                                        max_batches=remaining)
+        except Exception as e:
+            logger.error(f"Re-embedding {name} at {path} failed: {e}")
+            summary['failed'].append(name)
+            continue
+        if remaining is not None:
+            remaining -= report['batches']
+        summary['stores'] += 1
+        summary['swapped'] += int(report['swapped'])
+        summary['embedded'] += report['embedded']
+        summary['pending'] += int(not report['finished'])
+        summary['reports'].append(report)
+
+    logger.info(
+        f"Re-embedding: {summary['swapped']} collections swapped, {summary['embedded']} chunks embedded, "
+        f"{summary['pending']} still pending"
+    )
+    return summary
+
+
+def stale_stores(user_ids: list = None) -> list:
+    """Collections whose vectors were not produced by the current EMBEDDING_MODEL."""
+    import chromadb
+
+    stamp = embedding_stamp()
+    stale = []
+    for path, name in _stores(user_ids):
+        with store_lock(path):
+            if not os.path.isdir(path):
+                continue
+            try:
+                collection = chromadb.PersistentClient(path=path).get_collection(name=name)
+            except Exception:
+                continue
+        if collection_stamp(collection) != stamp:
+            stale.append({'collection': name, 'path': path, **collection_stamp(collection)})
+    return stale
@@ -0,0 +1,74 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ChatHistory, RetentionRun
+
+logger = logging.getLogger(__name__)
+
+
+def purge_chat_history(retention_days=None, batch_size=None, sleep_seconds=None, max_batches=None) -> dict:
+    """
+    Delete chat history older than the retention period in small batches.
+
+    Each batch selects at most `batch_size` primary keys through the
+    created_at index and deletes them in its own short transaction, sleeping
+    in between so live chat writes are never blocked for long. Progress is
+    stored in a RetentionRun row; if the process dies, the next call resumes
+    that run with the same cutoff.
+    """
+    retention_days = retention_days if retention_days is not None else settings.CHAT_HISTORY_RETENTION_DAYS
+    batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+    sleep_seconds = sleep_seconds if sleep_seconds is not None else settings.RETENTION_BATCH_SLEEP
+
+    run = RetentionRun.objects.filter(finished_at__isnull=True).first()
+    if run is not None:
+        logger.info(f"Resuming retention run {run.pk} (cutoff {run.cutoff}, {run.deleted} already deleted)")
+    else:
+        run = RetentionRun.objects.create(cutoff=timezone.now() - timedelta(days=retention_days))
+
+    expired = ChatHistory.objects.filter(created_at__lt=run.cutoff).order_by('created_at', 'id')
+    started = time.monotonic()
+    batches = 0
+    deleted_now = 0
+
+    while max_batches is None or batches < max_batches:
+        ids = list(expired.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            run.finished_at = timezone.now()
+            break
+
+        deleted, _ = ChatHistory.objects.filter(id__in=ids).delete()
+        batches += 1
+        deleted_now += deleted
+        run.deleted += deleted
+        run.batches += 1
+        run.save(update_fields=['deleted', 'batches', 'updated_at'])
+
+        if batches % 20 == 0:
+            logger.info(f"Retention run {run.pk}: {run.deleted} records deleted in {run.batches} batches")
+        if len(ids) < batch_size:
+            run.finished_at = timezone.now()
+            break
+        if sleep_seconds:
+            time.sleep(sleep_seconds)
+
+    if run.finished_at:
+        run.save(update_fields=['finished_at', 'updated_at'])
+
+    elapsed = time.monotonic() - started
+    metrics = {
+        'run_id': run.pk,
+        'cutoff': run.cutoff.isoformat(),
+        'deleted': deleted_now,
+        'deleted_total': run.deleted,
+        'batches': batches,
+        'elapsed_seconds': round(elapsed, 3),
+        'rows_per_second': round(deleted_now / elapsed, 1) if elapsed else 0,
+        'finished': run.finished_at is not None,
+    }
+    logger.info(f"Retention run {run.pk}: {metrics}")
+    return metrics
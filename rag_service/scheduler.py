@@ -0,0 +1,207 @@
+import atexit
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+LOCK_NAME = 'maintenance-scheduler'
+
+# job_id -> {'func': ..., 'trigger': 'cron' | 'interval', 'trigger_args': {...}}
+MAINTENANCE_JOBS = {}
+
+
+def maintenance_job(job_id: str, trigger: str = 'cron', **trigger_args):
+    """
+    Register a function as a maintenance job. Registered jobs only ever run
+    in the process that currently holds the scheduler leader lock.
+    """
+    def decorator(func):
+        MAINTENANCE_JOBS[job_id] = {'func': func, 'trigger': trigger, 'trigger_args': trigger_args}
+        return func
+    return decorator
+
+
+def run_maintenance_job(job_id: str):
+    """Entry point stored in the job store; runs a registered job and records its stats."""
+    job = MAINTENANCE_JOBS.get(job_id)
+    if job is None:
+        logger.error(f"Maintenance job {job_id} is not registered")
+        return
+
+    started_at = timezone.now()
+    started = time.monotonic()
+    error = ''
+    try:
+        job['func']()
+    except Exception as e:
+        error = str(e)
+        logger.error(f"Maintenance job {job_id} failed: {e}")
+    finally:
+        try:
+            _record_stats(job_id, started_at, time.monotonic() - started, error)
+        finally:
+            close_old_connections()
+
+
+def _record_stats(job_id: str, started_at, duration: float, error: str):
+    from .models import MaintenanceJobStats
+
+    with transaction.atomic():
+        stats, _ = MaintenanceJobStats.objects.select_for_update().get_or_create(job_id=job_id)
+        stats.runs += 1
+        if error:
+            stats.failures += 1
+        stats.last_started_at = started_at
+        stats.last_duration = duration
+        stats.total_duration += duration
+        stats.max_duration = max(stats.max_duration, duration)
+        stats.last_error = error
+        stats.save()
+
+
+def acquire_lock(name: str, owner: str, ttl: int) -> bool:
+    """Take or renew a DB-backed lock. Succeeds if free, expired, or already ours."""
+    from .models import SchedulerLock
+
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=ttl)
+    updated = SchedulerLock.objects.filter(name=name).filter(
+        Q(owner=owner) | Q(expires_at__lt=now)
+    ).update(owner=owner, expires_at=expires_at)
+    if updated:
+        return True
+    try:
+        with transaction.atomic():
+            SchedulerLock.objects.create(name=name, owner=owner, expires_at=expires_at)
+        return True
+    except IntegrityError:
+        return False
+
+
+def release_lock(name: str, owner: str):
+    from .models import SchedulerLock
+
+    SchedulerLock.objects.filter(name=name, owner=owner).delete()
+
+
+class LeaderScheduler:
+    """
+    Every process may run one of these, but only the holder of the leader
+    lock starts the APScheduler instance. The lock is renewed well before it
+    expires; if the leader dies another process takes over after `ttl`.
+    """
+
+    def __init__(self, ttl: int = None):
+        self.ttl = ttl or settings.SCHEDULER_LOCK_TTL
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.scheduler = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.scheduler is not None
+
+    def start(self, block: bool = False):
+        if block:
+            self._run()
+            return
+        self._thread = threading.Thread(target=self._run, name='scheduler-leader', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        self._stop_jobs()
+        try:
+            release_lock(LOCK_NAME, self.owner)
+        except Exception as e:
+            logger.error(f"Could not release scheduler lock: {e}")
+        finally:
+            close_old_connections()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if acquire_lock(LOCK_NAME, self.owner, self.ttl):
+                    if not self.is_leader:
+                        self._start_jobs()
+                elif self.is_leader:
+                    logger.warning("Lost scheduler leader lock, stopping maintenance jobs")
+                    self._stop_jobs()
+            except Exception as e:
+                logger.error(f"Scheduler leader election failed: {e}")
+            finally:
+                close_old_connections()
+            self._stop.wait(self.ttl / 3)
+
+    def _start_jobs(self):
+        from apscheduler.schedulers.background import BackgroundScheduler
+        from django_apscheduler.jobstores import DjangoJobStore
+
+        scheduler = BackgroundScheduler(timezone=settings.TIME_ZONE)
+        scheduler.add_jobstore(DjangoJobStore(), "default")
+        for job_id, job in MAINTENANCE_JOBS.items():
+            scheduler.add_job(
+                run_maintenance_job,
+                trigger=job['trigger'],
+                args=[job_id],
+                id=job_id,
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True,
+                **job['trigger_args'],
+            )
+        scheduler.start()
+        # Drop jobs that were registered by an older deployment
+        for stored in scheduler.get_jobs():
+            if stored.id not in MAINTENANCE_JOBS:
+                scheduler.remove_job(stored.id)
+
+        self.scheduler = scheduler
+        logger.info(f"Became scheduler leader ({self.owner}); running jobs: {', '.join(MAINTENANCE_JOBS)}")
+
+    def _stop_jobs(self):
+        if self.scheduler is not None:
+            self.scheduler.shutdown(wait=False)
+            self.scheduler = None
+
+
+_leader = None
+
+
+def start_scheduler(block: bool = False):
+    """Start leader election for this process (idempotent)."""
+    global _leader
+    # Importing tasks registers the maintenance jobs
+    from . import tasks
+
+    if _leader is None:
+        _leader = LeaderScheduler()
+        _leader.start(block=block)
+    return _leader
+
+
+def should_autostart() -> bool:
+    """
+    True for the development server. Production servers start the scheduler
+    from wsgi.py; migrate, shell and other commands never do.
+    """
+    if not settings.SCHEDULER_AUTOSTART:
+        return False
+    argv = sys.argv
+    if len(argv) < 2 or os.path.basename(argv[0]) != 'manage.py' or argv[1] != 'runserver':
+        return False
+    # Skip the autoreloader's parent process
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in argv
@@ -1,6 +1,24 @@
 from rest_framework import serializers
-from .models import UserDocument, ChatHistory
+from .models import UserDocument, ChatHistory, UploadSession
 import os
+import zipfile
+from django.conf import settings
+
+ALLOWED_EXTENSIONS = ['.pdf', '.txt', '.docx']
+
+
+def validate_document_name(name):
+    ext = os.path.splitext(name)[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise serializers.ValidationError(
+            f"Only {', '.join(ALLOWED_EXTENSIONS)} files are allowed"
+        )
+
+
+def validate_document_size(size, max_size=None):
+    max_size = max_size or settings.MAX_UPLOAD_SIZE
+    if size > max_size:
+        raise serializers.ValidationError(f"File size cannot exceed {max_size // (1024 * 1024)}MB")
 
 
 class UserDocumentSerializer(serializers.ModelSerializer):
@@ -27,20 +45,43 @@ class UserDocumentUploadSerializer(serializers.ModelSerializer):
         )
     
     def validate_file(self, value):
-        ext = os.path.splitext(value.name)[1].lower()
-        allowed_extensions = ['.pdf', '.txt', '.docx']
-        
-        if ext not in allowed_extensions:
+        validate_document_name(value.name)
+        validate_document_size(value.size)
+        return value
+
+
+class BulkDocumentUploadSerializer(serializers.Serializer):
+    """Serializer for uploading many documents or a ZIP archive at once."""
+    files = serializers.ListField(
+        child=serializers.FileField(),
+        required=False,
+        default=list,
+        help_text="Document files (PDF, DOCX, TXT)"
+    )
+    archive = serializers.FileField(
+        required=False,
+        help_text="ZIP archive of documents"
+    )
+
+    def validate_files(self, value):
+        # Per-file problems are reported in the results instead of failing the batch
+        if len(value) > settings.BULK_UPLOAD_MAX_FILES:
             raise serializers.ValidationError(
-                f"Only {', '.join(allowed_extensions)} files are allowed"
+                f"Cannot upload more than {settings.BULK_UPLOAD_MAX_FILES} files at once"
             )
-        
-        max_size = 10 * 1024 * 1024  # 10MB
-        if value.size > max_size:
-            raise serializers.ValidationError("File size cannot exceed 10MB")
-        
         return value
 
+    def validate_archive(self, value):
+        if not zipfile.is_zipfile(value):
+            raise serializers.ValidationError("Archive must be a ZIP file")
+        value.seek(0)
+        return value
+
+    def validate(self, data):
+        if not data.get('files') and not data.get('archive'):
+            raise serializers.ValidationError("Provide files or an archive")
+        return data
+
 
 class ChatSerializer(serializers.Serializer):
     """Serializer for chat requests."""
@@ -51,10 +92,100 @@ class ChatSerializer(serializers.Serializer):
         default=list,
         help_text="Optional conversation history"
     )
+    doc_id = serializers.IntegerField(
+        required=False,
+        help_text="Only search this document"
+    )
+    title = serializers.CharField(
+        max_length=255,
+        required=False,
+        help_text="Only search documents with this title"
+    )
+
+
+class BatchChatSerializer(serializers.Serializer):
+    """Serializer for batch chat requests."""
+    questions = serializers.ListField(
+        child=serializers.CharField(max_length=1000),
+        min_length=1,
+        help_text="Questions to answer against the same documents"
+    )
+    doc_id = serializers.IntegerField(
+        required=False,
+        help_text="Only search this document"
+    )
+    title = serializers.CharField(
+        max_length=255,
+        required=False,
+        help_text="Only search documents with this title"
+    )
+
+    def validate_questions(self, value):
+        if len(value) > settings.CHAT_BATCH_MAX_QUESTIONS:
+            raise serializers.ValidationError(f"At most {settings.CHAT_BATCH_MAX_QUESTIONS} questions per request.")
+        return value
+
+
+class CitationSerializer(serializers.Serializer):
+    """Query parameters of a citation request; offsets come from a chat answer's sources."""
+    start = serializers.IntegerField(min_value=0, help_text="Byte offset where the cited chunk starts")
+    end = serializers.IntegerField(min_value=1, help_text="Byte offset where the cited chunk ends")
+
+    def validate(self, attrs):
+        if attrs['end'] <= attrs['start']:
+            raise serializers.ValidationError({'end': "Must be greater than start."})
+        if attrs['end'] - attrs['start'] > settings.CITATION_MAX_BYTES:
+            raise serializers.ValidationError(
+                {'end': f"At most {settings.CITATION_MAX_BYTES} bytes can be cited at once."}
+            )
+        return attrs
 
 
 class ChatHistorySerializer(serializers.ModelSerializer):
     """Serializer for chat history responses."""
     class Meta:
         model = ChatHistory
-        fields = ['id', 'query', 'response', 'created_at']
\ No newline at end of file
+        fields = ['id', 'query', 'response', 'created_at']
+
+    def __init__(self, *args, fields=None, **kwargs):
+        # Optional subset of fields, e.g. to leave out `response` in list views
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class UploadSessionCreateSerializer(serializers.ModelSerializer):
+    """Serializer for starting a resumable chunked upload."""
+    class Meta:
+        model = UploadSession
+        fields = ['filename', 'size', 'checksum']
+
+    def validate_filename(self, value):
+        validate_document_name(value)
+        return os.path.basename(value)
+
+    def validate_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("File size must be positive")
+        validate_document_size(value, settings.MAX_CHUNKED_UPLOAD_SIZE)
+        return value
+
+    def validate_checksum(self, value):
+        value = value.lower()
+        if len(value) != 64 or any(c not in '0123456789abcdef' for c in value):
+            raise serializers.ValidationError("Checksum must be a hex-encoded SHA-256 digest")
+        return value
+
+    def create(self, validated_data):
+        return UploadSession.objects.create(user=self.context['request'].user, **validated_data)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """Serializer for chunked upload progress."""
+    offset = serializers.IntegerField(source='received', read_only=True)
+    document = UserDocumentSerializer(read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'size', 'offset', 'status', 'error', 'document', 'created_at']
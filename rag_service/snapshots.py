@@ -0,0 +1,269 @@
+"""
+Binary snapshots of one user's vector store.
+
+Layout (all integers little-endian):
+
+    header    HEADER: magic, format version, chunk count, dimension,
+              manifest size, vectors offset, records offset
+    manifest  JSON: user id, embedding model and version, creation time
+    vectors   count * dimension float32, contiguous and 64-byte aligned
+    records   per chunk: uint32 length + bytes for the id, the text and
+              the JSON metadata, in the same order as the vectors
+
+The vector block can be mapped straight into an array without parsing, so
+importing is bounded by disk speed rather than by the embedding model.
+"""
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+
+from django.utils import timezone
+
+from .compaction import PAGE_SIZE
+from .personal_service import (
+    clear_vector_store, collection_name, collection_stamp, open_collection, scoped_where, shared_mode,
+    store_lock, vector_store_path,
+)
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'ASKRAGVS'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sHIIIQQ')
+LENGTH = struct.Struct('<I')
+ALIGNMENT = 64
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is malformed or does not fit the target store."""
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _write_field(f, data: bytes):
+    f.write(LENGTH.pack(len(data)))
+    f.write(data)
+
+
+def export_user_store(user_id: int, output_path: str) -> dict:
+    """Write every chunk of the user's store, with its stored vector, to `output_path`."""
+    import numpy
+
+    collection = open_collection(user_id)
+    stamp = collection_stamp(collection)
+    manifest = json.dumps({
+        'user_id': user_id,
+        'collection': collection_name(user_id),
+        'created_at': timezone.now().isoformat(),
+        **stamp,
+    }).encode('utf-8')
+    vectors_offset = _align(HEADER.size + len(manifest))
+    where = scoped_where(user_id)
+
+    count = 0
+    dimension = 0
+    partial = f"{output_path}.partial"
+    # Records are spooled next to the output so vectors can be streamed in place
+    with open(partial, 'wb') as out, tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(output_path))) as records:
+        out.write(b'\0' * HEADER.size)
+        out.write(manifest)
+        out.write(b'\0' * (vectors_offset - out.tell()))
+
+        offset = 0
+        while True:
+            page = collection.get(where=where, include=['embeddings', 'documents', 'metadatas'],
+                                  limit=PAGE_SIZE, offset=offset)
+            if not page['ids']:
+                break
+            offset += len(page['ids'])
+            vectors = numpy.asarray(page['embeddings'], dtype='<f4')
+            if not dimension:
+                dimension = vectors.shape[1]
+            elif vectors.shape[1] != dimension:
+                raise SnapshotError(f"Mixed vector dimensions in {collection_name(user_id)}")
+            out.write(vectors.tobytes())
+            for chunk_id, text, metadata in zip(page['ids'], page['documents'], page['metadatas']):
+                _write_field(records, chunk_id.encode('utf-8'))
+                _write_field(records, (text or '').encode('utf-8'))
+                _write_field(records, json.dumps(metadata or {}).encode('utf-8'))
+            count += len(page['ids'])
+
+        records_offset = out.tell()
+        records.seek(0)
+        shutil.copyfileobj(records, out, 1024 * 1024)
+
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, FORMAT_VERSION, count, dimension, len(manifest), vectors_offset, records_offset))
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(partial, output_path)
+
+    size = os.path.getsize(output_path)
+    logger.info(f"Exported {count} chunks of user {user_id} to {output_path} ({size} bytes)")
+    return {'user_id': user_id, 'chunks': count, 'dimension': dimension, 'bytes': size, **stamp}
+
+
+class Snapshot:
+    """Read-only view of a snapshot file backed by mmap."""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SnapshotError(f"{path} is empty")
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise SnapshotError(f"{path} is too short to be a snapshot")
+
+        magic, version, self.count, self.dimension, manifest_size, self.vectors_offset, self.records_offset = \
+            HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise SnapshotError(f"{path} is not a version {FORMAT_VERSION} vector store snapshot")
+        if self.vectors_offset + self.count * self.dimension * 4 != self.records_offset or \
+                self.records_offset > len(self._map):
+            self.close()
+            raise SnapshotError(f"{path} is truncated")
+        if self._records_end() != len(self._map):
+            self.close()
+            raise SnapshotError(f"{path} is truncated")
+        self.manifest = json.loads(bytes(self._map[HEADER.size:HEADER.size + manifest_size]))
+
+    def _records_end(self) -> int:
+        # Walks the record lengths only, so a cut-off file is rejected before
+        # an import has touched the target store
+        offset = self.records_offset
+        for _ in range(self.count * 3):
+            if offset + LENGTH.size > len(self._map):
+                return -1
+            (size,) = LENGTH.unpack_from(self._map, offset)
+            offset += LENGTH.size + size
+        return offset
+
+    def vectors(self):
+        """All vectors as a (count, dimension) float32 array that shares memory with the file."""
+        import numpy
+
+        return numpy.frombuffer(
+            self._map, dtype='<f4', count=self.count * self.dimension, offset=self.vectors_offset
+        ).reshape(self.count, self.dimension)
+
+    def records(self):
+        """Yield (id, text, metadata) in vector order."""
+        view = memoryview(self._map)
+        offset = self.records_offset
+        try:
+            for _ in range(self.count):
+                fields = []
+                for _ in range(3):
+                    (size,) = LENGTH.unpack_from(view, offset)
+                    offset += LENGTH.size
+                    fields.append(bytes(view[offset:offset + size]).decode('utf-8'))
+                    offset += size
+                yield fields[0], fields[1], json.loads(fields[2])
+        except struct.error:
+            raise SnapshotError("Snapshot records are truncated")
+        finally:
+            view.release()
+
+    def close(self):
+        if getattr(self, '_map', None) is not None and not self._map.closed:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _open_target(user_id: int, stamp: dict):
+    import chromadb
+
+    if not shared_mode():
+        from .tiering import ensure_hot_store
+
+        ensure_hot_store(user_id)
+    path = vector_store_path(user_id)
+    with store_lock(path):
+        os.makedirs(path, exist_ok=True)
+        collection = chromadb.PersistentClient(path=path).get_or_create_collection(
+            name=collection_name(user_id), metadata=stamp
+        )
+    if collection_stamp(collection) != stamp:
+        raise SnapshotError(
+            f"Snapshot was embedded with {stamp['embedding_model']} (version {stamp['embedding_version']}) "
+            f"but {collection_name(user_id)} uses {collection_stamp(collection)['embedding_model']}"
+        )
+    return collection
+
+
+def _record_chunks(user_id: int, pairs: list) -> int:
+    # Only documents known to this database get chunk rows; the rest are
+    # orphans that compaction will remove
+    from .models import DocumentChunk, UserDocument
+
+    doc_ids = {doc_id for doc_id, _ in pairs}
+    known = set(UserDocument.objects.filter(user_id=user_id, id__in=doc_ids).values_list('id', flat=True))
+    recorded = set(DocumentChunk.objects.filter(document_id__in=known).values_list('chunk_id', flat=True))
+    rows = [
+        DocumentChunk(document_id=doc_id, chunk_id=chunk_id)
+        for doc_id, chunk_id in pairs
+        if doc_id in known and chunk_id not in recorded
+    ]
+    DocumentChunk.objects.bulk_create(rows, batch_size=PAGE_SIZE)
+    return len([1 for doc_id, _ in pairs if doc_id not in known])
+
+
+def import_user_store(path: str, user_id: int = None, replace: bool = False) -> dict:
+    """
+    Load a snapshot into the user's store using its stored vectors. Chunk
+    ids are kept, so importing the same snapshot twice is harmless.
+    """
+    with Snapshot(path) as snapshot:
+        user_id = user_id or snapshot.manifest['user_id']
+        stamp = {
+            'embedding_model': snapshot.manifest['embedding_model'],
+            'embedding_version': snapshot.manifest['embedding_version'],
+        }
+        if replace:
+            clear_vector_store(user_id)
+        collection = _open_target(user_id, stamp)
+
+        vectors = snapshot.vectors()
+        pairs = []
+        batch = ([], [], [])
+        start = 0
+        try:
+            with store_lock(vector_store_path(user_id)):
+                for chunk_id, text, metadata in snapshot.records():
+                    metadata['user_id'] = user_id
+                    batch[0].append(chunk_id)
+                    batch[1].append(text)
+                    batch[2].append(metadata)
+                    pairs.append((metadata.get('doc_id'), chunk_id))
+                    if len(batch[0]) == PAGE_SIZE:
+                        end = start + PAGE_SIZE
+                        collection.upsert(ids=batch[0], embeddings=vectors[start:end], documents=batch[1],
+                                          metadatas=batch[2])
+                        start = end
+                        batch = ([], [], [])
+                if batch[0]:
+                    collection.upsert(ids=batch[0], embeddings=vectors[start:], documents=batch[1], metadatas=batch[2])
+        finally:
+            # The array shares the mapping, which cannot be closed while it is alive
+            del vectors
+        count = snapshot.count
+
+    orphans = _record_chunks(user_id, pairs)
+    logger.info(f"Imported {count} chunks into the vector store of user {user_id} from {path}")
+    return {'user_id': user_id, 'chunks': count, 'orphans': orphans, **stamp}
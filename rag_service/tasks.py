@@ -1,45 +1,77 @@
 import logging
-from datetime import timedelta
-from django.utils import timezone
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
-from django_apscheduler.jobstores import DjangoJobStore
+from django.conf import settings
+
+from .scheduler import maintenance_job
 
 logger = logging.getLogger(__name__)
 
 
+@maintenance_job('delete_old_chat_history', 'cron', hour=0, minute=0)  # Run at midnight
 def delete_old_chat_history():
     """
-    Delete chat history older than 30 days.
+    Delete chat history older than CHAT_HISTORY_RETENTION_DAYS (30 by default).
     This task runs daily at midnight.
     """
-    from .models import ChatHistory
-    
-    cutoff_date = timezone.now() - timedelta(days=30)
-    old_records = ChatHistory.objects.filter(created_at__lt=cutoff_date)
-    count = old_records.count()
-    
-    if count > 0:
-        old_records.delete()
-        logger.info(f"Deleted {count} chat history records older than 30 days")
+    from .retention import purge_chat_history
+
+    metrics = purge_chat_history()
+    if metrics['deleted']:
+        logger.info(f"Deleted {metrics['deleted']} chat history records older than {settings.CHAT_HISTORY_RETENTION_DAYS} days")
     else:
         logger.info("No old chat history records to delete")
 
 
-def start_scheduler():
-    """Initialize and start the background scheduler."""
-    scheduler = BackgroundScheduler()
-    scheduler.add_jobstore(DjangoJobStore(), "default")
-    
-    # Schedule the cleanup task to run daily at midnight
-    scheduler.add_job(
-        delete_old_chat_history,
-        trigger=CronTrigger(hour=0, minute=0),  # Run at midnight
-        id="delete_old_chat_history",
-        max_instances=1,
-        replace_existing=True,
-    )
-    
-    logger.info("Starting background scheduler...")
-    scheduler.start()
-    logger.info("Background scheduler started. Chat history cleanup scheduled for midnight daily.")
+@maintenance_job('expire_upload_sessions', 'interval', hours=1)
+def expire_upload_sessions():
+    """Remove chunked uploads that were abandoned part way through."""
+    from .chunked_upload import expire_upload_sessions
+
+    expire_upload_sessions()
+
+
+@maintenance_job('resume_stalled_ingestion', 'interval', minutes=15)
+def resume_stalled_ingestion():
+    """Ingest again finalized uploads whose background ingestion died with its process."""
+    from .chunked_upload import resume_stalled_ingestion
+
+    resume_stalled_ingestion()
+
+
+@maintenance_job('compact_vector_stores', 'cron', day_of_week='sun', hour=3, minute=0)
+def compact_vector_stores():
+    """Remove orphaned chunks and stores and compact fragmented collections weekly."""
+    from .compaction import compact_vector_stores
+
+    compact_vector_stores()
+
+
+@maintenance_job('purge_deleted_documents', 'interval', minutes=1)
+def purge_deleted_documents():
+    """Remove vectors and files of documents the user deleted."""
+    from .deletion import purge_deleted_documents
+
+    purge_deleted_documents()
+
+
+@maintenance_job('archive_idle_vector_stores', 'cron', hour=2, minute=0)
+def archive_idle_vector_stores():
+    """Move vector stores of users idle for VECTOR_STORE_IDLE_DAYS to cold storage."""
+    from .tiering import archive_idle_stores
+
+    archive_idle_stores()
+
+
+@maintenance_job('warm_vector_stores', 'interval', minutes=30)
+def warm_vector_stores():
+    """Keep the vector stores of recently active users in the page cache."""
+    from .warming import warm_recent_stores
+
+    warm_recent_stores()
+
+
+@maintenance_job('reembed_vector_stores', 'interval', hours=1)
+def reembed_vector_stores():
+    """Rebuild collections embedded with an older EMBEDDING_MODEL, a throttled slice per run."""
+    from .reembedding import reembed_vector_stores
+
+    reembed_vector_stores()
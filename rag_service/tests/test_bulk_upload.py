@@ -0,0 +1,77 @@
+import io
+import zipfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from rag_service.models import UserDocument
+from rag_service.personal_service import PersonalRAGService
+
+from .utils import VectorStoreTestCase
+
+
+def zip_file(name: str, members: dict) -> SimpleUploadedFile:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        for member, text in members.items():
+            zf.writestr(member, text)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='application/zip')
+
+
+class BulkUploadTests(VectorStoreTestCase):
+
+    def bulk_upload(self, **data):
+        return self.client.post('/upload/bulk/', data, format='multipart')
+
+    def test_files_and_archive(self):
+        response = self.bulk_upload(
+            files=[SimpleUploadedFile('alpha.txt', b'alpha beta ' * 200),
+                   SimpleUploadedFile('notes.exe', b'binary')],
+            archive=zip_file('docs.zip', {
+                'docs/delta.txt': 'delta epsilon ' * 200,
+                '__MACOSX/docs/._delta.txt': 'resource fork',
+                'docs/.hidden.txt': 'hidden',
+            }),
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['processed'], response.data['failed']), (2, 1))
+        statuses = {result['filename']: result['status'] for result in response.data['results']}
+        self.assertEqual(statuses, {'alpha.txt': 'processed', 'delta.txt': 'processed', 'notes.exe': 'rejected'})
+
+        documents = UserDocument.objects.filter(user=self.user)
+        self.assertEqual(sorted(documents.values_list('title', flat=True)), ['alpha', 'delta'])
+        self.assertTrue(all(document.processed for document in documents))
+        self.assertEqual(self.chunk_count(), sum(document.chunk_count for document in documents))
+
+    def test_failed_document_leaves_no_chunks(self):
+        load_chunks = PersonalRAGService.load_chunks
+
+        def fail_delta(service, path, doc_id):
+            if 'delta' in path:
+                raise ValueError('unreadable')
+            return load_chunks(service, path, doc_id)
+
+        with mock.patch.object(PersonalRAGService, 'load_chunks', autospec=True, side_effect=fail_delta):
+            response = self.bulk_upload(files=[SimpleUploadedFile('alpha.txt', b'alpha beta ' * 200),
+                                               SimpleUploadedFile('delta.txt', b'delta epsilon ' * 200)])
+        self.assertEqual(response.status_code, 201)
+        failed = [result for result in response.data['results'] if result['status'] == 'failed']
+        self.assertEqual([(result['filename'], result['error']) for result in failed], [('delta.txt', 'unreadable')])
+
+        alpha = UserDocument.objects.get(user=self.user)
+        self.assertEqual(alpha.title, 'alpha')
+        self.assertEqual(self.chunk_count(), alpha.chunk_count)
+
+    def test_archive_must_be_a_zip(self):
+        response = self.bulk_upload(archive=SimpleUploadedFile('docs.zip', b'not a zip'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_empty_request_is_rejected(self):
+        self.assertEqual(self.bulk_upload().status_code, 400)
+
+    def test_archive_file_limit(self):
+        members = {f'doc{n}.txt': f'word{n} ' * 50 for n in range(3)}
+        with self.settings(BULK_UPLOAD_MAX_FILES=2):
+            response = self.bulk_upload(archive=zip_file('docs.zip', members))
+        self.assertEqual((response.data['processed'], response.data['failed']), (2, 1))
+        self.assertEqual(UserDocument.objects.filter(user=self.user).count(), 2)
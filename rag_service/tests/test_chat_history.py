@@ -0,0 +1,60 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from rag_service.models import ChatHistory
+from rag_service.pagination import ChatHistoryCursorPagination
+
+
+class ChatHistoryPaginationTests(APITestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username='reader', email='reader@example.com', password='pw')
+        other = User.objects.create_user(username='other', email='other@example.com', password='pw')
+        ChatHistory.objects.create(user=other, query='not mine', response='r')
+        self.client.force_authenticate(self.user)
+
+        now = timezone.now()
+        self.messages = []
+        for n in range(7):
+            message = ChatHistory.objects.create(user=self.user, query=f'q{n}', response=f'r{n}')
+            # Several messages share a timestamp, as in a batch chat
+            ChatHistory.objects.filter(id=message.id).update(created_at=now - timedelta(seconds=n // 3))
+            self.messages.append(message.id)
+
+    def pages(self, url):
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            yield response.data
+            url = response.data['next']
+
+    def test_walks_every_message_once_newest_first(self):
+        seen = [item['id'] for page in self.pages('/chat-history/?page_size=3') for item in page['results']]
+        expected = list(ChatHistory.objects.filter(user=self.user).order_by('-created_at', '-id')
+                        .values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(sorted(seen), sorted(self.messages))
+
+    def test_new_messages_do_not_shift_later_pages(self):
+        pages = self.pages('/chat-history/?page_size=3')
+        seen = [item['id'] for item in next(pages)['results']]
+        ChatHistory.objects.create(user=self.user, query='new', response='r')
+        seen += [item['id'] for page in pages for item in page['results']]
+        self.assertEqual(sorted(seen), sorted(self.messages))
+
+    def test_fields_subset(self):
+        response = self.client.get('/chat-history/?fields=id,query')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'query'})
+
+        self.assertEqual(self.client.get('/chat-history/?fields=id,user').status_code, 400)
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(ChatHistoryCursorPagination, 'max_page_size', 2):
+            response = self.client.get('/chat-history/?page_size=1000')
+        self.assertEqual(len(response.data['results']), 2)
@@ -0,0 +1,136 @@
+import hashlib
+import io
+import os
+from datetime import timedelta
+
+from django.test import override_settings
+from django.utils import timezone
+
+from rag_service import chunked_upload
+from rag_service.chunked_upload import UploadConflict, append_chunk, resume_stalled_ingestion
+from rag_service.models import UploadSession, UserDocument
+
+from .utils import VectorStoreTestCase
+
+CONTENT = b'alpha beta gamma ' * 300
+
+
+class ChunkedUploadTestCase(VectorStoreTestCase):
+
+    def create_session(self, content: bytes = CONTENT) -> str:
+        response = self.client.post('/upload/sessions/', {
+            'filename': 'alpha.txt', 'size': len(CONTENT), 'checksum': hashlib.sha256(content).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def send(self, session_id: str, offset: int, data: bytes):
+        return self.client.patch(
+            f'/upload/sessions/{session_id}/', data, content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def finalize(self, session_id: str):
+        with self.captureOnCommitCallbacks(execute=False):
+            return self.client.post(f'/upload/sessions/{session_id}/finalize/')
+
+
+class ChunkedUploadTests(ChunkedUploadTestCase):
+
+    def test_interrupted_upload_resumes_from_offset(self):
+        session_id = self.create_session()
+        self.assertEqual(self.send(session_id, 0, CONTENT[:1000]).status_code, 200)
+
+        response = self.send(session_id, 0, CONTENT[:1000])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 1000)
+
+        offset = self.client.get(f'/upload/sessions/{session_id}/').data['offset']
+        self.assertEqual(self.send(session_id, offset, CONTENT[offset:]).status_code, 200)
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], UploadSession.STATUS_COMPLETE)
+
+    def test_retried_chunk_does_not_truncate_later_chunks(self):
+        session_id = self.create_session()
+        # Read by a retry of the first chunk before the original attempt landed
+        stale = UploadSession.objects.get(pk=session_id)
+        self.send(session_id, 0, CONTENT[:1000])
+        self.send(session_id, 1000, CONTENT[1000:2000])
+
+        with self.assertRaises(UploadConflict) as raised:
+            append_chunk(stale, 0, io.BytesIO(CONTENT[:1000]), 1000)
+        self.assertEqual(raised.exception.offset, 2000)
+        self.assertEqual(os.path.getsize(stale.part_path), 2000)
+
+        self.send(session_id, 2000, CONTENT[2000:])
+        self.assertEqual(self.finalize(session_id).status_code, 202)
+
+    def test_checksum_mismatch_restarts_upload(self):
+        session_id = self.create_session()
+        self.send(session_id, 0, CONTENT.upper())
+
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['offset'], 0)
+        session = UploadSession.objects.get(pk=session_id)
+        self.assertEqual((session.status, session.received), (UploadSession.STATUS_PENDING, 0))
+        self.assertEqual(os.path.getsize(session.part_path), 0)
+
+        self.send(session_id, 0, CONTENT)
+        self.assertEqual(self.finalize(session_id).status_code, 202)
+
+    def test_finalized_document_is_ingested(self):
+        session_id = self.create_session()
+        self.send(session_id, 0, CONTENT)
+        document_id = self.finalize(session_id).data['document']['id']
+
+        chunked_upload.ingest_document(document_id)
+        self.assertTrue(self.document(document_id).processed)
+        self.assertEqual(self.chunk_count(), self.document(document_id).chunk_count)
+
+
+@override_settings(UPLOAD_INGEST_TIMEOUT_MINUTES=60, UPLOAD_INGEST_MAX_ATTEMPTS=2)
+class StalledIngestionTests(ChunkedUploadTestCase):
+
+    def setUp(self):
+        super().setUp()
+        session_id = self.create_session()
+        self.send(session_id, 0, CONTENT)
+        # Finalized, but the process running the ingestion died
+        self.document_id = self.finalize(session_id).data['document']['id']
+        self.session = UploadSession.objects.filter(pk=session_id)
+
+    def stall(self, minutes: int = 90):
+        self.session.update(updated_at=timezone.now() - timedelta(minutes=minutes))
+
+    def test_recent_upload_is_left_alone(self):
+        self.stall(minutes=5)
+        self.assertEqual(resume_stalled_ingestion(), 0)
+
+    def test_stalled_upload_is_ingested_again(self):
+        self.stall()
+        self.assertEqual(resume_stalled_ingestion(), 1)
+
+        document = self.document(self.document_id)
+        self.assertTrue(document.processed)
+        self.assertEqual(self.chunk_count(), document.chunk_count)
+        self.assertEqual(self.session.get().ingest_attempts, 1)
+
+    def test_vectors_of_dead_attempt_are_replaced(self):
+        chunked_upload.ingest_document(self.document_id)
+        UserDocument.objects.filter(id=self.document_id).update(processed=False)
+        chunks = self.chunk_count()
+        self.stall()
+
+        resume_stalled_ingestion()
+        self.assertEqual(self.chunk_count(), chunks)
+
+    def test_session_fails_after_max_attempts(self):
+        self.session.update(ingest_attempts=2)
+        self.stall()
+
+        self.assertEqual(resume_stalled_ingestion(), 0)
+        session = self.session.get()
+        self.assertEqual(session.status, UploadSession.STATUS_FAILED)
+        self.assertIn('3 attempts', session.error)
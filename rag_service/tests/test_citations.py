@@ -0,0 +1,55 @@
+import os
+
+from rag_service.models import extracted_text_path
+from rag_service.personal_service import open_collection
+
+from .utils import VectorStoreTestCase
+
+
+class CitationTests(VectorStoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Multi-byte characters, so byte and character offsets differ
+        self.doc = self.upload('café.txt', ' '.join(f'crème brûlée {n} naïve' for n in range(400)))
+
+    def citation(self, start: int, end: int, doc_id: int = None):
+        return self.client.get(f"/documents/{doc_id or self.doc['id']}/citation/", {'start': start, 'end': end})
+
+    def test_every_chunk_span_reads_back_its_text(self):
+        stored = open_collection(self.user.id).get(include=['documents', 'metadatas'])
+        self.assertGreater(len(stored['ids']), 1)
+        for text, metadata in zip(stored['documents'], stored['metadatas']):
+            response = self.citation(metadata['start'], metadata['end'])
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['text'], text)
+
+    def test_chat_sources_carry_citations(self):
+        response = self.client.post('/chat/', {'question': 'crème brûlée'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        source, = response.data['sources']
+        self.assertEqual(source['document_id'], self.doc['id'])
+        self.assertTrue(source['citations'])
+        for citation in source['citations']:
+            self.assertIn('brûlée', self.citation(citation['start'], citation['end']).data['text'])
+
+    def test_end_is_clipped_to_the_document(self):
+        size = os.path.getsize(extracted_text_path(self.document(self.doc['id']).file.path))
+        response = self.citation(size - 5, size + 100)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['end'], size)
+
+    def test_invalid_ranges(self):
+        self.assertEqual(self.citation(10, 10).status_code, 400)
+        with self.settings(CITATION_MAX_BYTES=100):
+            self.assertEqual(self.citation(0, 101).status_code, 400)
+        self.assertEqual(self.citation(10 ** 9, 10 ** 9 + 1).status_code, 400)
+
+    def test_other_users_document_is_not_found(self):
+        self.client.force_authenticate(self.create_user('other'))
+        self.assertEqual(self.citation(0, 10).status_code, 404)
+
+    def test_document_without_extracted_text(self):
+        # Ingested before the extracted text was kept
+        os.remove(extracted_text_path(self.document(self.doc['id']).file.path))
+        self.assertEqual(self.citation(0, 10).status_code, 404)
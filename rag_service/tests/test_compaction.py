@@ -0,0 +1,105 @@
+from unittest import mock
+
+import chromadb
+
+from rag_service import compaction
+from rag_service.compaction import compact_collection, compact_user_store
+from rag_service.personal_service import collection_name, vector_store_path
+
+from .utils import VectorStoreTestCase
+
+
+class CompactionThenUploadTests(VectorStoreTestCase):
+    """A pooled service keeps working after compaction swaps its collection."""
+
+    def test_upload_and_chat_after_rebuild(self):
+        first = self.upload('alpha.txt', 'alpha beta gamma ' * 200)
+        self.assertTrue(first['processed'])
+
+        report = compact_user_store(self.user.id, rebuild=True)
+        self.assertTrue(report['rebuilt'])
+
+        second = self.upload('delta.txt', 'delta epsilon zeta ' * 200)
+        self.assertTrue(second['processed'])
+        self.assertGreater(second['chunk_count'], 0)
+
+        response = self.client.post('/chat/', {'question': 'delta epsilon', 'doc_id': second['id']}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([source['document_id'] for source in response.data['sources']], [second['id']])
+
+
+class CompactionTests(VectorStoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.doc = self.upload('alpha.txt', 'alpha beta gamma ' * 200)
+        self.chunks = self.chunk_count()
+        self.path = vector_store_path(self.user.id, 'per_user')
+        self.name = collection_name(self.user.id, 'per_user')
+        self.shadow = f"{self.name}-compact"
+
+    def store(self):
+        return chromadb.PersistentClient(path=self.path)
+
+    def copy_to_shadow(self):
+        client = self.store()
+        compaction._copy_to_shadow(client, self.name, self.shadow)
+        return client
+
+    def test_orphan_chunks_are_removed(self):
+        self.document(self.doc['id']).delete()
+
+        report = compact_user_store(self.user.id)
+        self.assertEqual(report['orphans'], self.chunks)
+        self.assertEqual(self.chunk_count(), 0)
+
+    def test_document_created_during_scan_is_kept(self):
+        # The document exists, but was not in the set taken before the scan
+        report = compact_collection(self.path, self.name, set())
+        self.assertEqual(report['orphans'], 0)
+        self.assertEqual(self.chunk_count(), self.chunks)
+
+    def test_write_after_catch_up_is_swapped_in(self):
+        sync = compaction._sync
+        late = {}
+
+        def sync_then_write(source, target, copy):
+            in_sync = sync(source, target, copy)
+            if not late:
+                # Lands after the catch-up pass, before the swap
+                late.update(source.get(limit=1, include=['embeddings', 'documents', 'metadatas']))
+                source.add(ids=['late'], embeddings=late['embeddings'], documents=late['documents'],
+                           metadatas=late['metadatas'])
+            return in_sync
+
+        with mock.patch.object(compaction, '_sync', side_effect=sync_then_write):
+            self.assertTrue(compact_user_store(self.user.id, rebuild=True)['rebuilt'])
+        self.assertEqual(self.chunk_count(), self.chunks + 1)
+        self.assertEqual(self.store().get_collection(self.name).get(ids=['late'])['ids'], ['late'])
+
+    def test_unfinished_copy_is_dropped(self):
+        client = self.copy_to_shadow()
+        shadow = client.get_collection(self.shadow)
+        shadow.delete(ids=shadow.get(limit=1)['ids'])
+
+        compact_user_store(self.user.id, rebuild=False)
+        self.assertEqual([c.name for c in self.store().list_collections()], [self.name])
+        self.assertEqual(self.chunk_count(), self.chunks)
+
+    def test_shadow_replaces_dropped_original(self):
+        client = self.copy_to_shadow()
+        client.delete_collection(self.name)
+
+        compact_user_store(self.user.id, rebuild=False)
+        self.assertEqual([c.name for c in self.store().list_collections()], [self.name])
+        self.assertEqual(self.chunk_count(), self.chunks)
+
+    def test_shadow_is_kept_over_recreated_empty_original(self):
+        client = self.copy_to_shadow()
+        client.delete_collection(self.name)
+        # Recreated by an open between the drop and the rename
+        client.create_collection(self.name)
+
+        compact_user_store(self.user.id, rebuild=False)
+        self.assertEqual([c.name for c in self.store().list_collections()], [self.name])
+        self.assertEqual(self.chunk_count(), self.chunks)
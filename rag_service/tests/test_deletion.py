@@ -0,0 +1,64 @@
+import os
+import shutil
+from datetime import timedelta
+
+from django.utils import timezone
+
+from rag_service.deletion import purge_deleted_documents, tombstone_document
+from rag_service.models import UserDocument, VectorStoreTier
+from rag_service.personal_service import vector_store_path
+from rag_service.tiering import archive_idle_stores
+
+from .utils import VectorStoreTestCase
+
+
+class PurgeDeletedDocumentsTests(VectorStoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.doc = self.upload('alpha.txt', 'alpha beta gamma ' * 200)
+
+    def test_purge_removes_vectors_and_row(self):
+        tombstone_document(self.document(self.doc['id']))
+
+        self.assertEqual(purge_deleted_documents(), 1)
+        self.assertFalse(UserDocument.objects.filter(id=self.doc['id']).exists())
+        self.assertEqual(self.chunk_count(), 0)
+
+    def test_failing_user_is_postponed_without_blocking_others(self):
+        other = self.create_user('writer')
+        self.client.force_authenticate(other)
+        other_doc = self.upload('delta.txt', 'delta epsilon zeta ' * 200)
+        tombstone_document(self.document(self.doc['id']))
+        tombstone_document(self.document(other_doc['id']))
+        # Marked archived, but the archive is gone
+        shutil.rmtree(vector_store_path(self.user.id, 'per_user'))
+        VectorStoreTier.objects.filter(user=self.user).update(archived_at=timezone.now())
+
+        self.assertEqual(purge_deleted_documents(), 1)
+        self.assertFalse(UserDocument.objects.filter(id=other_doc['id']).exists())
+        document = self.document(self.doc['id'])
+        self.assertEqual(document.purge_attempts, 1)
+        self.assertGreater(document.purge_retry_at, timezone.now())
+
+        # Skipped until the retry is due
+        self.assertEqual(purge_deleted_documents(), 0)
+        self.assertEqual(self.document(self.doc['id']).purge_attempts, 1)
+
+        UserDocument.objects.filter(id=self.doc['id']).update(purge_retry_at=timezone.now())
+        self.assertEqual(purge_deleted_documents(), 0)
+        document = self.document(self.doc['id'])
+        self.assertEqual(document.purge_attempts, 2)
+        self.assertGreater(document.purge_retry_at, timezone.now() + timedelta(minutes=1))
+
+    def test_purging_archived_store_keeps_idle_clock(self):
+        idle_since = timezone.now() - timedelta(days=30)
+        VectorStoreTier.objects.filter(user=self.user).update(last_accessed_at=idle_since)
+        archive_idle_stores(idle_days=7)
+        tombstone_document(self.document(self.doc['id']))
+
+        self.assertEqual(purge_deleted_documents(), 1)
+        self.assertTrue(os.path.isdir(vector_store_path(self.user.id, 'per_user')))
+        self.assertEqual(VectorStoreTier.objects.get(user=self.user).last_accessed_at, idle_since)
+        # Back to cold storage on the next run
+        self.assertEqual(archive_idle_stores(idle_days=7)['archived'], 1)
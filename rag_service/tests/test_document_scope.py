@@ -0,0 +1,43 @@
+from rag_service.models import DocumentChunk
+from rag_service.personal_service import PersonalRAGService
+
+from .utils import VectorStoreTestCase
+
+
+class DocumentScopeTests(VectorStoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.alpha = self.upload('alpha.txt', 'alpha beta gamma ' * 200)
+        self.delta = self.upload('delta.txt', 'delta epsilon zeta ' * 200)
+
+    def chat(self, **data):
+        return self.client.post('/chat/', {'question': 'alpha beta', **data}, format='json')
+
+    def source_ids(self, response) -> set:
+        self.assertEqual(response.status_code, 200)
+        return {source['document_id'] for source in response.data['sources']}
+
+    def test_search_is_limited_to_the_document(self):
+        self.assertEqual(self.source_ids(self.chat(doc_id=self.delta['id'])), {self.delta['id']})
+        self.assertEqual(self.source_ids(self.chat(title='alpha')), {self.alpha['id']})
+
+    def test_other_users_document_is_not_found(self):
+        self.client.force_authenticate(self.create_user('other'))
+        self.assertEqual(self.chat(doc_id=self.alpha['id']).status_code, 404)
+        self.assertEqual(self.chat(title='alpha').status_code, 404)
+
+    def test_chunk_ids_are_tracked_and_deleted(self):
+        rows = DocumentChunk.objects.filter(document_id=self.alpha['id'])
+        self.assertEqual(rows.count(), self.alpha['chunk_count'])
+
+        self.assertTrue(PersonalRAGService(self.user.id).delete_document(self.alpha['id']))
+        self.assertFalse(rows.exists())
+        self.assertEqual(self.chunk_count(), self.delta['chunk_count'])
+
+    def test_untracked_document_is_deleted_by_metadata(self):
+        # Ingested before chunk ids were recorded
+        DocumentChunk.objects.filter(document_id=self.alpha['id']).delete()
+
+        self.assertTrue(PersonalRAGService(self.user.id).delete_document(self.alpha['id']))
+        self.assertEqual(self.chunk_count(), self.delta['chunk_count'])
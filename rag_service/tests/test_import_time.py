@@ -0,0 +1,17 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+
+class ImportTimeTests(SimpleTestCase):
+
+    def test_startup_imports_within_budget(self):
+        out = StringIO()
+        call_command('check_import_time', budget_ms=settings.IMPORT_TIME_BUDGET_MS, stdout=out)
+        self.assertIn('Import time within budget', out.getvalue())
+
+    def test_exceeded_budget_fails(self):
+        with self.assertRaisesMessage(CommandError, 'exceeds budget'):
+            call_command('check_import_time', budget_ms=0, stdout=StringIO())
@@ -0,0 +1,67 @@
+import json
+import os
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+from rest_framework.test import APITransactionTestCase
+
+from rag_service.fake_llm import FakeChatModel
+from rag_service.management.commands.load_test import USER_PREFIX, parse_mix
+from rag_service.models import UserDocument
+from rag_service.timing import parse_server_timing
+
+from .utils import VectorStoreMixin, VectorStoreTestCase
+
+
+class FakeLLMTests(VectorStoreTestCase):
+
+    def test_answers_from_the_prompt(self):
+        answer = FakeChatModel(latency_ms=0, tokens=4, token_ms=0).invoke('alpha beta gamma').content
+        self.assertEqual(len(answer.split()), 4)
+        self.assertTrue(set(answer.split()) <= {'alpha', 'beta', 'gamma'})
+
+    def test_chat_reports_stage_timings(self):
+        self.upload('alpha.txt', 'alpha beta gamma ' * 200)
+        with self.settings(SERVER_TIMING=True):
+            response = self.client.post('/chat/', {'question': 'alpha'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue({'retrieve', 'llm', 'total'} <= set(parse_server_timing(response['Server-Timing'])))
+
+    def test_timing_header_is_off_by_default(self):
+        self.assertNotIn('Server-Timing', self.client.get('/chat-history/'))
+
+
+class ParseTests(SimpleTestCase):
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix('chat=3,history=1'), {'chat': 3.0, 'history': 1.0})
+        for mix in ('chat=1,delete=1', 'chat=x', 'chat=0'):
+            with self.assertRaises(CommandError):
+                parse_mix(mix)
+
+    def test_parse_server_timing(self):
+        self.assertEqual(parse_server_timing('retrieve;dur=4.5, llm;desc="x";dur=10, broken;dur=?'),
+                         {'retrieve': 4.5, 'llm': 10.0})
+
+
+class LoadTestCommandTests(VectorStoreMixin, APITransactionTestCase):
+    # The command's clients run in threads, which only see committed rows
+
+    def test_in_process_run(self):
+        report_path = os.path.join(self.root, 'report.json')
+        call_command('load_test', users=2, concurrency=1, requests=6, mix='chat=1,history=1', doc_size=500,
+                     json_path=report_path, stdout=StringIO())
+
+        with open(report_path) as f:
+            report = json.load(f)
+        self.assertEqual(report['overall']['requests'], 6)
+        self.assertEqual(report['overall']['error_rate'], 0)
+        self.assertIn('retrieve', report['operations']['chat']['stages'])
+        # Synthetic users and their documents are removed afterwards
+        self.assertFalse(UserDocument.objects.filter(user__username__startswith=USER_PREFIX).exists())
+
+    def test_threshold_fails_the_run(self):
+        with self.assertRaisesMessage(CommandError, 'p95'):
+            call_command('load_test', users=1, concurrency=1, requests=2, mix='history=1', doc_size=500,
+                         max_p95_ms=0, stdout=StringIO())
@@ -0,0 +1,112 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from rag_service import profiling
+from rag_service.profiling import OVERFLOW_ENDPOINT, OVERFLOW_STACK, SamplingProfiler
+
+
+def busy_handler(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class SamplingProfilerTests(SimpleTestCase):
+
+    def profiler(self, **options):
+        return SamplingProfiler(**{'interval_ms': 1, 'max_stacks': 100, 'max_endpoints': 10, 'max_depth': 64,
+                                   **options})
+
+    def test_samples_the_request_thread(self):
+        profiler = self.profiler()
+        with profiler.profile('POST /chat/'):
+            busy_handler(0.2)
+
+        summary, = profiler.summary()
+        self.assertEqual((summary['endpoint'], summary['requests']), ('POST /chat/', 1))
+        self.assertGreater(summary['samples'], 0)
+        collapsed = profiler.collapsed('POST /chat/')
+        self.assertIn('test_profiling.py:busy_handler', collapsed)
+        # `stack count` lines, root frame first
+        stack, count = collapsed.splitlines()[0].rsplit(' ', 1)
+        self.assertTrue(stack.endswith('busy_handler'))
+        self.assertGreater(int(count), 0)
+
+    def test_memory_is_bounded(self):
+        profiler = self.profiler(max_stacks=1, max_endpoints=1)
+        profiler._record('GET /a/', 'main;a')
+        profiler._record('GET /a/', 'main;b')
+        profiler._record('GET /b/', 'main;c')
+
+        self.assertEqual(profiler.collapsed('GET /a/'), f"main;a 1\n{OVERFLOW_STACK} 1\n")
+        self.assertEqual(profiler.collapsed(OVERFLOW_ENDPOINT), "main;c 1\n")
+        self.assertEqual(profiler.collapsed().splitlines()[0], "GET /a/;main;a 1")
+
+    def test_reset(self):
+        profiler = self.profiler()
+        profiler._record('GET /a/', 'main;a')
+        profiler.reset()
+        self.assertEqual((profiler.summary(), profiler.collapsed()), ([], ''))
+
+
+class ProfilingRequestTests(APITestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='pw',
+                                              is_staff=True)
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='pw')
+        self.profiler = SamplingProfiler(interval_ms=1, max_stacks=100, max_endpoints=10, max_depth=64)
+        patcher = mock.patch.object(profiling, 'get_profiler', return_value=self.profiler)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        enabled = self.settings(PROFILING_ENABLED=True, PROFILE_SAMPLE_RATE=0, PROFILE_USER_IDS=[])
+        enabled.enable()
+        self.addCleanup(enabled.disable)
+        # Middleware is loaded on a client's first request, after the settings change
+        self.client = APIClient()
+
+    def request(self, method: str, path: str, user, **headers):
+        token = RefreshToken.for_user(user).access_token
+        return getattr(self.client, method)(path, HTTP_AUTHORIZATION=f'Bearer {token}', **headers)
+
+    def get(self, path: str, user, **headers):
+        return self.request('get', path, user, **headers)
+
+    def profiled_endpoints(self) -> list:
+        return [summary['endpoint'] for summary in self.profiler.summary()]
+
+    def test_staff_can_ask_for_a_profile(self):
+        self.get('/chat-history/', self.reader, HTTP_X_PROFILE='1')
+        self.assertEqual(self.profiled_endpoints(), [])
+
+        self.get('/chat-history/', self.admin, HTTP_X_PROFILE='1')
+        self.assertEqual(self.profiled_endpoints(), ['GET /chat-history/'])
+
+    def test_selected_users_are_profiled(self):
+        with self.settings(PROFILE_USER_IDS=[str(self.reader.id)]):
+            self.client = APIClient()
+            self.get('/chat-history/', self.reader)
+            self.get('/chat-history/', self.admin)
+        self.assertEqual(self.profiler.summary()[0]['requests'], 1)
+
+    def test_profile_download_is_admin_only(self):
+        self.profiler._record('GET /chat-history/', 'main;view')
+        self.assertEqual(self.get('/profiling/', self.reader).status_code, 403)
+
+        response = self.get('/profiling/', self.admin)
+        self.assertEqual(response.data['endpoints'][0]['endpoint'], 'GET /chat-history/')
+        response = self.get('/profiling/?download=1&endpoint=GET /chat-history/', self.admin)
+        self.assertEqual(response.content, b'main;view 1\n')
+
+        self.assertEqual(self.request('delete', '/profiling/', self.admin).status_code, 204)
+        self.assertEqual(self.profiler.summary(), [])
+
+    def test_disabled(self):
+        with self.settings(PROFILING_ENABLED=False):
+            self.assertEqual(self.get('/profiling/', self.admin).status_code, 404)
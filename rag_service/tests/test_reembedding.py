@@ -0,0 +1,58 @@
+import chromadb
+from django.test import override_settings
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag_service import personal_service
+from rag_service.personal_service import collection_name, collection_stamp, open_collection, vector_store_path
+from rag_service.reembedding import SHADOW_SUFFIX, reembed_collection, reembed_vector_stores
+
+from .utils import VectorStoreTestCase
+
+NEW_MODEL = 'test/new-model'
+
+
+class ReembeddingTests(VectorStoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.upload('alpha.txt', 'alpha beta gamma ' * 400)
+        self.chunks = self.chunk_count()
+        self.path = vector_store_path(self.user.id, 'per_user')
+        self.name = collection_name(self.user.id, 'per_user')
+        personal_service._embeddings[NEW_MODEL] = DeterministicFakeEmbedding(size=8)
+        overrides = override_settings(EMBEDDING_MODEL=NEW_MODEL, REEMBED_BATCH_SLEEP=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def store(self):
+        return chromadb.PersistentClient(path=self.path)
+
+    def test_store_is_swapped_to_new_model(self):
+        summary = reembed_vector_stores()
+        self.assertEqual(summary['swapped'], 1)
+
+        collection = self.store().get_collection(self.name)
+        self.assertEqual(collection_stamp(collection)['embedding_model'], NEW_MODEL)
+        self.assertEqual(collection.count(), self.chunks)
+        self.assertEqual(len(collection.peek(1)['embeddings'][0]), 8)
+
+    def test_budget_limited_run_resumes(self):
+        report = reembed_collection(self.path, self.name, batch_size=1, max_batches=1)
+        self.assertFalse(report['finished'])
+        self.assertEqual(self.store().get_collection(f"{self.name}{SHADOW_SUFFIX}").count(), 1)
+
+        report = reembed_collection(self.path, self.name, batch_size=1)
+        self.assertTrue(report['swapped'])
+        self.assertEqual(report['embedded'], self.chunks - 1)
+
+    def test_shadow_is_kept_over_recreated_original(self):
+        reembed_collection(self.path, self.name, batch_size=1, max_batches=self.chunks)
+        client = self.store()
+        client.delete_collection(self.name)
+        # Recreated, stamped with the new model, by an open between the drop and the rename
+        open_collection(self.user.id)
+
+        reembed_collection(self.path, self.name)
+        client = self.store()
+        self.assertEqual([c.name for c in client.list_collections()], [self.name])
+        self.assertEqual(client.get_collection(self.name).count(), self.chunks)
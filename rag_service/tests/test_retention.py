@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from rag_service.models import ChatHistory, RetentionRun
+from rag_service.retention import purge_chat_history
+
+
+class RetentionTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='reader', email='reader@example.com', password='pw')
+
+    def add_messages(self, count: int, age_days: int):
+        created = [ChatHistory.objects.create(user=self.user, query='q', response='r') for _ in range(count)]
+        ChatHistory.objects.filter(id__in=[m.id for m in created]).update(
+            created_at=timezone.now() - timedelta(days=age_days)
+        )
+
+    def test_only_expired_messages_are_deleted(self):
+        self.add_messages(5, age_days=100)
+        self.add_messages(3, age_days=1)
+
+        metrics = purge_chat_history(retention_days=30, batch_size=2, sleep_seconds=0)
+        self.assertTrue(metrics['finished'])
+        self.assertEqual(metrics['deleted'], 5)
+        self.assertEqual(metrics['batches'], 3)
+        self.assertEqual(ChatHistory.objects.count(), 3)
+
+    def test_interrupted_run_resumes_with_its_cutoff(self):
+        self.add_messages(5, age_days=100)
+
+        first = purge_chat_history(retention_days=30, batch_size=2, sleep_seconds=0, max_batches=1)
+        self.assertFalse(first['finished'])
+        self.assertEqual(ChatHistory.objects.count(), 3)
+
+        # The resumed run keeps the original cutoff, whatever retention it is called with
+        second = purge_chat_history(retention_days=1000, batch_size=2, sleep_seconds=0)
+        self.assertEqual(second['run_id'], first['run_id'])
+        self.assertEqual(second['cutoff'], first['cutoff'])
+        self.assertTrue(second['finished'])
+        self.assertEqual(second['deleted_total'], 5)
+        self.assertEqual(ChatHistory.objects.count(), 0)
+
+        run = RetentionRun.objects.get()
+        self.assertIsNotNone(run.finished_at)
+        self.assertEqual(run.batches, 3)
+
+    def test_finished_run_is_not_resumed(self):
+        first = purge_chat_history(retention_days=30, sleep_seconds=0)
+        second = purge_chat_history(retention_days=30, sleep_seconds=0)
+        self.assertNotEqual(second['run_id'], first['run_id'])
+        self.assertEqual(RetentionRun.objects.filter(finished_at__isnull=True).count(), 0)
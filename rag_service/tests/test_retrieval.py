@@ -0,0 +1,33 @@
+from django.conf import settings
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from rag_service import personal_service
+from rag_service.personal_service import RETRIEVER_K, PersonalRAGService
+
+from .utils import VectorStoreTestCase
+
+
+class QueryPrefixEmbedding(DeterministicFakeEmbedding):
+    # Like instruction-tuned models, which encode queries differently from documents
+    def embed_query(self, text: str) -> list:
+        return super().embed_query(f"query: {text}")
+
+
+class BatchRetrievalTests(VectorStoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        personal_service._embeddings[settings.EMBEDDING_MODEL] = QueryPrefixEmbedding(size=16)
+        for n, word in enumerate(['alpha', 'delta', 'omega', 'sigma']):
+            self.upload(f'{word}.txt', f'{word} {n} ' * 300)
+        self.service = PersonalRAGService(self.user.id)
+
+    def test_batch_retrieves_like_single_question(self):
+        questions = ['alpha 0', 'what about sigma?']
+        batch = self.service._search_batch(questions)
+
+        for question, docs in zip(questions, batch):
+            single = self.service.vector_store.similarity_search(
+                question, k=RETRIEVER_K, filter=self.service._where(None)
+            )
+            self.assertEqual([doc.page_content for doc in docs], [doc.page_content for doc in single])
@@ -0,0 +1,79 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from rag_service import scheduler
+from rag_service.models import MaintenanceJobStats, SchedulerLock
+from rag_service.scheduler import LOCK_NAME, LeaderScheduler, acquire_lock, release_lock, run_maintenance_job
+
+
+class LeaderLockTests(TestCase):
+
+    def test_only_one_owner_holds_the_lock(self):
+        self.assertTrue(acquire_lock(LOCK_NAME, 'a', ttl=60))
+        self.assertFalse(acquire_lock(LOCK_NAME, 'b', ttl=60))
+        # Renewing our own lock
+        self.assertTrue(acquire_lock(LOCK_NAME, 'a', ttl=60))
+
+    def test_expired_lock_is_taken_over(self):
+        acquire_lock(LOCK_NAME, 'a', ttl=60)
+        SchedulerLock.objects.filter(name=LOCK_NAME).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertTrue(acquire_lock(LOCK_NAME, 'b', ttl=60))
+        self.assertEqual(SchedulerLock.objects.get(name=LOCK_NAME).owner, 'b')
+        self.assertFalse(acquire_lock(LOCK_NAME, 'a', ttl=60))
+
+    def test_released_lock_is_free(self):
+        acquire_lock(LOCK_NAME, 'a', ttl=60)
+        release_lock(LOCK_NAME, 'b')
+        self.assertFalse(acquire_lock(LOCK_NAME, 'b', ttl=60))
+        release_lock(LOCK_NAME, 'a')
+        self.assertTrue(acquire_lock(LOCK_NAME, 'b', ttl=60))
+
+
+class LeaderSchedulerTests(TestCase):
+
+    def elect(self, leader: LeaderScheduler):
+        # One round of the election loop
+        leader._stop.wait = lambda timeout: leader._stop.set()
+        leader._stop.clear()
+        leader._run()
+
+    def test_standby_takes_over_when_leader_dies(self):
+        leader, standby = LeaderScheduler(ttl=60), LeaderScheduler(ttl=60)
+        with mock.patch.object(LeaderScheduler, '_start_jobs', autospec=True,
+                               side_effect=lambda self: setattr(self, 'scheduler', object())), \
+                mock.patch.object(LeaderScheduler, '_stop_jobs', autospec=True,
+                                  side_effect=lambda self: setattr(self, 'scheduler', None)):
+            self.elect(leader)
+            self.elect(standby)
+            self.assertTrue(leader.is_leader)
+            self.assertFalse(standby.is_leader)
+
+            # The leader stops renewing; its lock expires
+            SchedulerLock.objects.filter(name=LOCK_NAME).update(expires_at=timezone.now() - timedelta(seconds=1))
+            self.elect(standby)
+            self.assertTrue(standby.is_leader)
+
+            self.elect(leader)
+            self.assertFalse(leader.is_leader)
+
+
+class RunMaintenanceJobTests(TestCase):
+
+    def test_stats_are_recorded(self):
+        jobs = {
+            'ok': {'func': lambda: None, 'trigger': 'interval', 'trigger_args': {}},
+            'broken': {'func': mock.Mock(side_effect=RuntimeError('boom')), 'trigger': 'interval', 'trigger_args': {}},
+        }
+        with mock.patch.dict(scheduler.MAINTENANCE_JOBS, jobs, clear=True):
+            run_maintenance_job('ok')
+            run_maintenance_job('broken')
+            run_maintenance_job('broken')
+
+        self.assertEqual((MaintenanceJobStats.objects.get(job_id='ok').runs,
+                          MaintenanceJobStats.objects.get(job_id='ok').failures), (1, 0))
+        broken = MaintenanceJobStats.objects.get(job_id='broken')
+        self.assertEqual((broken.runs, broken.failures, broken.last_error), (2, 2, 'boom'))
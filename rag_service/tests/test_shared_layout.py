@@ -0,0 +1,70 @@
+import os
+
+from django.conf import settings
+from django.test import override_settings
+
+from rag_service.personal_service import clear_vector_store, count_chunks, open_collection, release_client, \
+    vector_store_path
+from rag_service.vector_layout import migrate_vector_stores
+
+from .utils import VectorStoreTestCase
+
+
+class SharedLayoutTests(VectorStoreTestCase):
+    """Two users whose chunks land in the same shared collection."""
+
+    def setUp(self):
+        super().setUp()
+        shared = override_settings(VECTOR_STORE_MODE='shared', VECTOR_STORE_SHARDS=1)
+        shared.enable()
+        self.addCleanup(shared.disable)
+        self.addCleanup(release_client, str(settings.SHARED_VECTOR_DB_PATH))
+
+        self.alpha = self.upload('alpha.txt', 'alpha beta gamma ' * 200)
+        self.other = self.create_user('other')
+        self.client.force_authenticate(self.other)
+        self.delta = self.upload('delta.txt', 'alpha beta delta ' * 200)
+
+    def chunk_count(self, user=None) -> int:
+        user = user or self.user
+        return count_chunks(open_collection(user.id), user.id)
+
+    def test_users_only_see_their_own_chunks(self):
+        self.assertEqual(self.chunk_count(), self.alpha['chunk_count'])
+        self.assertEqual(self.chunk_count(self.other), self.delta['chunk_count'])
+        self.assertEqual(open_collection(self.user.id).count(), self.alpha['chunk_count'] + self.delta['chunk_count'])
+
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/chat/', {'question': 'alpha beta delta'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({source['document_id'] for source in response.data['sources']}, {self.alpha['id']})
+
+    def test_clearing_a_user_keeps_the_others(self):
+        self.assertTrue(clear_vector_store(self.user.id))
+        self.assertEqual(self.chunk_count(), 0)
+        self.assertEqual(self.chunk_count(self.other), self.delta['chunk_count'])
+
+
+class LayoutMigrationTests(VectorStoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(release_client, str(settings.SHARED_VECTOR_DB_PATH))
+        self.doc = self.upload('alpha.txt', 'alpha beta gamma ' * 200)
+
+    def test_per_user_to_shared_and_back(self):
+        summary = migrate_vector_stores('shared')
+        self.assertEqual(summary, {'users': 1, 'chunks': self.doc['chunk_count'], 'failed': []})
+        self.assertFalse(os.path.isdir(vector_store_path(self.user.id, 'per_user')))
+
+        with self.settings(VECTOR_STORE_MODE='shared'):
+            response = self.client.post('/chat/', {'question': 'alpha beta'}, format='json')
+            self.assertEqual({source['document_id'] for source in response.data['sources']}, {self.doc['id']})
+
+        # Re-running is harmless
+        self.assertEqual(migrate_vector_stores('shared')['users'], 0)
+
+        summary = migrate_vector_stores('per_user')
+        self.assertEqual(summary['chunks'], self.doc['chunk_count'])
+        self.assertEqual(self.chunk_count(), self.doc['chunk_count'])
+        self.assertEqual(open_collection(self.user.id, 'shared').count(), 0)
@@ -0,0 +1,80 @@
+import os
+
+from rag_service.models import DocumentChunk
+from rag_service.personal_service import open_collection
+from rag_service.snapshots import SnapshotError, export_user_store, import_user_store
+
+from .utils import VectorStoreTestCase
+
+
+class SnapshotTests(VectorStoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.doc = self.upload('alpha.txt', 'alpha beta gamma ' * 200)
+        self.chunks = self.chunk_count()
+        self.snapshot = os.path.join(self.root, 'reader.snap')
+
+    def contents(self, user=None):
+        collection = open_collection((user or self.user).id)
+        stored = collection.get(include=['embeddings', 'documents'])
+        return {
+            chunk_id: (text, [round(float(x), 5) for x in vector])
+            for chunk_id, text, vector in zip(stored['ids'], stored['documents'], stored['embeddings'])
+        }
+
+    def test_round_trip_into_an_empty_store(self):
+        before = self.contents()
+        report = export_user_store(self.user.id, self.snapshot)
+        self.assertEqual(report['chunks'], self.chunks)
+
+        imported = import_user_store(self.snapshot, replace=True)
+        self.assertEqual(imported['chunks'], self.chunks)
+        self.assertEqual(imported['orphans'], 0)
+        self.assertEqual(self.contents(), before)
+        self.assertEqual(DocumentChunk.objects.filter(document_id=self.doc['id']).count(), self.chunks)
+
+    def test_importing_twice_does_not_duplicate_chunks(self):
+        export_user_store(self.user.id, self.snapshot)
+        import_user_store(self.snapshot)
+        import_user_store(self.snapshot)
+        self.assertEqual(self.chunk_count(), self.chunks)
+        self.assertEqual(DocumentChunk.objects.filter(document_id=self.doc['id']).count(), self.chunks)
+
+    def test_chunks_of_unknown_documents_are_orphans(self):
+        export_user_store(self.user.id, self.snapshot)
+        other = self.create_user('other')
+
+        report = import_user_store(self.snapshot, user_id=other.id)
+        self.assertEqual(report['orphans'], self.chunks)
+        self.assertEqual(self.chunk_count(other), self.chunks)
+        stored = open_collection(other.id).get(include=['metadatas'])
+        self.assertEqual({metadata['user_id'] for metadata in stored['metadatas']}, {other.id})
+
+    def test_truncated_snapshot_is_rejected(self):
+        export_user_store(self.user.id, self.snapshot)
+        with open(self.snapshot, 'r+b') as f:
+            f.truncate(os.path.getsize(self.snapshot) // 2)
+
+        with self.assertRaises(SnapshotError):
+            import_user_store(self.snapshot, replace=True)
+        # Rejected before the existing store was cleared
+        self.assertEqual(self.chunk_count(), self.chunks)
+
+    def test_truncated_records_are_rejected(self):
+        export_user_store(self.user.id, self.snapshot)
+        with open(self.snapshot, 'r+b') as f:
+            f.truncate(os.path.getsize(self.snapshot) - 3)
+
+        with self.assertRaises(SnapshotError):
+            import_user_store(self.snapshot)
+
+    def test_other_embedding_model_is_rejected(self):
+        export_user_store(self.user.id, self.snapshot)
+        other = self.create_user('other')
+        with self.settings(EMBEDDING_MODEL='other-model'):
+            open_collection(other.id)
+
+        with self.assertRaises(SnapshotError):
+            import_user_store(self.snapshot, user_id=other.id)
+        self.assertEqual(self.chunk_count(other), 0)
@@ -0,0 +1,73 @@
+import os
+import shutil
+from datetime import timedelta
+
+from django.utils import timezone
+
+from rag_service.models import VectorStoreTier
+from rag_service.personal_service import vector_store_path
+from rag_service.tiering import ArchiveMissing, archive_idle_stores, archive_path, ensure_hot_store
+
+from .utils import VectorStoreTestCase
+
+
+class TieringTests(VectorStoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.upload('alpha.txt', 'alpha beta gamma ' * 200)
+        self.chunks = self.chunk_count()
+        self.path = vector_store_path(self.user.id, 'per_user')
+
+    def archive(self):
+        VectorStoreTier.objects.filter(user=self.user).update(last_accessed_at=timezone.now() - timedelta(days=30))
+        return archive_idle_stores(idle_days=7)
+
+    def test_archive_and_restore(self):
+        self.assertEqual(self.archive()['archived'], 1)
+        self.assertFalse(os.path.isdir(self.path))
+        self.assertTrue(os.path.exists(archive_path(self.user.id)))
+
+        ensure_hot_store(self.user.id)
+        tier = VectorStoreTier.objects.get(user=self.user)
+        self.assertIsNone(tier.archived_at)
+        self.assertEqual(tier.restores, 1)
+        self.assertFalse(os.path.exists(archive_path(self.user.id)))
+        self.assertEqual(self.chunk_count(), self.chunks)
+
+    def test_recently_used_store_is_not_archived(self):
+        self.assertEqual(archive_idle_stores(idle_days=7)['archived'], 0)
+        self.assertTrue(os.path.isdir(self.path))
+
+    def test_empty_hot_copy_does_not_replace_archive(self):
+        self.archive()
+        # Left behind by a process that opened the store during the move
+        os.makedirs(self.path)
+
+        summary = archive_idle_stores(idle_days=7)
+        self.assertEqual(summary['recovered'], 1)
+        self.assertEqual(self.chunk_count(), self.chunks)
+
+    def test_stale_archive_next_to_hot_copy_is_dropped(self):
+        self.archive()
+        stale = f"{archive_path(self.user.id)}.stale"
+        shutil.copy(archive_path(self.user.id), stale)
+        ensure_hot_store(self.user.id)
+        self.upload('delta.txt', 'delta epsilon zeta ' * 200)
+        chunks = self.chunk_count()
+        # As left by a move interrupted before the hot copy was removed
+        os.replace(stale, archive_path(self.user.id))
+
+        summary = archive_idle_stores(idle_days=7)
+        self.assertEqual(summary['recovered'], 1)
+        self.assertFalse(os.path.exists(archive_path(self.user.id)))
+        self.assertGreater(chunks, self.chunks)
+        self.assertEqual(self.chunk_count(), chunks)
+
+    def test_missing_archive_does_not_start_an_empty_store(self):
+        self.archive()
+        os.remove(archive_path(self.user.id))
+
+        with self.assertRaises(ArchiveMissing):
+            ensure_hot_store(self.user.id)
+        self.assertFalse(os.path.isdir(self.path))
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from rag_service.vector_worker import EmbeddingBatcher, VectorWorkerClient, VectorWorkerError, VectorWorkerServer
+
+
+class StubWorker:
+
+    def __init__(self):
+        self.calls = []
+
+    def handle(self, op: str, params: dict):
+        self.calls.append(op)
+        if op == 'slow':
+            time.sleep(params['seconds'])
+        return op
+
+
+class VectorWorkerClientTests(SimpleTestCase):
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.socket_path = os.path.join(root, 'worker.sock')
+        self.worker = StubWorker()
+        self.server = VectorWorkerServer(self.socket_path, self.worker)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def test_call(self):
+        self.assertEqual(VectorWorkerClient(self.socket_path).call('ping'), 'ping')
+
+    def test_timed_out_request_is_not_sent_again(self):
+        client = VectorWorkerClient(self.socket_path, timeout=0.2)
+        with self.assertRaises(VectorWorkerError):
+            client.call('slow', seconds=0.5)
+        time.sleep(0.5)
+        self.assertEqual(self.worker.calls, ['slow'])
+
+    def test_missing_worker(self):
+        with self.assertRaises(VectorWorkerError):
+            VectorWorkerClient(os.path.join(os.path.dirname(self.socket_path), 'missing.sock')).call('ping')
+
+
+class RecordingEmbeddings:
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(('documents', list(texts)))
+        return [[0.0] for _ in texts]
+
+    def embed_query(self, text):
+        self.calls.append(('query', text))
+        return [1.0]
+
+
+class EmbeddingBatcherTests(SimpleTestCase):
+
+    def test_queries_use_embed_query(self):
+        embeddings = RecordingEmbeddings()
+        batcher = EmbeddingBatcher(embeddings)
+
+        self.assertEqual(batcher.embed(['a', 'b']), [[0.0], [0.0]])
+        self.assertEqual(batcher.embed(['what?', 'why?'], query=True), [[1.0], [1.0]])
+        self.assertEqual(embeddings.calls, [('documents', ['a', 'b']), ('query', 'what?'), ('query', 'why?')])
+
+    def test_concurrent_documents_and_queries(self):
+        embeddings = RecordingEmbeddings()
+        batcher = EmbeddingBatcher(embeddings, max_wait=0.05)
+        results = {}
+        threads = [
+            threading.Thread(target=lambda: results.update(docs=batcher.embed(['a', 'b', 'c']))),
+            threading.Thread(target=lambda: results.update(query=batcher.embed(['q'], query=True))),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, {'docs': [[0.0]] * 3, 'query': [[1.0]]})
@@ -0,0 +1,107 @@
+import os
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.utils import timezone
+
+from rag_service import personal_service, tasks, warming  # noqa: F401 tasks registers the maintenance jobs
+from rag_service.models import VectorStoreTier
+from rag_service.personal_service import vector_store_path
+from rag_service.scheduler import MAINTENANCE_JOBS
+from rag_service.tiering import archive_idle_stores, archive_path
+from rag_service.warming import warm_recent_stores, warm_user_store
+
+from .utils import VectorStoreTestCase
+
+
+class WarmRecentStoresTests(VectorStoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.upload('alpha.txt', 'alpha beta gamma ' * 200)
+        self.idle = self.create_user('idle')
+        self.client.force_authenticate(self.idle)
+        self.upload('delta.txt', 'delta epsilon zeta ' * 200)
+
+    def test_job_is_registered(self):
+        self.assertIs(MAINTENANCE_JOBS['warm_vector_stores']['func'], tasks.warm_vector_stores)
+
+    def test_reads_hot_stores_without_recording_access(self):
+        accessed = VectorStoreTier.objects.get(user=self.user).last_accessed_at
+
+        summary = warm_recent_stores()
+        self.assertEqual(summary['stores'], 2)
+        self.assertGreater(summary['bytes'], 0)
+        self.assertEqual(VectorStoreTier.objects.get(user=self.user).last_accessed_at, accessed)
+
+    def test_archived_store_stays_cold(self):
+        VectorStoreTier.objects.filter(user=self.idle).update(last_accessed_at=timezone.now() - timedelta(days=30))
+        archive_idle_stores(idle_days=7)
+
+        self.assertEqual(warm_recent_stores()['stores'], 1)
+        self.assertFalse(os.path.isdir(vector_store_path(self.idle.id, 'per_user')))
+
+    def test_byte_budget(self):
+        # Stops after the store that used up the budget
+        self.assertEqual(warm_recent_stores(max_bytes=1000)['stores'], 1)
+        self.assertEqual(warm_recent_stores(users=1)['stores'], 1)
+
+
+class InlineThread:
+    """Runs the warmup on start(), inside the test's transaction."""
+
+    def __init__(self, target, args, **kwargs):
+        self.target, self.args = target, args
+
+    def start(self):
+        self.target(*self.args)
+
+
+class WarmUserStoreTests(VectorStoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.upload('alpha.txt', 'alpha beta gamma ' * 200)
+        patchers = [
+            mock.patch.object(warming, 'threading', mock.Mock(Thread=InlineThread)),
+            # The warmup closes its thread's connection, which here is the test's
+            mock.patch.object(warming, 'connection'),
+            mock.patch.object(warming, '_budget', threading.BoundedSemaphore(1)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_archived_store_is_restored_and_pooled(self):
+        VectorStoreTier.objects.filter(user=self.user).update(last_accessed_at=timezone.now() - timedelta(days=30))
+        archive_idle_stores(idle_days=7)
+        personal_service.release_client(vector_store_path(self.user.id, 'per_user'))
+
+        self.assertTrue(warm_user_store(self.user.id))
+        self.assertFalse(os.path.exists(archive_path(self.user.id)))
+        self.assertIn(self.user.id, personal_service._services)
+        # The budget slot was given back
+        self.assertTrue(warm_user_store(self.user.id))
+
+    def test_user_without_documents_is_skipped(self):
+        self.assertFalse(warm_user_store(self.create_user('new').id))
+
+    def test_skipped_when_budget_is_used_up(self):
+        warming._budget.acquire()
+        self.assertFalse(warm_user_store(self.user.id))
+
+    def test_skipped_while_the_users_warmup_runs(self):
+        with mock.patch.object(warming, '_in_flight', {self.user.id}):
+            self.assertFalse(warm_user_store(self.user.id))
+
+    def test_disabled(self):
+        with self.settings(RAG_LOGIN_WARMUP=False):
+            self.assertFalse(warm_user_store(self.user.id))
+
+    def test_login_starts_warmup(self):
+        self.client.force_authenticate(None)
+        with mock.patch('rag_user.views.warm_user_store') as warm:
+            response = self.client.post('/login/', {'username_or_email': 'reader', 'password': 'pw'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        warm.assert_called_once_with(self.user.id)
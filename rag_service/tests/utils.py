@@ -0,0 +1,71 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from rest_framework.test import APITestCase
+
+from rag_service import personal_service, tiering
+from rag_service.models import UserDocument
+
+
+class VectorStoreMixin:
+    """
+    Runs against per-user vector stores in a temporary directory, with a
+    small deterministic embedding model and the fake LLM backend.
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        overrides = override_settings(
+            MEDIA_ROOT=self.root,
+            PERSONAL_VECTOR_DB_PATH=Path(self.root) / 'personal',
+            SHARED_VECTOR_DB_PATH=Path(self.root) / 'shared',
+            VECTOR_COLD_STORAGE_PATH=Path(self.root) / 'cold',
+            VECTOR_STORE_MODE='per_user',
+            VECTOR_WORKER_SOCKET=None,
+            RAG_LLM_BACKEND='fake',
+            FAKE_LLM_LATENCY_MS=0,
+            FAKE_LLM_TOKENS=5,
+            FAKE_LLM_TOKEN_MS=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        embeddings = mock.patch.dict(
+            personal_service._embeddings, {settings.EMBEDDING_MODEL: DeterministicFakeEmbedding(size=16)}
+        )
+        embeddings.start()
+        self.addCleanup(embeddings.stop)
+        # Users are numbered from 1 again in every test
+        touched = mock.patch.dict(tiering._touched, clear=True)
+        touched.start()
+        self.addCleanup(touched.stop)
+
+        self.user = self.create_user('reader')
+        self.client.force_authenticate(self.user)
+
+    def create_user(self, username: str):
+        user = get_user_model().objects.create_user(username=username, email=f'{username}@example.com', password='pw')
+        self.addCleanup(personal_service.release_client, personal_service.vector_store_path(user.id, 'per_user'))
+        return user
+
+    def upload(self, name: str, text: str):
+        response = self.client.post('/upload/', {'file': SimpleUploadedFile(name, text.encode())}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def chunk_count(self, user=None) -> int:
+        return personal_service.open_collection((user or self.user).id).count()
+
+    def document(self, doc_id: int) -> UserDocument:
+        return UserDocument.objects.get(id=doc_id)
+
+
+class VectorStoreTestCase(VectorStoreMixin, APITestCase):
+    pass
@@ -0,0 +1,278 @@
+import logging
+import os
+import re
+import shutil
+import tarfile
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.utils import timezone
+
+from .models import VectorStoreTier
+from .personal_service import (
+    collection_name, refresh_client, release_client, shared_mode, store_lock, vector_store_path,
+)
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_PATTERN = re.compile(r'^user_(\d+)\.tar\.gz$')
+# Last access is only written to the database this often per user and process
+TOUCH_INTERVAL = timedelta(hours=1)
+
+_touched = {}
+
+
+class ArchiveMissing(Exception):
+    """Raised when a store is recorded as archived but its archive is gone."""
+
+
+def archive_path(user_id: int) -> str:
+    return os.path.join(str(settings.VECTOR_COLD_STORAGE_PATH), f"user_{user_id}.tar.gz")
+
+
+def cold_store_user_ids() -> list:
+    root = str(settings.VECTOR_COLD_STORAGE_PATH)
+    if not os.path.isdir(root):
+        return []
+    return sorted(int(m.group(1)) for m in map(ARCHIVE_PATTERN.match, os.listdir(root)) if m)
+
+
+def touch_store(user_id: int):
+    now = timezone.now()
+    last = _touched.get(user_id)
+    if last is not None and now - last < TOUCH_INTERVAL:
+        return
+    updated = VectorStoreTier.objects.filter(
+        user_id=user_id, last_accessed_at__lt=now - TOUCH_INTERVAL
+    ).update(last_accessed_at=now)
+    if not updated:
+        VectorStoreTier.objects.get_or_create(user_id=user_id, defaults={'last_accessed_at': now})
+    _touched[user_id] = now
+
+
+def _unpack(user_id: int) -> str:
+    staging = f"{vector_store_path(user_id, 'per_user')}.restoring-{os.getpid()}-{threading.get_ident()}"
+    with tarfile.open(archive_path(user_id), 'r:gz') as tar:
+        tar.extractall(staging, filter='data')
+    return staging
+
+
+def restore_user_store(user_id: int, record_access: bool = True) -> bool:
+    """
+    Unpack a user's archived store back onto the hot tier. The caller holds
+    the store's exclusive lock.
+    """
+    path = vector_store_path(user_id, 'per_user')
+    archive = archive_path(user_id)
+    started = time.monotonic()
+
+    staging = _unpack(user_id)
+    try:
+        os.rename(staging, path)
+    except OSError:
+        # Another process restored it first
+        shutil.rmtree(staging, ignore_errors=True)
+        return False
+    os.remove(archive)
+
+    duration = time.monotonic() - started
+    access = {'last_accessed_at': timezone.now()} if record_access else {}
+    VectorStoreTier.objects.filter(user_id=user_id).update(
+        archived_at=None,
+        archive_size=0,
+        restores=F('restores') + 1,
+        last_restore_duration=duration,
+        total_restore_duration=F('total_restore_duration') + duration,
+        **access,
+    )
+    logger.info(f"Restored vector store of user {user_id} from cold storage in {duration * 1000:.0f}ms")
+    return True
+
+
+def ensure_hot_store(user_id: int, record_access: bool = True):
+    """
+    Make sure the user's store is on the hot tier and record the access.
+    Called whenever a per-user store is opened, so archived stores come
+    back lazily. The access is recorded under the store lock, so an
+    archive run that has not claimed the store yet sees it and skips it.
+    Maintenance jobs pass record_access=False so the store's idle clock
+    keeps running and it goes back to cold storage on the next run.
+    """
+    path = vector_store_path(user_id, 'per_user')
+    with store_lock(path):
+        hot = os.path.isdir(path)
+        if hot:
+            # A store archived and restored by another process is a new directory
+            refresh_client(path)
+            if record_access:
+                touch_store(user_id)
+    if hot:
+        return
+
+    with store_lock(path, exclusive=True):
+        if not os.path.isdir(path):
+            if os.path.exists(archive_path(user_id)):
+                restore_user_store(user_id, record_access=record_access)
+            elif VectorStoreTier.objects.filter(user_id=user_id, archived_at__isnull=False).exists():
+                # Creating the directory now would start the user over with an empty store
+                raise ArchiveMissing(f"Vector store of user {user_id} is archived but {archive_path(user_id)} is missing")
+        refresh_client(path)
+        if record_access:
+            touch_store(user_id)
+
+
+def archive_user_store(user_id: int, cutoff) -> int:
+    """
+    Pack the user's store into the cold tier if it has not been accessed
+    since `cutoff`. Returns the archive size in bytes, or 0 if skipped.
+    """
+    path = vector_store_path(user_id, 'per_user')
+    archive = archive_path(user_id)
+    if not os.path.isdir(path):
+        return 0
+
+    with store_lock(path, exclusive=True):
+        if not os.path.isdir(path):
+            return 0
+        release_client(path)
+        os.makedirs(os.path.dirname(archive), exist_ok=True)
+        partial = f"{archive}.partial"
+        with tarfile.open(partial, 'w:gz') as tar:
+            tar.add(path, arcname='.')
+        with open(partial, 'rb') as f:
+            os.fsync(f.fileno())
+        size = os.path.getsize(partial)
+
+        # The user may have come back while the archive was being written
+        claimed = VectorStoreTier.objects.filter(
+            user_id=user_id, last_accessed_at__lt=cutoff, archived_at__isnull=True
+        ).update(archived_at=timezone.now(), archive_size=size)
+        if not claimed:
+            os.remove(partial)
+            return 0
+
+        os.replace(partial, archive)
+        shutil.rmtree(path)
+        _touched.pop(user_id, None)
+
+    logger.info(f"Moved vector store of user {user_id} to cold storage ({size} bytes)")
+    return size
+
+
+def _chunk_count(path: str, user_id: int) -> int:
+    import chromadb
+    from chromadb.errors import NotFoundError
+
+    try:
+        return chromadb.PersistentClient(path=path).get_collection(collection_name(user_id, 'per_user')).count()
+    except NotFoundError:
+        return 0
+    finally:
+        release_client(path)
+
+
+def resolve_archive_conflict(user_id: int) -> str:
+    """
+    Settle a store that is both hot and archived, left behind by an
+    interrupted move. The archive is only dropped if the hot copy holds at
+    least as many chunks; otherwise the hot copy is moved aside and the
+    archive restored. Returns 'hot', 'archive', or '' if there was nothing
+    to settle.
+    """
+    path = vector_store_path(user_id, 'per_user')
+    archive = archive_path(user_id)
+    with store_lock(path, exclusive=True):
+        if not (os.path.isdir(path) and os.path.exists(archive)):
+            return ''
+        staging = _unpack(user_id)
+        try:
+            archived = _chunk_count(staging, user_id)
+            release_client(path)
+            hot = _chunk_count(path, user_id)
+            if hot >= archived:
+                winner = 'hot'
+            else:
+                winner = 'archive'
+                aside = f"{path}.conflict-{int(time.time())}"
+                os.rename(path, aside)
+                os.rename(staging, path)
+                logger.warning(
+                    f"Hot vector store of user {user_id} had {hot} chunks, its archive {archived}; "
+                    f"restored the archive and kept the hot copy at {aside}"
+                )
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        os.remove(archive)
+        VectorStoreTier.objects.filter(user_id=user_id).update(archived_at=None, archive_size=0)
+        _touched.pop(user_id, None)
+    return winner
+
+
+def archive_idle_stores(idle_days: int = None, dry_run: bool = False) -> dict:
+    """Move per-user stores idle for more than `idle_days` to the cold tier."""
+    from .compaction import directory_size, user_store_dirs
+
+    idle_days = settings.VECTOR_STORE_IDLE_DAYS if idle_days is None else idle_days
+    summary = {'archived': 0, 'bytes_freed': 0, 'archive_bytes': 0, 'recovered': 0, 'orphan_archives': 0, 'failed': []}
+    if shared_mode() or idle_days <= 0:
+        return summary
+
+    now = timezone.now()
+    cutoff = now - timedelta(days=idle_days)
+    stores = user_store_dirs()
+
+    # Start the idle clock for stores that predate access tracking
+    tracked = set(VectorStoreTier.objects.filter(user_id__in=stores).values_list('user_id', flat=True))
+    users = set(get_user_model().objects.filter(id__in=stores).values_list('id', flat=True))
+    if not dry_run:
+        VectorStoreTier.objects.bulk_create(
+            [VectorStoreTier(user_id=user_id, last_accessed_at=now) for user_id in users - tracked],
+            ignore_conflicts=True,
+        )
+
+    # An archive next to a hot store means a move was interrupted
+    for user_id in cold_store_user_ids():
+        if user_id in stores:
+            if not dry_run:
+                try:
+                    resolve_archive_conflict(user_id)
+                except Exception as e:
+                    logger.error(f"Recovering vector store of user {user_id} failed: {e}")
+                    summary['failed'].append(user_id)
+                    continue
+            summary['recovered'] += 1
+        elif not VectorStoreTier.objects.filter(user_id=user_id).exists():
+            # The user was deleted
+            if not dry_run:
+                os.remove(archive_path(user_id))
+            summary['orphan_archives'] += 1
+
+    idle = list(VectorStoreTier.objects.filter(
+        user_id__in=stores, last_accessed_at__lt=cutoff, archived_at__isnull=True
+    ).values_list('user_id', flat=True))
+    for user_id in idle:
+        size = directory_size(stores[user_id])
+        if dry_run:
+            summary['archived'] += 1
+            summary['bytes_freed'] += size
+            continue
+        try:
+            archive_size = archive_user_store(user_id, cutoff)
+        except Exception as e:
+            logger.error(f"Archiving vector store of user {user_id} failed: {e}")
+            summary['failed'].append(user_id)
+            continue
+        if archive_size:
+            summary['archived'] += 1
+            summary['bytes_freed'] += size
+            summary['archive_bytes'] += archive_size
+
+    logger.info(
+        f"Vector store tiering: {summary['archived']} stores archived, "
+        f"{summary['bytes_freed']} bytes freed on the hot tier"
+    )
+    return summary
@@ -0,0 +1,55 @@
+"""
+Per-request stage timings, reported in the Server-Timing response header
+(see rag_service.middleware.ServerTimingMiddleware and SERVER_TIMING).
+
+    with stage('retrieve'):
+        docs = vector_store.similarity_search(...)
+
+Outside a timed request, stage() only costs an attribute lookup.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+def start_request():
+    _local.stages = {}
+
+
+def finish_request() -> dict:
+    """Stop recording and return {stage: milliseconds} for the current request."""
+    stages = getattr(_local, 'stages', None) or {}
+    _local.stages = None
+    return stages
+
+
+@contextmanager
+def stage(name: str):
+    # Stages run in the request thread; work handed to other threads is
+    # timed by the stage that waits for it
+    stages = getattr(_local, 'stages', None)
+    if stages is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[name] = stages.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+
+def parse_server_timing(header: str) -> dict:
+    """{name: milliseconds} from a Server-Timing header value."""
+    timings = {}
+    for metric in (header or '').split(','):
+        name, _, params = metric.strip().partition(';')
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'dur' and name:
+                try:
+                    timings[name] = float(value)
+                except ValueError:
+                    pass
+    return timings
@@ -1,8 +1,28 @@
 from django.urls import path
-from .views import DocumentUploadView, ChatView, ChatHistoryView
+from .views import (
+    DocumentUploadView,
+    BulkDocumentUploadView,
+    DocumentDetailView,
+    DocumentCitationView,
+    UploadSessionCreateView,
+    UploadSessionView,
+    UploadSessionFinalizeView,
+    ChatView,
+    BatchChatView,
+    ChatHistoryView,
+    ProfileView,
+)
 
 urlpatterns = [
     path('upload/', DocumentUploadView.as_view(), name='upload-document'),
+    path('upload/bulk/', BulkDocumentUploadView.as_view(), name='bulk-upload-documents'),
+    path('upload/sessions/', UploadSessionCreateView.as_view(), name='upload-session-create'),
+    path('upload/sessions/<uuid:session_id>/', UploadSessionView.as_view(), name='upload-session'),
+    path('upload/sessions/<uuid:session_id>/finalize/', UploadSessionFinalizeView.as_view(), name='upload-session-finalize'),
+    path('documents/<int:doc_id>/', DocumentDetailView.as_view(), name='document-detail'),
+    path('documents/<int:doc_id>/citation/', DocumentCitationView.as_view(), name='document-citation'),
     path('chat/', ChatView.as_view(), name='chat'),
+    path('chat/batch/', BatchChatView.as_view(), name='chat-batch'),
     path('chat-history/', ChatHistoryView.as_view(), name='chat-history'),
+    path('profiling/', ProfileView.as_view(), name='profiling'),
 ]
\ No newline at end of file
@@ -0,0 +1,74 @@
+import logging
+import os
+
+from .compaction import PAGE_SIZE, user_store_dirs
+from .models import UserDocument
+from .tiering import cold_store_user_ids, ensure_hot_store
+from .personal_service import (
+    clear_vector_store, collection_name, collection_stamp, embedding_stamp, open_collection, scoped_where,
+    vector_store_path,
+)
+
+logger = logging.getLogger(__name__)
+
+MODES = ('per_user', 'shared')
+
+
+def _source_user_ids(mode: str) -> list:
+    if mode == 'per_user':
+        return sorted(set(user_store_dirs()) | set(cold_store_user_ids()))
+    return list(UserDocument.objects.order_by('user_id').values_list('user_id', flat=True).distinct())
+
+
+def migrate_user_store(user_id: int, source: str, target: str, keep_source: bool = False) -> int:
+    """
+    Copy one user's chunks, with their stored embeddings, from one layout
+    to the other. Uses upsert with the original ids, so re-running after an
+    interruption is safe.
+    """
+    if source == 'per_user':
+        ensure_hot_store(user_id)
+        if not os.path.isdir(vector_store_path(user_id, source)):
+            return 0
+
+    src = open_collection(user_id, source)
+    if collection_stamp(src) != embedding_stamp():
+        # Copied vectors would land next to vectors from a different model
+        raise ValueError(f"{collection_name(user_id, source)} was embedded with another model; re-embed it first")
+    dst = open_collection(user_id, target)
+    where = scoped_where(user_id, mode=source)
+
+    copied = 0
+    offset = 0
+    while True:
+        page = src.get(where=where, include=['embeddings', 'documents', 'metadatas'], limit=PAGE_SIZE, offset=offset)
+        if not page['ids']:
+            break
+        metadatas = [dict(metadata or {}, user_id=user_id) for metadata in page['metadatas']]
+        dst.upsert(ids=page['ids'], embeddings=page['embeddings'], documents=page['documents'], metadatas=metadatas)
+        copied += len(page['ids'])
+        offset += len(page['ids'])
+
+    if not keep_source:
+        clear_vector_store(user_id, source)
+    logger.info(
+        f"Moved {copied} chunks of user {user_id} from {collection_name(user_id, source)} "
+        f"to {collection_name(user_id, target)}"
+    )
+    return copied
+
+
+def migrate_vector_stores(target: str, user_ids: list = None, keep_source: bool = False) -> dict:
+    if target not in MODES:
+        raise ValueError(f"Unknown vector store mode: {target}")
+    source = 'shared' if target == 'per_user' else 'per_user'
+
+    summary = {'users': 0, 'chunks': 0, 'failed': []}
+    for user_id in user_ids or _source_user_ids(source):
+        try:
+            summary['chunks'] += migrate_user_store(user_id, source, target, keep_source=keep_source)
+            summary['users'] += 1
+        except Exception as e:
+            logger.error(f"Migrating vector store of user {user_id} to {target} failed: {e}")
+            summary['failed'].append(user_id)
+    return summary
@@ -0,0 +1,442 @@
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+import uuid
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+logger = logging.getLogger(__name__)
+
+# Every message is a 4-byte big-endian length followed by a UTF-8 JSON body
+HEADER = struct.Struct('>I')
+MAX_MESSAGE_SIZE = 256 * 1024 * 1024
+
+
+class VectorWorkerError(Exception):
+    """Raised by the client when the worker reports an error or is unreachable."""
+
+
+def send_message(sock, payload: dict):
+    body = json.dumps(payload).encode('utf-8')
+    sock.sendall(HEADER.pack(len(body)) + body)
+
+
+def _recv_exact(sock, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        part = sock.recv(size - len(buf))
+        if not part:
+            raise ConnectionError("Connection closed by peer")
+        buf.extend(part)
+    return bytes(buf)
+
+
+def recv_message(sock) -> dict:
+    (size,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+    if size > MAX_MESSAGE_SIZE:
+        raise ConnectionError(f"Message of {size} bytes exceeds limit")
+    return json.loads(_recv_exact(sock, size).decode('utf-8'))
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces embedding requests from concurrent connections into a single
+    encode call. Callers block on a future until their slice is ready.
+    Search queries go through embed_query, which some models encode
+    differently from documents.
+    """
+
+    def __init__(self, embeddings, max_batch: int = 64, max_wait: float = 0.01):
+        self.embeddings = embeddings
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = Queue()
+        self._thread = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+        self._thread.start()
+
+    def embed(self, texts: list, query: bool = False) -> list:
+        if not texts:
+            return []
+        future = Future()
+        self._queue.put((list(texts), query, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][0])
+            while size < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=self.max_wait)
+                except Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            for query in (False, True):
+                self._encode([(texts, future) for texts, is_query, future in pending if is_query == query], query)
+
+    def _encode(self, pending: list, query: bool):
+        if not pending:
+            return
+        texts = [text for item_texts, _ in pending for text in item_texts]
+        try:
+            if query:
+                vectors = [self.embeddings.embed_query(text) for text in texts]
+            else:
+                vectors = self.embeddings.embed_documents(texts)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for item_texts, future in pending:
+            future.set_result(vectors[offset:offset + len(item_texts)])
+            offset += len(item_texts)
+
+
+def _stale_collection_errors() -> tuple:
+    # Raised for a handle whose collection was deleted or replaced:
+    # NotFoundError in chromadb 1.x, InvalidCollectionException before
+    import chromadb.errors
+
+    return tuple(
+        getattr(chromadb.errors, name)
+        for name in ('NotFoundError', 'InvalidCollectionException')
+        if hasattr(chromadb.errors, name)
+    )
+
+
+def _inode(path: str):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+class VectorWorker:
+    """
+    Owns the embedding model and the per-user Chroma handles for this node.
+    All web workers talk to one instance through VectorWorkerClient.
+    """
+
+    def __init__(self, max_batch: int = 64, max_wait: float = 0.01):
+        from django.conf import settings
+
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._batchers = {}
+        self._batchers_lock = threading.Lock()
+        self.batcher = self._batcher(settings.EMBEDDING_MODEL)
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def _batcher(self, model_name: str) -> EmbeddingBatcher:
+        # One batcher per model; a second one only exists while a re-embedding rolls out
+        from .personal_service import get_embeddings
+
+        with self._batchers_lock:
+            batcher = self._batchers.get(model_name)
+            if batcher is None:
+                batcher = EmbeddingBatcher(get_embeddings(model_name), max_batch=self.max_batch, max_wait=self.max_wait)
+                self._batchers[model_name] = batcher
+            return batcher
+
+    def _collection_batcher(self, collection) -> EmbeddingBatcher:
+        from .personal_service import collection_stamp
+
+        return self._batcher(collection_stamp(collection)['embedding_model'])
+
+    def _collection(self, user_id: int):
+        from .personal_service import open_collection, shared_mode, vector_store_path
+
+        if not shared_mode():
+            from .tiering import ensure_hot_store
+
+            # Restores an archived store and releases the client of a replaced directory.
+            # The web process that sent the request already recorded the access.
+            ensure_hot_store(user_id, record_access=False)
+        path = vector_store_path(user_id)
+        with self._lock:
+            cached = self._collections.get(user_id)
+            if cached is not None:
+                if cached[1] == _inode(path):
+                    return cached[0]
+                # Archived and restored by another process: a new directory,
+                # while Chroma's client for the path still has the old one open
+                self._drop_collections(path)
+            collection = open_collection(user_id, record_access=False)
+            self._collections[user_id] = (collection, _inode(path))
+            return collection
+
+    def _drop_collections(self, path: str):
+        # Caller holds the lock. Releasing the client invalidates every
+        # collection opened through it, which in shared mode means every user's
+        from .personal_service import release_client, vector_store_path
+
+        for user_id in [u for u in self._collections if vector_store_path(u) == path]:
+            del self._collections[user_id]
+        release_client(path)
+
+    def _forget_collection(self, user_id: int):
+        from .personal_service import vector_store_path
+
+        with self._lock:
+            self._drop_collections(vector_store_path(user_id))
+
+    def _store_lock(self, user_id: int):
+        # Taken after _collection, which may need the exclusive lock to restore the store
+        from .personal_service import store_lock, vector_store_path
+
+        return store_lock(vector_store_path(user_id))
+
+    def handle(self, op: str, params: dict):
+        handler = getattr(self, f'op_{op}', None)
+        if handler is None:
+            raise ValueError(f"Unknown operation: {op}")
+        try:
+            return handler(**params)
+        except _stale_collection_errors():
+            if 'user_id' not in params:
+                raise
+            # The collection was swapped out by maintenance; reopen once
+            self._forget_collection(params['user_id'])
+            return handler(**params)
+
+    def op_ping(self):
+        return 'pong'
+
+    def op_embed(self, texts: list):
+        return self.batcher.embed(texts)
+
+    def op_ingest(self, user_id: int, texts: list, metadatas: list, ids: list = None):
+        ids = ids or [uuid.uuid4().hex for _ in texts]
+        collection = self._collection(user_id)
+        vectors = self._collection_batcher(collection).embed(texts)
+        with self._store_lock(user_id):
+            collection.add(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+        return ids
+
+    def op_search(self, user_id: int, query: str, k: int, where: dict = None):
+        from .personal_service import scoped_where
+
+        collection = self._collection(user_id)
+        if collection.count() == 0:
+            return []
+        vector = self._collection_batcher(collection).embed([query], query=True)[0]
+        result = collection.query(
+            query_embeddings=[vector],
+            n_results=k,
+            where=scoped_where(user_id, where),
+            include=['documents', 'metadatas', 'distances'],
+        )
+        return [
+            {'page_content': text, 'metadata': metadata or {}, 'distance': distance}
+            for text, metadata, distance in zip(
+                result['documents'][0], result['metadatas'][0], result['distances'][0]
+            )
+        ]
+
+    def op_search_batch(self, user_id: int, queries: list, k: int, where: dict = None):
+        from .personal_service import scoped_where
+
+        collection = self._collection(user_id)
+        if collection.count() == 0:
+            return [[] for _ in queries]
+        vectors = self._collection_batcher(collection).embed(queries, query=True)
+        result = collection.query(
+            query_embeddings=vectors,
+            n_results=k,
+            where=scoped_where(user_id, where),
+            include=['documents', 'metadatas', 'distances'],
+        )
+        return [
+            [
+                {'page_content': text, 'metadata': metadata or {}, 'distance': distance}
+                for text, metadata, distance in zip(texts, metadatas, distances)
+            ]
+            for texts, metadatas, distances in zip(result['documents'], result['metadatas'], result['distances'])
+        ]
+
+    def op_get(self, user_id: int, where: dict = None, ids: list = None):
+        from .personal_service import scoped_where
+
+        result = self._collection(user_id).get(ids=ids, where=scoped_where(user_id, where), include=['metadatas'])
+        return {'ids': result['ids'], 'metadatas': result['metadatas']}
+
+    def op_delete(self, user_id: int, ids: list):
+        if ids:
+            collection = self._collection(user_id)
+            with self._store_lock(user_id):
+                collection.delete(ids=ids)
+        return len(ids)
+
+    def op_count(self, user_id: int):
+        from .personal_service import count_chunks
+
+        return count_chunks(self._collection(user_id), user_id)
+
+    def op_clear(self, user_id: int):
+        from .personal_service import clear_vector_store
+
+        with self._lock:
+            self._collections.pop(user_id, None)
+        return clear_vector_store(user_id)
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        from django.db import close_old_connections, connection
+
+        try:
+            while True:
+                try:
+                    message = recv_message(self.request)
+                except (ConnectionError, OSError):
+                    return
+                try:
+                    reply = {'ok': True, 'result': self.server.worker.handle(message['op'], message.get('params', {}))}
+                except Exception as e:
+                    logger.error(f"Vector worker op {message.get('op')} failed: {e}")
+                    reply = {'ok': False, 'error': str(e)}
+                finally:
+                    # Opening a store may restore it from cold storage, which writes to the database
+                    close_old_connections()
+                try:
+                    send_message(self.request, reply)
+                except (ConnectionError, OSError):
+                    # The client gave up waiting
+                    return
+        finally:
+            # Each connection is served by its own thread, with its own database connection
+            connection.close()
+
+
+class VectorWorkerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, worker: VectorWorker):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.worker = worker
+        super().__init__(socket_path, _RequestHandler)
+        # Local users only
+        os.chmod(socket_path, 0o660)
+
+
+class VectorWorkerClient:
+    """Thin client used inside web workers. Keeps one connection per thread."""
+
+    def __init__(self, socket_path: str, timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            try:
+                sock.close()
+            finally:
+                self._local.sock = None
+
+    def call(self, op: str, **params):
+        # One retry covers a worker restart that invalidated a cached connection
+        for attempt in range(2):
+            try:
+                sock = getattr(self._local, 'sock', None)
+                if sock is None:
+                    sock = self._connect()
+                    self._local.sock = sock
+                send_message(sock, {'op': op, 'params': params})
+                reply = recv_message(sock)
+                break
+            except TimeoutError:
+                # The worker may still be running the request, so sending it again could apply it twice
+                self._close()
+                raise VectorWorkerError(f"Vector worker at {self.socket_path} did not answer {op} within {self.timeout}s")
+            except ConnectionError as e:
+                self._close()
+                if attempt:
+                    raise VectorWorkerError(f"Vector worker unavailable at {self.socket_path}: {e}")
+            except OSError as e:
+                self._close()
+                raise VectorWorkerError(f"Vector worker unavailable at {self.socket_path}: {e}")
+
+        if not reply.get('ok'):
+            raise VectorWorkerError(reply.get('error', 'Unknown vector worker error'))
+        return reply['result']
+
+
+class RemoteVectorStore:
+    """
+    Stand-in for the LangChain Chroma store that forwards to the vector
+    worker, exposing the subset of methods PersonalRAGService relies on.
+    """
+
+    def __init__(self, client: VectorWorkerClient, user_id: int):
+        self.client = client
+        self.user_id = user_id
+
+    def add_documents(self, documents: list, ids: list = None) -> list:
+        return self.client.call(
+            'ingest',
+            user_id=self.user_id,
+            texts=[doc.page_content for doc in documents],
+            metadatas=[doc.metadata for doc in documents],
+            ids=ids,
+        )
+
+    def similarity_search(self, query: str, k: int = 4, filter: dict = None) -> list:
+        from langchain_core.documents import Document
+
+        hits = self.client.call('search', user_id=self.user_id, query=query, k=k, where=filter)
+        return [Document(page_content=hit['page_content'], metadata=hit['metadata']) for hit in hits]
+
+    def similarity_search_batch(self, queries: list, k: int = 4, filter: dict = None) -> list:
+        from langchain_core.documents import Document
+
+        results = self.client.call('search_batch', user_id=self.user_id, queries=queries, k=k, where=filter)
+        return [
+            [Document(page_content=hit['page_content'], metadata=hit['metadata']) for hit in hits]
+            for hits in results
+        ]
+
+    def get(self, ids: list = None, where: dict = None) -> dict:
+        return self.client.call('get', user_id=self.user_id, ids=ids, where=where)
+
+    def delete(self, ids: list):
+        return self.client.call('delete', user_id=self.user_id, ids=ids)
+
+    def count(self) -> int:
+        return self.client.call('count', user_id=self.user_id)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_worker_client():
+    """Return the process-wide client, or None when no worker is configured."""
+    global _client
+    from django.conf import settings
+
+    socket_path = getattr(settings, 'VECTOR_WORKER_SOCKET', None)
+    if not socket_path:
+        return None
+    with _client_lock:
+        if _client is None or _client.socket_path != socket_path:
+            _client = VectorWorkerClient(socket_path)
+        return _client
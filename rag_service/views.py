@@ -1,21 +1,36 @@
 import logging
 
+from django.conf import settings
+from django.http import HttpResponse
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework import status
+from rest_framework.generics import get_object_or_404
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from drf_spectacular.types import OpenApiTypes
 
-from .models import UserDocument, ChatHistory
+from .models import UserDocument, ChatHistory, UploadSession
 from .serializers import (
     UserDocumentUploadSerializer,
     UserDocumentSerializer,
+    BulkDocumentUploadSerializer,
+    UploadSessionCreateSerializer,
+    UploadSessionSerializer,
     ChatSerializer,
+    BatchChatSerializer,
     ChatHistorySerializer,
+    CitationSerializer,
 )
-from .personal_service import PersonalRAGService
+from .personal_service import get_service
+from .timing import stage
+from .bulk_upload import bulk_upload
+from .pagination import ChatHistoryCursorPagination
+from .deletion import tombstone_document
+from .chunked_upload import append_chunk, finalize_session, UploadConflict, UploadIncomplete
+from .citations import read_citation, CitationUnavailable
 
 logger = logging.getLogger(__name__)
 
@@ -48,10 +63,12 @@ class DocumentUploadView(APIView):
         """Upload and process document."""
         serializer = UserDocumentUploadSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
-        document = serializer.save()
+        with stage('store'):
+            document = serializer.save()
         
         try:
-            service = PersonalRAGService(request.user.id)
+            with stage('open'):
+                service = get_service(request.user.id)
             chunk_count = service.process_document(document.file.path, document.id)
             
             if chunk_count > 0:
@@ -66,6 +83,215 @@ class DocumentUploadView(APIView):
             return Response({'error': 'Processing failed'}, status=500)
 
 
+class DocumentDetailView(APIView):
+    """Delete a document."""
+
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Delete document",
+        description="Delete a document. It stops being used for answers immediately; "
+                    "its file and vectors are removed in the background.",
+        responses={204: None}
+    )
+    def delete(self, request, doc_id):
+        document = get_object_or_404(UserDocument, pk=doc_id, user=request.user, deleted_at__isnull=True)
+        tombstone_document(document)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class DocumentCitationView(APIView):
+    """Return the text of one cited chunk."""
+
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Get cited text",
+        description="Return the text between the `start` and `end` byte offsets of a citation from a chat "
+                    "answer's `sources`. Only that span is read, so clients can show citations without "
+                    "downloading the document.",
+        parameters=[
+            OpenApiParameter('start', OpenApiTypes.INT, required=True, description="Citation start offset"),
+            OpenApiParameter('end', OpenApiTypes.INT, required=True, description="Citation end offset"),
+        ],
+        responses={200: OpenApiTypes.OBJECT}
+    )
+    def get(self, request, doc_id):
+        document = get_object_or_404(UserDocument, pk=doc_id, user=request.user, deleted_at__isnull=True)
+        serializer = CitationSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        start = serializer.validated_data['start']
+        end = serializer.validated_data['end']
+
+        try:
+            text, end = read_citation(document, start, end)
+        except CitationUnavailable as e:
+            return Response({'error': str(e)}, status=404)
+        except ValueError as e:
+            return Response({'start': [str(e)]}, status=400)
+        return Response({
+            'document_id': document.id,
+            'title': document.title,
+            'start': start,
+            'end': end,
+            'text': text,
+        })
+
+
+class BulkDocumentUploadView(APIView):
+    """Upload many documents, or a ZIP archive of documents, in one request."""
+
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    @extend_schema(
+        summary="Bulk upload documents",
+        description="Upload several documents (PDF, DOCX, TXT) and/or a ZIP archive of them. "
+                    "Files are ingested concurrently and a result is returned for each file.",
+        request={
+            'multipart/form-data': {
+                'type': 'object',
+                'properties': {
+                    'files': {
+                        'type': 'array',
+                        'items': {'type': 'string', 'format': 'binary'},
+                        'description': 'Document files (PDF, DOCX, TXT)'
+                    },
+                    'archive': {
+                        'type': 'string',
+                        'format': 'binary',
+                        'description': 'ZIP archive of documents'
+                    }
+                }
+            }
+        },
+        responses={201: OpenApiTypes.OBJECT}
+    )
+    def post(self, request):
+        """Upload and process documents in bulk."""
+        serializer = BulkDocumentUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            results = bulk_upload(
+                request.user,
+                files=serializer.validated_data.get('files'),
+                archive=serializer.validated_data.get('archive'),
+            )
+        except Exception as e:
+            logger.error(f"Bulk upload failed: {e}")
+            return Response({'error': 'Processing failed'}, status=500)
+
+        return Response({
+            'processed': sum(1 for result in results if result['status'] == 'processed'),
+            'failed': sum(1 for result in results if result['status'] != 'processed'),
+            'results': results,
+        }, status=201)
+
+
+class UploadSessionCreateView(APIView):
+    """Start a resumable chunked upload."""
+
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Start chunked upload",
+        description="Start a resumable upload for a large document. Send the file in chunks to "
+                    "the returned session, then finalize it to start processing.",
+        request=UploadSessionCreateSerializer,
+        responses={201: UploadSessionSerializer}
+    )
+    def post(self, request):
+        serializer = UploadSessionCreateSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        session = serializer.save()
+        data = UploadSessionSerializer(session).data
+        data['chunk_size'] = settings.UPLOAD_CHUNK_MAX_SIZE
+        return Response(data, status=201)
+
+
+class UploadSessionView(APIView):
+    """Check progress of, or append a chunk to, a chunked upload."""
+
+    permission_classes = [IsAuthenticated]
+    # Chunk bodies are streamed to disk from request.stream, never parsed
+    parser_classes = []
+
+    def get_session(self, request, session_id):
+        return get_object_or_404(UploadSession, pk=session_id, user=request.user)
+
+    @extend_schema(
+        summary="Get chunked upload status",
+        description="Returns the current offset so an interrupted upload can resume from it.",
+        responses={200: UploadSessionSerializer}
+    )
+    def get(self, request, session_id):
+        return Response(UploadSessionSerializer(self.get_session(request, session_id)).data)
+
+    @extend_schema(
+        summary="Append chunk",
+        description="Send raw bytes (application/octet-stream) with an `Upload-Offset` header "
+                    "equal to the session's current offset.",
+        parameters=[
+            OpenApiParameter('Upload-Offset', OpenApiTypes.INT, OpenApiParameter.HEADER, required=True),
+        ],
+        request={'application/octet-stream': {'type': 'string', 'format': 'binary'}},
+        responses={200: UploadSessionSerializer, 409: OpenApiTypes.OBJECT}
+    )
+    def patch(self, request, session_id):
+        session = self.get_session(request, session_id)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers.get('Content-Length') or 0)
+        except (KeyError, ValueError):
+            return Response({'error': 'Upload-Offset and Content-Length headers are required'}, status=400)
+
+        if length <= 0:
+            return Response({'error': 'Empty chunk'}, status=400)
+        if length > settings.UPLOAD_CHUNK_MAX_SIZE:
+            return Response({'error': f'Chunk cannot exceed {settings.UPLOAD_CHUNK_MAX_SIZE} bytes'}, status=413)
+
+        try:
+            append_chunk(session, offset, request.stream, length)
+        except UploadConflict as e:
+            return Response({'error': str(e), 'offset': e.offset}, status=409)
+        return Response(UploadSessionSerializer(session).data)
+
+
+class UploadSessionFinalizeView(APIView):
+    """Verify a chunked upload and start processing it."""
+
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Finalize chunked upload",
+        description="Verifies the size and SHA-256 checksum, creates the document and starts "
+                    "processing it in the background. Poll the session until `document.processed` is true, "
+                    "or `status` is `failed` with the reason in `error`.",
+        request=None,
+        responses={202: UploadSessionSerializer, 400: OpenApiTypes.OBJECT}
+    )
+    def post(self, request, session_id):
+        session = get_object_or_404(UploadSession, pk=session_id, user=request.user)
+        try:
+            finalize_session(session)
+        except UploadIncomplete as e:
+            return Response({'error': str(e), 'offset': session.received}, status=400)
+        return Response(UploadSessionSerializer(session).data, status=202)
+
+
+def filter_document_ids(user, data):
+    """Ids of the documents selected by `doc_id`/`title`, or None to search all of them."""
+    if 'doc_id' not in data and 'title' not in data:
+        return None
+    documents = UserDocument.objects.filter(user=user, deleted_at__isnull=True)
+    if 'doc_id' in data:
+        documents = documents.filter(id=data['doc_id'])
+    if 'title' in data:
+        documents = documents.filter(title=data['title'])
+    return list(documents.values_list('id', flat=True))
+
+
 class ChatView(APIView):
     """Chat with the RAG-powered chatbot."""
     
@@ -73,7 +299,8 @@ class ChatView(APIView):
 
     @extend_schema(
         summary="Send message to chatbot",
-        description="Send a question and receive an AI-generated response based on your documents.",
+        description="Send a question and receive an AI-generated response based on your documents. "
+                    "Pass `doc_id` or `title` to search only that document.",
         request=ChatSerializer,
         responses={200: OpenApiTypes.OBJECT}
     )
@@ -84,17 +311,23 @@ class ChatView(APIView):
         
         question = serializer.validated_data['question']
         chat_history = serializer.validated_data.get('chat_history', [])
+
+        doc_ids = filter_document_ids(request.user, serializer.validated_data)
+        if doc_ids == []:
+            return Response({'error': 'Document not found'}, status=404)
         
         try:
-            service = PersonalRAGService(request.user.id)
-            result = service.query(question, chat_history)
+            with stage('open'):
+                service = get_service(request.user.id)
+            result = service.query(question, chat_history, doc_ids=doc_ids)
             
             # Save to chat history
-            ChatHistory.objects.create(
-                user=request.user,
-                query=question,
-                response=result['answer']
-            )
+            with stage('history'):
+                ChatHistory.objects.create(
+                    user=request.user,
+                    query=question,
+                    response=result['answer']
+                )
             
             return Response({
                 'question': question,
@@ -106,6 +339,53 @@ class ChatView(APIView):
             return Response({'error': str(e)}, status=500)
 
 
+class BatchChatView(APIView):
+    """Answer several questions in one request."""
+
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        summary="Send several questions to the chatbot",
+        description="Answer up to CHAT_BATCH_MAX_QUESTIONS questions about your documents in one request, "
+                    "e.g. to build an FAQ. Answers are returned in the order of the questions.",
+        request=BatchChatSerializer,
+        responses={200: OpenApiTypes.OBJECT}
+    )
+    def post(self, request):
+        serializer = BatchChatSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        questions = serializer.validated_data['questions']
+        doc_ids = filter_document_ids(request.user, serializer.validated_data)
+        if doc_ids == []:
+            return Response({'error': 'Document not found'}, status=404)
+
+        try:
+            with stage('open'):
+                service = get_service(request.user.id)
+            results = service.query_batch(questions, doc_ids=doc_ids)
+
+            with stage('history'):
+                ChatHistory.objects.bulk_create([
+                    ChatHistory(user=request.user, query=question, response=result['answer'])
+                    for question, result in zip(questions, results)
+                ])
+
+            return Response({
+                'results': [
+                    {
+                        'question': question,
+                        'answer': result['answer'],
+                        'sources': result.get('sources', [])
+                    }
+                    for question, result in zip(questions, results)
+                ]
+            })
+        except Exception as e:
+            logger.error(f"Batch chat error: {e}")
+            return Response({'error': str(e)}, status=500)
+
+
 class ChatHistoryView(APIView):
     """Retrieve user's chat history."""
     
@@ -113,12 +393,72 @@ class ChatHistoryView(APIView):
 
     @extend_schema(
         summary="Get chat history",
-        description="Retrieve the logged-in user's chat history.",
+        description="Retrieve the logged-in user's chat history, newest first, one page at a time. "
+                    "Follow the `next` link to fetch older messages.",
+        parameters=[
+            OpenApiParameter('cursor', OpenApiTypes.STR, description="Cursor from a previous `next`/`previous` link"),
+            OpenApiParameter('page_size', OpenApiTypes.INT, description="Number of messages per page"),
+            OpenApiParameter('fields', OpenApiTypes.STR,
+                             description="Comma-separated fields to return, e.g. `id,query,created_at`"),
+        ],
         responses={200: ChatHistorySerializer(many=True)}
     )
     def get(self, request):
         """Get user's chat history."""
-        history = ChatHistory.objects.filter(user=request.user)[:50]
-        serializer = ChatHistorySerializer(history, many=True)
-        return Response(serializer.data)
+        history = ChatHistory.objects.filter(user=request.user)
+
+        fields = None
+        if request.query_params.get('fields'):
+            allowed = ChatHistorySerializer.Meta.fields
+            fields = [name.strip() for name in request.query_params['fields'].split(',') if name.strip()]
+            unknown = [name for name in fields if name not in allowed]
+            if unknown:
+                return Response({'fields': [f"Unknown fields: {', '.join(unknown)}"]}, status=400)
+            # The cursor is built from created_at and id, so always load them
+            history = history.only(*set(fields) | {'id', 'created_at'})
+
+        paginator = ChatHistoryCursorPagination()
+        page = paginator.paginate_queryset(history, request, view=self)
+        serializer = ChatHistorySerializer(page, many=True, fields=fields)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class ProfileView(APIView):
+    """Download the sampling profiler's collapsed stacks (admin only)."""
+
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(
+        summary="Get request profiles",
+        description="Without parameters, list the profiled endpoints with their request and sample counts. "
+                    "With `download=1`, return flamegraph-compatible collapsed stacks for `endpoint` (as listed), "
+                    "or for every endpoint with the endpoint as the root frame. Profiles live in the memory of "
+                    "the worker process that serves the request.",
+        parameters=[
+            OpenApiParameter('download', OpenApiTypes.BOOL, description="Return collapsed stacks as a file"),
+            OpenApiParameter('endpoint', OpenApiTypes.STR, description="Endpoint to download, e.g. `POST /chat/`"),
+        ],
+        responses={200: OpenApiTypes.OBJECT}
+    )
+    def get(self, request):
+        if not settings.PROFILING_ENABLED:
+            return Response({'error': 'Profiling is disabled. Set PROFILING=1 to enable it.'}, status=404)
+        from .profiling import get_profiler
+
+        profiler = get_profiler()
+        if request.query_params.get('download') not in ('1', 'true'):
+            return Response({'endpoints': profiler.summary()})
+
+        response = HttpResponse(profiler.collapsed(request.query_params.get('endpoint')),
+                                content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="profile.collapsed"'
+        return response
+
+    @extend_schema(summary="Reset request profiles", responses={204: None})
+    def delete(self, request):
+        if not settings.PROFILING_ENABLED:
+            return Response({'error': 'Profiling is disabled. Set PROFILING=1 to enable it.'}, status=404)
+        from .profiling import get_profiler
 
+        get_profiler().reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
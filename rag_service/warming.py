@@ -0,0 +1,132 @@
+"""
+Warm a user's vector store right after login, so the first chat request
+does not pay for restoring the store from cold storage, opening the Chroma
+handle, reading the index from disk and loading the embedding model. A
+maintenance job also keeps the stores of recently active users in the
+page cache.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .models import VectorStoreTier
+from .personal_service import get_service, shared_mode, vector_store_path
+from .tiering import archive_path
+
+logger = logging.getLogger(__name__)
+
+WARMUP_QUERY = "warmup"
+READ_SIZE = 1024 * 1024
+
+_budget = None
+_in_flight = set()
+_lock = threading.Lock()
+
+
+def _warmup_budget() -> threading.BoundedSemaphore:
+    global _budget
+    if _budget is None:
+        _budget = threading.BoundedSemaphore(settings.RAG_WARMUP_CONCURRENCY)
+    return _budget
+
+
+def touch_index_pages(path: str, max_bytes: int) -> int:
+    """Read the store's files so they are in the page cache. Returns bytes read."""
+    files = []
+    for root, _, names in os.walk(path):
+        files.extend(os.path.join(root, name) for name in names)
+    # The SQLite metadata first, then the HNSW segments
+    files.sort(key=lambda f: not f.endswith('.sqlite3'))
+
+    buffer = bytearray(READ_SIZE)
+    read = 0
+    for file_path in files:
+        try:
+            with open(file_path, 'rb', buffering=0) as f:
+                while read < max_bytes:
+                    size = f.readinto(buffer)
+                    if not size:
+                        break
+                    read += size
+        except OSError:
+            continue
+        if read >= max_bytes:
+            break
+    return read
+
+
+def _warm(user_id: int):
+    started = time.monotonic()
+    try:
+        service = get_service(user_id)
+        touched = 0
+        if not shared_mode():
+            touched = touch_index_pages(vector_store_path(user_id), settings.RAG_WARMUP_MAX_BYTES)
+        # Loads the HNSW index into memory and runs the embedding model once
+        if service._has_documents():
+            service.vector_store.similarity_search(WARMUP_QUERY, k=1, filter=service._where())
+        logger.info(
+            f"Warmed vector store of user {user_id} in {(time.monotonic() - started) * 1000:.0f}ms "
+            f"({touched} bytes read)"
+        )
+    except Exception as e:
+        logger.error(f"Warming vector store of user {user_id} failed: {e}")
+    finally:
+        connection.close()
+        with _lock:
+            _in_flight.discard(user_id)
+        _warmup_budget().release()
+
+
+def warm_user_store(user_id: int) -> bool:
+    """
+    Start warming the user's store in the background. Never blocks: when
+    RAG_WARMUP_CONCURRENCY warmups are already running, or this user's is,
+    it returns False and the first request warms the store itself.
+    """
+    if not settings.RAG_LOGIN_WARMUP:
+        return False
+    if not shared_mode() and not os.path.isdir(vector_store_path(user_id)) \
+            and not os.path.exists(archive_path(user_id)):
+        # Nothing uploaded yet
+        return False
+
+    with _lock:
+        if user_id in _in_flight or not _warmup_budget().acquire(blocking=False):
+            return False
+        _in_flight.add(user_id)
+    threading.Thread(target=_warm, args=(user_id,), name=f"warmup-user-{user_id}", daemon=True).start()
+    return True
+
+
+def warm_recent_stores(users: int = None, max_bytes: int = None) -> dict:
+    """
+    Read the stores of the `users` most recently active users into the page
+    cache, which every process on the node shares, at most `max_bytes` in
+    all. Archived stores are left in cold storage and no access is
+    recorded, so idle stores still age out.
+    """
+    users = settings.RAG_WARMUP_JOB_USERS if users is None else users
+    max_bytes = settings.RAG_WARMUP_JOB_MAX_BYTES if max_bytes is None else max_bytes
+    if shared_mode():
+        paths = [str(settings.SHARED_VECTOR_DB_PATH)]
+    else:
+        user_ids = VectorStoreTier.objects.filter(archived_at__isnull=True) \
+            .order_by('-last_accessed_at').values_list('user_id', flat=True)[:users]
+        paths = [vector_store_path(user_id, 'per_user') for user_id in user_ids]
+
+    summary = {'stores': 0, 'bytes': 0}
+    for path in paths:
+        if summary['bytes'] >= max_bytes:
+            break
+        if not os.path.isdir(path):
+            continue
+        summary['bytes'] += touch_index_pages(path, min(settings.RAG_WARMUP_MAX_BYTES, max_bytes - summary['bytes']))
+        summary['stores'] += 1
+
+    logger.info(f"Warmed {summary['stores']} vector stores ({summary['bytes']} bytes read)")
+    return summary
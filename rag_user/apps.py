@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RagUserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rag_user'
+
+    def ready(self):
+        import rag_user.signals
@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from queue import Empty, Full, Queue
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+class Mailer:
+    """
+    Fixed pool of email worker threads fed by a bounded queue. Each worker
+    holds one backend connection open while there is mail to send and
+    passes up to `batch_size` queued messages to a single send_messages
+    call. Workers start on the first message, so processes that never
+    send mail never start them.
+    """
+
+    def __init__(self, workers: int, queue_size: int, batch_size: int, max_retries: int,
+                 backoff: float, idle_timeout: float):
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.sent = 0
+        self.failed = 0
+        self._queue = Queue(maxsize=queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def send(self, message) -> bool:
+        """Queue an EmailMessage. Returns False if the queue is full."""
+        self._start()
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except Full:
+            logger.error(f"Email queue is full, dropping message to {', '.join(message.to)}")
+            with self._lock:
+                self.failed += 1
+            return False
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until every queued message was sent or given up on."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _start(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for n in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'email-worker-{n}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get(timeout=self.idle_timeout)]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        connection = None
+        while True:
+            try:
+                batch = self._next_batch()
+            except Empty:
+                # Servers drop idle SMTP sessions anyway; reopen on the next message
+                if connection is not None:
+                    connection.close()
+                    connection = None
+                continue
+            try:
+                connection = self._deliver(connection, batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _open(self, connection):
+        if connection is None:
+            connection = get_connection(fail_silently=False)
+        connection.open()
+        return connection
+
+    def _deliver(self, connection, batch: list):
+        try:
+            connection = self._open(connection)
+            connection.send_messages(batch)
+            with self._lock:
+                self.sent += len(batch)
+            return connection
+        except Exception as e:
+            logger.warning(f"Sending a batch of {len(batch)} emails failed, retrying one by one: {e}")
+            connection = self._reset(connection)
+
+        # Delivery is at least once: messages sent before the failure may go out twice
+        for message in batch:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    connection = self._open(connection)
+                    connection.send_messages([message])
+                    with self._lock:
+                        self.sent += 1
+                    break
+                except Exception as e:
+                    connection = self._reset(connection)
+                    if attempt == self.max_retries:
+                        logger.error(f"Failed to send email to {', '.join(message.to)}: {e}")
+                        with self._lock:
+                            self.failed += 1
+                    else:
+                        time.sleep(self.backoff * 2 ** attempt)
+        return connection
+
+    def _reset(self, connection):
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        return None
+
+
+_mailer = None
+_mailer_lock = threading.Lock()
+
+
+def get_mailer() -> Mailer:
+    global _mailer
+    with _mailer_lock:
+        if _mailer is None:
+            _mailer = Mailer(
+                workers=settings.EMAIL_WORKERS,
+                queue_size=settings.EMAIL_QUEUE_SIZE,
+                batch_size=settings.EMAIL_BATCH_SIZE,
+                max_retries=settings.EMAIL_MAX_RETRIES,
+                backoff=settings.EMAIL_RETRY_BACKOFF,
+                idle_timeout=settings.EMAIL_IDLE_TIMEOUT,
+            )
+        return _mailer
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
+from django.db.models.functions import Lower
 # Create your models here.
 
 
@@ -8,7 +9,15 @@ class CustomUser(AbstractUser):
     username = models.CharField(max_length=150, unique=True)
     email = models.EmailField(unique=True)
 
+    class Meta:
+        constraints = [
+            # Also the index logins look emails up by
+            models.UniqueConstraint(Lower('email'), name='rag_user_customuser_email_lower_unique'),
+        ]
 
+    def save(self, *args, **kwargs):
+        self.email = self.email.lower()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.username
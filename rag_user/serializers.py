@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from .models import CustomUser
 from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.db.models.functions import Lower
 from rest_framework_simplejwt.tokens import RefreshToken
 
 User = get_user_model()
@@ -22,7 +24,7 @@ class RegistrationSerializer(serializers.ModelSerializer):
     
     def validate_email(self, value):
         value = value.lower()
-        if User.objects.filter(email=value).exists():
+        if User.objects.alias(email_lower=Lower('email')).filter(email_lower=value).exists():
             raise serializers.ValidationError("A user with that email already exists.")
         return value
     
@@ -50,14 +52,20 @@ class UserLoginSerializer(serializers.Serializer):
         password = attrs.get('password')
 
 
-        user = None
-        try:
-            user = User.objects.get(username=username_or_email)
-        except User.DoesNotExist:
-            try:
-                user = User.objects.get(email=username_or_email)
-            except User.DoesNotExist:
-                raise serializers.ValidationError("Invalid username/email or password")
+        # One query for both, on the username and lowercase email indexes.
+        # Addresses saved before they were normalized keep their capitals, so
+        # emails are compared lowercased; a username match wins if both match.
+        candidates = list(
+            User.objects.alias(email_lower=Lower('email')).filter(
+                Q(username=username_or_email) | Q(email_lower=username_or_email.lower())
+            )
+        )
+        user = next((u for u in candidates if u.username == username_or_email), None)
+        if user is None and candidates:
+            # At most one, the lowercase email is unique
+            user = candidates[0]
+        if user is None:
+            raise serializers.ValidationError("Invalid username/email or password")
         
         if not user.check_password(password):
             raise serializers.ValidationError("Invalid username/email or password")
@@ -1,38 +1,40 @@
 import logging
-from threading import Thread
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from functools import lru_cache
+from django.core.mail import EmailMultiAlternatives
+from django.template.loader import get_template
 from django.conf import settings
 
+from .mailer import get_mailer
+
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=None)
+def _welcome_template():
+    # Compiled once per process instead of on every signup
+    return get_template('welcome_email.html')
+
+
 def send_verification_email_task(user_email, username):
-    """Send verification email after user signup using HTML template."""
-    def _send_email():
-        try:
-            subject = "Welcome to RAG Chatbot"
-            
-            # Render HTML template
-            html_message = render_to_string('welcome_email.html', {
-                'username': username,
-            })
-            
-            # Plain text fallback message
-            message = f"Welcome {username}! Thank you for signing up for RAG Chatbot."
-            
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user_email],
-                html_message=html_message,
-                fail_silently=False,
-            )
-            logger.info(f"Verification email sent to {user_email}")
-        except Exception as e:
-            logger.error(f"Failed to send verification email to {user_email}: {e}")
-    
-    # Run email sending in a background thread
-    thread = Thread(target=_send_email)
-    thread.start()
+    """Queue the verification email after user signup using HTML template."""
+    subject = "Welcome to RAG Chatbot"
+
+    # Render HTML template
+    html_message = _welcome_template().render({
+        'username': username,
+    })
+
+    # Plain text fallback message
+    message = f"Welcome {username}! Thank you for signing up for RAG Chatbot."
+
+    email = EmailMultiAlternatives(
+        subject=subject,
+        body=message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[user_email],
+    )
+    email.attach_alternative(html_message, 'text/html')
+
+    # Sent in the background by the email worker pool
+    if get_mailer().send(email):
+        logger.info(f"Verification email to {user_email} queued")
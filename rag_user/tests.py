@@ -0,0 +1,139 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+
+from .mailer import Mailer
+from .serializers import UserLoginSerializer
+from .tasks import send_verification_email_task
+
+User = get_user_model()
+
+
+class LoginTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', email='Reader@Example.com', password='pw')
+
+    def login(self, username_or_email: str, password: str = 'pw'):
+        serializer = UserLoginSerializer(data={'username_or_email': username_or_email, 'password': password})
+        valid = serializer.is_valid()
+        return serializer.validated_data if valid else None
+
+    def test_email_is_stored_lowercase(self):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, 'reader@example.com')
+
+    def test_login_with_any_case_of_email(self):
+        self.assertEqual(self.login('READER@example.COM')['user']['id'], self.user.id)
+
+    def test_login_with_email_saved_before_normalizing(self):
+        User.objects.filter(id=self.user.id).update(email='Reader@Example.com')
+        self.assertEqual(self.login('reader@example.com')['user']['id'], self.user.id)
+
+    def test_username_match_wins_over_email_match(self):
+        other = User.objects.create_user(username='reader@example.org', email='x@example.org', password='other')
+        User.objects.create_user(username='someone', email='READER@example.org', password='pw')
+        self.assertEqual(self.login('reader@example.org', 'other')['user']['id'], other.id)
+
+    def test_wrong_password(self):
+        self.assertIsNone(self.login('reader', 'nope'))
+
+    def test_email_lookup_uses_index(self):
+        plan = User.objects.alias(email_lower=Lower('email')).filter(
+            Q(username='reader') | Q(email_lower='reader@example.com')
+        ).explain()
+        self.assertNotIn('SCAN', plan)
+
+
+class FlakyConnection:
+    """Email backend connection whose first `failures` sends raise."""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.batches = []
+        self.opened = 0
+
+    def open(self):
+        self.opened += 1
+
+    def close(self):
+        pass
+
+    def send_messages(self, messages):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('connection reset')
+        self.batches.append([message.to[0] for message in messages])
+        return len(messages)
+
+
+class MailerTests(SimpleTestCase):
+
+    def mailer(self, **options):
+        return Mailer(**{'workers': 1, 'queue_size': 100, 'batch_size': 10, 'max_retries': 2,
+                         'backoff': 0, 'idle_timeout': 0.05, **options})
+
+    def messages(self, count: int) -> list:
+        return [EmailMessage('hi', 'body', 'from@example.com', [f'user{n}@example.com']) for n in range(count)]
+
+    def test_queued_messages_are_sent(self):
+        mailer = self.mailer()
+        for message in self.messages(5):
+            self.assertTrue(mailer.send(message))
+        self.assertTrue(mailer.flush(timeout=5))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         [f'user{n}@example.com' for n in range(5)])
+        self.assertEqual((mailer.sent, mailer.failed), (5, 0))
+
+    def test_waiting_messages_go_out_in_one_batch(self):
+        connection = FlakyConnection(failures=0)
+        mailer = self.mailer(batch_size=3)
+        with mock.patch.object(mailer, '_start'):
+            for message in self.messages(4):
+                mailer.send(message)
+        with mock.patch('rag_user.mailer.get_connection', return_value=connection):
+            mailer._start()
+            self.assertTrue(mailer.flush(timeout=5))
+        self.assertEqual([len(batch) for batch in connection.batches], [3, 1])
+
+    def test_failed_batch_is_retried_one_by_one(self):
+        connection = FlakyConnection(failures=2)
+        mailer = self.mailer()
+        with mock.patch.object(mailer, '_start'):
+            for message in self.messages(3):
+                mailer.send(message)
+        with mock.patch('rag_user.mailer.get_connection', return_value=connection):
+            mailer._start()
+            self.assertTrue(mailer.flush(timeout=5))
+        # The batch and the first single retry fail, then each message goes out alone
+        self.assertEqual(connection.batches, [[f'user{n}@example.com'] for n in range(3)])
+        self.assertEqual((mailer.sent, mailer.failed), (3, 0))
+
+    def test_gives_up_after_max_retries(self):
+        mailer = self.mailer(max_retries=1)
+        with mock.patch('rag_user.mailer.get_connection', return_value=FlakyConnection(failures=100)):
+            mailer.send(self.messages(1)[0])
+            self.assertTrue(mailer.flush(timeout=5))
+        self.assertEqual((mailer.sent, mailer.failed), (0, 1))
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        mailer = self.mailer(queue_size=1)
+        with mock.patch.object(mailer, '_start'):
+            first, second = self.messages(2)
+            self.assertTrue(mailer.send(first))
+            self.assertFalse(mailer.send(second))
+        self.assertEqual(mailer.failed, 1)
+
+    def test_welcome_email_is_queued(self):
+        mailer = self.mailer()
+        with mock.patch('rag_user.tasks.get_mailer', return_value=mailer):
+            send_verification_email_task('reader@example.com', 'reader')
+            self.assertTrue(mailer.flush(timeout=5))
+        self.assertEqual(mail.outbox[0].to, ['reader@example.com'])
+        self.assertIn('reader', mail.outbox[0].alternatives[0][0])
@@ -10,6 +10,7 @@ from .serializers import (
     UserLoginSerializer,
 )
 from .tasks import send_verification_email_task
+from rag_service.warming import warm_user_store
 
 # User = get_user_model()
 
@@ -122,5 +123,7 @@ class LoginView(APIView):
     def post(self, request):
         serializer = UserLoginSerializer(data=request.data)
         if serializer.is_valid():
+            # Open the user's vector store in the background before the first chat request
+            warm_user_store(serializer.validated_data['user']['id'])
             return Response(serializer.validated_data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file